@@ -0,0 +1,151 @@
+"""Write synthetic Airtable dumps for benchmarking imports at a given scale.
+
+Writes `state_reps.json` and `negative_bills.json` in the format of
+dump_airtable.py, which `import-airtable-json` reads. Reps vote on bills of their
+own state; `--votes` is the total number of yea and nay links over all reps.
+The same seed always gives the same dumps. Run from the repository root:
+
+    PYTHONPATH=./ python benchmarks/generate_dataset.py --out /tmp/tfp-dataset
+    PYTHONPATH=./ python benchmarks/generate_dataset.py --reps 1000 --bills 500 --votes 50000 --out /tmp/small
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from tfp_widget.streaming import write_json_array
+
+STATES = [
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", "Delaware",
+    "Florida", "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", "Kansas", "Kentucky",
+    "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan", "Minnesota", "Mississippi",
+    "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire", "New Jersey", "New Mexico",
+    "New York", "North Carolina", "North Dakota", "Ohio", "Oklahoma", "Oregon", "Pennsylvania",
+    "Rhode Island", "South Carolina", "South Dakota", "Tennessee", "Texas", "Utah", "Vermont",
+    "Virginia", "Washington", "West Virginia", "Wisconsin", "Wyoming",
+]
+CATEGORIES = ["Health Care", "Sports", "Education", "Bathrooms", "ID Documents", "Drag", "Other"]
+FIRST_NAMES = ["Tim", "Anna", "Maria", "James", "Lee", "Sam", "Priya", "Jordan", "Chris", "Dana"]
+LAST_NAMES = ["Barhorst", "Smith", "Garcia", "Nguyen", "Johnson", "Okafor", "Kowalski", "Rivera", "Chen"]
+EPOCH = datetime(2021, 1, 1)
+
+
+def airtable_time(rng):
+    return (EPOCH + timedelta(seconds=rng.randrange(3 * 365 * 86400))).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def record_id(prefix, i):
+    # Airtable ids are "rec" and 14 characters
+    return f"rec{prefix}{i:013d}"
+
+
+def generate_bills(count, rng):
+    """Generate negative bill records, spread evenly over the states.
+
+    Returns:
+        tuple: The records and the bill ids of each state.
+    """
+    bills, by_state = [], {state: [] for state in STATES}
+    for i in range(count):
+        state = STATES[i % len(STATES)]
+        bill_id = record_id("B", i)
+        categories = rng.sample(CATEGORIES, rng.randint(1, 3))
+        bills.append({
+            "id": bill_id,
+            "createdTime": airtable_time(rng),
+            "fields": {
+                "Case Name": f"{state[:2].upper()} HB{i}",
+                "Status": rng.choice(["Active", "Passed", "Failed", "Dead"]),
+                "Progress": rng.choice(["Introduced", "Committee", "Floor Vote", "Signed", "Veto Override Vote"]),
+                "Summary": " ".join(rng.choices(LAST_NAMES + CATEGORIES, k=40)),
+                "State": state,
+                "Bill Information Link": f"https://legiscan.com/{state[:2].upper()}/bill/HB{i}/2023",
+                "Last Activity Date": airtable_time(rng)[:10],
+                "Category": categories,
+                "Expanded Category": categories,
+                "Legiscan Bill ID": 1000000 + i,
+                "Last Modified": airtable_time(rng),
+                "Created": airtable_time(rng),
+            },
+        })
+        by_state[state].append(bill_id)
+    return bills, by_state
+
+
+def generate_reps(count, bills_by_state, vote_count, rng):
+    """Generate rep records voting on `vote_count` bills in total, each on bills of its state."""
+    all_bills = [bill_id for bill_ids in bills_by_state.values() for bill_id in bill_ids]
+    for i in range(count):
+        state = STATES[i % len(STATES)]
+        # spread the remainder over the first reps, so the total is exact
+        votes = vote_count // count + (1 if i < vote_count % count else 0)
+        candidates = bills_by_state[state] if len(bills_by_state[state]) >= votes else all_bills
+        voted = rng.sample(candidates, min(votes, len(candidates)))
+        split = int(len(voted) * 0.7)
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+        slug = name.lower().replace(" ", "-")
+        yield {
+            "id": record_id("R", i),
+            "createdTime": airtable_time(rng),
+            "fields": {
+                "Name": name,
+                "Political Party": rng.choice(["Republican", "Democrat", "Independent"]),
+                "District": str(i // len(STATES) + 1),
+                "Role": rng.choice(["House Representative", "Senator"]),
+                "State": state,
+                "Email": f"{slug}@legislature.example.gov",
+                "Capitol Phone Number": f"(555) {rng.randrange(1000):03d}-{rng.randrange(10000):04d}",
+                "Website": f"https://legislature.example.gov/members/{slug}",
+                "Capitol Address": f"{rng.randrange(1, 200)} Capitol Street, {state}",
+                "Twitter": f"https://twitter.com/{slug}",
+                "Up For Reelection On": "2024-11-05",
+                "Sponsorships": voted[:rng.randint(0, min(3, split))],
+                "Yea Votes": voted[:split],
+                "Nay Votes": voted[split:],
+                "Legiscan ID": 20000 + i,
+                "Follow the Money EID": 50000000 + i,
+                "Last Modified": airtable_time(rng),
+                "Created": airtable_time(rng),
+            },
+        }
+
+
+def generate(out_dir, rep_count, bill_count, vote_count, seed=0):
+    """Write the dumps to `out_dir`.
+
+    Returns:
+        dict: Paths of the `state_reps` and `negative_bills` dumps.
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {
+        "state_reps": os.path.join(out_dir, "state_reps.json"),
+        "negative_bills": os.path.join(out_dir, "negative_bills.json"),
+    }
+    bills, bills_by_state = generate_bills(bill_count, rng)
+    with open(paths["negative_bills"], "w") as fp:
+        json.dump(bills, fp)
+    # reps are written as they are generated, the vote lists are what makes dumps big
+    with open(paths["state_reps"], "w") as fp:
+        for _ in write_json_array(generate_reps(rep_count, bills_by_state, vote_count, rng), fp):
+            pass
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="Directory to write the dumps to")
+    parser.add_argument("--reps", type=int, default=10000)
+    parser.add_argument("--bills", type=int, default=5000)
+    parser.add_argument("--votes", type=int, default=1000000, help="Yea and nay links over all reps")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate(args.out, args.reps, args.bills, args.votes, args.seed)
+    for name, path in paths.items():
+        print(f"{name}: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
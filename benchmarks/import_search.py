@@ -0,0 +1,249 @@
+"""Time the import pipeline and rep search on a synthetic dataset, writing the results as JSON.
+
+Generates a dataset with generate_dataset.py (unless `--dataset` already holds
+one), migrates an empty database and times:
+
+- `import-airtable-json` end to end, then again with nothing changed
+- `NegativeBills.bulk_upsert` and `Rep.bulk_upsert` inserting, skipping unchanged
+  records and updating a tenth of the reps
+- `RepsToNegativeBills.rep_build_all_relations` building, re-syncing unchanged and
+  re-syncing after a tenth of the reps changed their votes
+- `RepsResource.get` for a few kinds of queries, without the response cache
+
+The database is a temporary SQLite file, or `--database-url` (e.g. a local Postgres,
+whose tables are dropped first). Results go to `--output` as JSON; `--compare` prints
+the change against an earlier results file. Run from the repository root:
+
+    PYTHONPATH=./ python benchmarks/import_search.py --reps 1000 --bills 500 --votes 50000 --output before.json
+    PYTHONPATH=./ python benchmarks/import_search.py --reps 1000 --bills 500 --votes 50000 --compare before.json
+    PYTHONPATH=./ python benchmarks/import_search.py --database-url postgresql://localhost/tfp_bench
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# the "full_name" query is the name of the first rep in the dataset
+SEARCH_QUERIES = {
+    "common_name": "smith",
+    "state": "ohio",
+    "no_match": "nobody at all",
+}
+CHANGED_FRACTION = 0.1
+
+
+class Timer:
+    """Collects named timings into result dicts and prints them as they come in."""
+
+    def __init__(self):
+        self.results = []
+
+    def run(self, name, function, *args, **details):
+        start = time.perf_counter()
+        value = function(*args)
+        seconds = time.perf_counter() - start
+        self.results.append({"name": name, "seconds": round(seconds, 4), **details})
+        print(f"{name:<40} {seconds:>9.3f}s")
+        return value
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def create_benchmark_app(database_url):
+    # the production config reads the environment when tfp_widget is imported
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["RESPONSE_CACHE_SIZE"] = "0"
+    os.environ["QUERY_BUDGET"] = "0"
+    from tfp_widget import create_app
+
+    app = create_app("production")
+    logging.getLogger().setLevel(logging.WARNING)
+    return app
+
+
+def reset_database():
+    """Drop every table and migrate the empty database to the latest revision."""
+    from flask_migrate import upgrade
+    from sqlalchemy import text
+    from tfp_widget.database import db
+
+    db.drop_all()
+    with db.engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+        if db.engine.dialect.name == "sqlite":
+            connection.execute(text("DROP TABLE IF EXISTS reps_fts"))
+    upgrade()
+
+
+def load_records(path):
+    from tfp_widget.streaming import iter_json_records
+
+    with open(path, "rb") as fp:
+        return list(iter_json_records(fp))
+
+
+def change_reps(at_reps, rng):
+    """Copy the reps, giving a tenth of them a new email and one yea vote turned into a nay vote."""
+    changed = copy.deepcopy(at_reps)
+    for at_rep in rng.sample(changed, int(len(changed) * CHANGED_FRACTION)):
+        fields = at_rep["fields"]
+        fields["Email"] = "changed-" + fields["Email"]
+        if fields["Yea Votes"]:
+            fields["Nay Votes"].append(fields["Yea Votes"].pop())
+    return changed
+
+
+def time_import_command(timer, app, paths):
+    runner = app.test_cli_runner()
+    args = ["import-airtable-json", "--state-reps-file", paths["state_reps"],
+            "--negative-bills-file", paths["negative_bills"]]
+
+    def invoke():
+        result = runner.invoke(args=args)
+        if result.exit_code != 0:
+            raise RuntimeError(result.output) from result.exception
+
+    timer.run("import_airtable_json", invoke)
+    timer.run("import_airtable_json_unchanged", invoke)
+
+
+def time_upserts_and_relations(timer, paths):
+    from tfp_widget import schema
+    from tfp_widget.database import db
+    from tfp_widget.models import NegativeBills, Rep, RepsToNegativeBills
+
+    at_bills = load_records(paths["negative_bills"])
+    at_reps = load_records(paths["state_reps"])
+    changed_reps = change_reps(at_reps, random.Random(0))
+    vote_count = sum(len(at_rep["fields"]["Yea Votes"]) + len(at_rep["fields"]["Nay Votes"]) for at_rep in at_reps)
+
+    timer.run("bulk_upsert_negative_bills_insert", NegativeBills.bulk_upsert, at_bills, records=len(at_bills))
+    timer.run("bulk_upsert_reps_insert", Rep.bulk_upsert, at_reps, records=len(at_reps))
+    timer.run("bulk_upsert_reps_unchanged", Rep.bulk_upsert, at_reps, records=len(at_reps))
+    timer.run("bulk_upsert_reps_update", Rep.bulk_upsert, changed_reps, records=len(at_reps),
+              changed=int(len(at_reps) * CHANGED_FRACTION))
+
+    timer.run("rep_build_all_relations_insert", RepsToNegativeBills.rep_build_all_relations, at_reps,
+              db.session, votes=vote_count)
+    timer.run("rep_build_all_relations_unchanged", RepsToNegativeBills.rep_build_all_relations, at_reps,
+              db.session, votes=vote_count)
+    timer.run("rep_build_all_relations_update", RepsToNegativeBills.rep_build_all_relations, changed_reps,
+              db.session, votes=vote_count, changed=int(len(at_reps) * CHANGED_FRACTION))
+
+    timer.run("refresh_rep_documents", schema.refresh_rep_documents, db.session, records=len(at_reps))
+    return {"reps": len(at_reps), "bills": len(at_bills), "votes": vote_count}
+
+
+def time_search(timer, app, paths, repeat):
+    from tfp_widget.streaming import iter_json_records
+
+    with open(paths["state_reps"], "rb") as fp:
+        first_rep = next(iter_json_records(fp))
+    queries = dict(SEARCH_QUERIES, full_name=first_rep["fields"]["Name"])
+
+    client = app.test_client()
+    for kind, query in queries.items():
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(f"/api/reps/search/{query}")
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+        latencies.sort()
+        result = {
+            "name": f"reps_resource_get_{kind}",
+            "seconds": round(statistics.median(latencies), 5),
+            "p95_seconds": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 5),
+            "requests": repeat,
+            "results": len(response.json),
+        }
+        timer.results.append(result)
+        print(f"{result['name']:<40} {result['seconds'] * 1e3:>8.2f}ms p50 "
+              f"{result['p95_seconds'] * 1e3:.2f}ms p95, {result['results']} reps")
+
+
+def compare(results, baseline_path):
+    """Print the change of every timing against the results file at `baseline_path`."""
+    with open(baseline_path) as fp:
+        baseline = {result["name"]: result["seconds"] for result in json.load(fp)["results"]}
+    print(f"\ncompared to {baseline_path}")
+    for result in results["results"]:
+        before = baseline.get(result["name"])
+        if before:
+            print(f"{result['name']:<40} {before:>9.4f}s -> {result['seconds']:>9.4f}s "
+                  f"{(result['seconds'] / before - 1) * 100:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", help="Directory with the dumps, generated there if missing")
+    parser.add_argument("--reps", type=int, default=10000)
+    parser.add_argument("--bills", type=int, default=5000)
+    parser.add_argument("--votes", type=int, default=1000000)
+    parser.add_argument("--database-url", help="Database to benchmark, its tables are dropped")
+    parser.add_argument("--search-repeat", type=int, default=20, help="Requests per search query")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare with")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="tfp-benchmark-")
+    dataset_dir = args.dataset or os.path.join(work_dir, "dataset")
+    paths = {
+        "state_reps": os.path.join(dataset_dir, "state_reps.json"),
+        "negative_bills": os.path.join(dataset_dir, "negative_bills.json"),
+    }
+    app = create_benchmark_app(args.database_url or f"sqlite:///{work_dir}/benchmark.db")
+    if not all(os.path.exists(path) for path in paths.values()):
+        import generate_dataset
+
+        print(f"Generating {args.reps} reps, {args.bills} bills and {args.votes} votes in {dataset_dir}")
+        generate_dataset.generate(dataset_dir, args.reps, args.bills, args.votes)
+    timer = Timer()
+    with app.app_context():
+        from tfp_widget.database import db
+
+        dialect = db.engine.dialect.name
+        reset_database()
+        time_import_command(timer, app, paths)
+        time_search(timer, app, paths, args.search_repeat)
+
+        reset_database()
+        dataset = time_upserts_and_relations(timer, paths)
+        db.session.remove()
+
+    results = {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": dialect,
+        "dataset": dict(dataset, dir=dataset_dir),
+        "results": timer.results,
+    }
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Load test `/api/reps/search` under gunicorn at several concurrency levels.
+
+Starts gunicorn with gunicorn.conf.py against a SQLite file filled with synthetic reps,
+or against `DATABASE_URL` (e.g. a local Postgres) when it is set, and reports
+requests per second and latency percentiles per number of concurrent clients.
+Run from the repository root:
+
+    PYTHONPATH=./ python benchmarks/load_test.py --worker-class gthread
+    PYTHONPATH=./ python benchmarks/load_test.py --worker-class sync
+    PYTHONPATH=./ python benchmarks/load_test.py --url http://localhost:8000  # a running server
+"""
+import argparse
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+CONCURRENCY_LEVELS = [1, 4, 16, 64]
+QUERIES = ["benchmark rep 1", "rep 42", "ohio", "house", "benchmark rep 19", "nobody"]
+PORT = 8765
+
+
+def populate(database_url, rep_count, bill_count):
+    os.environ["DATABASE_URL"] = database_url
+    from search_queries import populate as add_reps
+    from tfp_widget import create_app, schema
+    from tfp_widget.database import db
+
+    app = create_app("production")
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        add_reps(rep_count, bill_count)
+        db.session.commit()
+        schema.refresh_rep_documents(db.session)
+
+
+def start_server(database_url, worker_class, workers, cache):
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        PORT=str(PORT),
+        GUNICORN_WORKER_CLASS=worker_class,
+        WEB_CONCURRENCY=str(workers),
+        RESPONSE_CACHE_SIZE="1024" if cache else "0",
+        GUNICORN_MAX_REQUESTS="0",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "tfp_widget:create_app('production')"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{PORT}"
+    for _ in range(100):
+        try:
+            requests.get(f"{url}/api/status/cache", timeout=1)
+            return server, url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("gunicorn did not start")
+
+
+def run_level(url, concurrency, duration):
+    """Hit the search endpoint from `concurrency` clients for `duration` seconds.
+
+    Returns:
+        tuple: Sorted latencies in seconds and the number of failed requests.
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        own = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = session.get(f"{url}/api/reps/search/{rng.choice(QUERIES)}")
+            own.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors[0]
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Test a running server instead of starting gunicorn")
+    parser.add_argument("--worker-class", default="gthread", choices=["gthread", "gevent", "sync"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=5, help="Seconds per concurrency level")
+    parser.add_argument("--reps", type=int, default=500)
+    parser.add_argument("--cache", action="store_true", help="Enable the response cache")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = None
+    url = args.url
+    if url is None:
+        database_url = os.getenv("DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/load_test.db"
+        populate(database_url, args.reps, 20)
+        server, url = start_server(database_url, args.worker_class, args.workers, args.cache)
+
+    try:
+        print(f"{args.worker_class if server else url}: {args.duration:.0f}s per level")
+        print(f"{'clients':>7} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for concurrency in CONCURRENCY_LEVELS:
+            latencies, errors = run_level(url, concurrency, args.duration)
+            print(f"{concurrency:>7} {len(latencies):>9} {len(latencies) / args.duration:>8.0f} "
+                  f"{percentile(latencies, 0.5) * 1e3:>8.1f} {percentile(latencies, 0.99) * 1e3:>8.1f} {errors:>7}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
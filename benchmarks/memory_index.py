@@ -0,0 +1,77 @@
+"""Measure `RepSearchIndex` build time and query latency on synthetic reps.
+
+Latency is measured over a stream of distinct queries, the prefixes a type-ahead widget
+sends while names, states and roles are typed, each searched once. Run from the
+repository root:
+
+    PYTHONPATH=./ python benchmarks/memory_index.py
+"""
+import random
+import string
+import time
+from collections import defaultdict
+
+from tfp_widget.search_index import RepSearchIndex
+
+REP_COUNTS = [1000, 10000, 50000]
+STATES = ["Alabama", "Massachusetts", "Ohio", "Texas", "Wyoming", "New Hampshire"]
+TYPED_DOCUMENTS = 200
+
+
+def random_name(rng):
+    return " ".join(
+        rng.choice(string.ascii_uppercase) + "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+        for _ in range(2)
+    )
+
+
+def documents(count, rng):
+    for i in range(count):
+        yield {
+            "id": f"rec{i:08d}",
+            "name": random_name(rng) if i % 50 else "John Smith",
+            "state": rng.choice(STATES),
+            "district": str(rng.randint(1, 200)),
+            "role": rng.choice(["House Representative", "Senator"]),
+        }
+
+
+def typed_queries(documents, rng):
+    """Distinct prefixes of the names, states and roles of a sample of documents."""
+    queries = set()
+    for document in rng.sample(documents, TYPED_DOCUMENTS):
+        for value in (document["name"], document["state"], document["role"]):
+            queries.update(value[:i] for i in range(1, len(value) + 1))
+    queries = sorted(queries)
+    rng.shuffle(queries)
+    return queries
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'reps':>6} {'build s':>8} {'query len':>9} {'queries':>8} {'p50 us':>8} {'p99 us':>8} {'max us':>8}")
+    for count in REP_COUNTS:
+        docs = list(documents(count, rng))
+        start = time.perf_counter()
+        index = RepSearchIndex(docs)
+        build = time.perf_counter() - start
+
+        timings = defaultdict(list)
+        for query in typed_queries(docs, rng):
+            start = time.perf_counter()
+            index.search(query, 100)
+            bucket = "1-3" if len(query) <= 3 else "4+"
+            timings[bucket].append((time.perf_counter() - start) * 1e6)
+        timings["all"] = timings["1-3"] + timings["4+"]
+        for bucket in ["1-3", "4+", "all"]:
+            values = sorted(timings[bucket])
+            print(f"{count:>6} {build:>8.2f} {bucket:>9} {len(values):>8} {percentile(values, 0.5):>8.0f} "
+                  f"{percentile(values, 0.99):>8.0f} {values[-1]:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
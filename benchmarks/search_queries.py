@@ -0,0 +1,77 @@
+"""Count the SQL statements issued by `/api/reps/search` as the result size grows.
+
+Run from the repository root:
+
+    PYTHONPATH=./ python benchmarks/search_queries.py
+"""
+import logging
+import time
+
+from sqlalchemy import event
+
+from tfp_widget import create_app
+from tfp_widget.database import db
+from tfp_widget.models import NegativeBills, Rep, RepsToNegativeBills
+
+RESULT_SIZES = [1, 10, 50, 100]
+BILLS_PER_REP = 50
+
+
+def populate(rep_count, bill_count):
+    for i in range(bill_count):
+        db.session.add(NegativeBills.from_airtable_record({
+            "id": f"bill{i}",
+            "createdTime": "2023-03-07T18:17:13.000Z",
+            "fields": {"Case Name": f"XX HB{i}", "State": "Ohio"},
+        }))
+
+    at_reps = []
+    for i in range(rep_count):
+        at_rep = {
+            "id": f"rep{i}",
+            "fields": {
+                "Name": f"Benchmark Rep {i}",
+                "District": str(i),
+                "Role": "House Representative",
+                "State": "Ohio",
+                "Created": "2021-10-20T15:36:50.000Z",
+                "Last Modified": "2023-12-01T18:49:00.000Z",
+                "Yea Votes": [f"bill{b}" for b in range(bill_count)],
+                "Sponsorships": [f"bill{b}" for b in range(0, bill_count, 5)],
+            },
+        }
+        at_reps.append(at_rep)
+        db.session.add(Rep.from_airtable_record(at_rep))
+    RepsToNegativeBills.rep_build_all_relations(at_reps, db.session)
+
+
+def main():
+    app = create_app("testing")
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f"{'reps':>6} {'queries':>8} {'ms':>8}")
+    for size in RESULT_SIZES:
+        with app.app_context():
+            db.create_all()
+            populate(size, BILLS_PER_REP)
+
+            statements = []
+
+            def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+            with app.test_client() as client:
+                start = time.perf_counter()
+                response = client.get("/api/reps/search/benchmark")
+                elapsed = (time.perf_counter() - start) * 1000
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+            assert len(response.json) == size
+            print(f"{size:>6} {len(statements):>8} {elapsed:>8.1f}")
+
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
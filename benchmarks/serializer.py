@@ -0,0 +1,59 @@
+"""Compare serializing a page of reps with `RepSchema` per rep against `schema.serialize_reps`.
+
+Run from the repository root:
+
+    PYTHONPATH=./ python benchmarks/serializer.py
+"""
+import json
+import time
+from collections import defaultdict
+
+from tfp_widget import schema
+from tfp_widget.models import Rep
+
+PAGE_SIZES = [10, 100, 500]
+REPEAT = 50
+
+
+def make_reps(count):
+    reps, mappings = [], {}
+    for i in range(count):
+        rep = Rep(
+            id=f"rec{i:08d}", name=f"Rep {i}", state="Ohio", district=str(i % 99), role="House Representative",
+            political_party="Republican", email=f"rep{i}@example.com", capitol_phone="(614) 466-0000",
+            district_phone=None, twitter=f"https://twitter.com/rep{i}",
+        )
+        reps.append(rep)
+        mapping = defaultdict(list)
+        mapping["sponsorship"] = [f"OH HB{j}" for j in range(i % 5)]
+        mapping["yea_vote"] = [f"OH SB{j}" for j in range(i % 20)]
+        mappings[rep.id] = mapping
+    return reps, mappings
+
+
+def rep_schema_per_rep(reps, mappings):
+    """The serialization path used before `serialize_reps`."""
+    return [schema.RepSchema(context={"mapping": mappings[rep.id]}).dump(rep) for rep in reps]
+
+
+def best_of(function, *args):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"{'reps':>5} {'RepSchema ms':>13} {'serialize_reps ms':>18} {'speedup':>8}")
+    for count in PAGE_SIZES:
+        reps, mappings = make_reps(count)
+        assert json.dumps(rep_schema_per_rep(reps, mappings)) == json.dumps(schema.serialize_reps(reps, mappings))
+        before = best_of(rep_schema_per_rep, reps, mappings)
+        after = best_of(schema.serialize_reps, reps, mappings)
+        print(f"{count:>5} {before * 1e3:>13.2f} {after * 1e3:>18.3f} {before / after:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,12 +9,19 @@ logging.basicConfig(level=logging.INFO)
 
 load_dotenv()
 
-at_data = {
-    "state_reps": airtable.get_state_reps(),
-    "national_reps": airtable.get_national_reps(),
-    "negative_bills": airtable.get_negative_bills()
+TABLES = {
+    "state_reps": "STATE_REPS_TABLE",
+    "national_reps": "NATIONAL_REPS_TABLE",
+    "negative_bills": "NEGATIVE_BILLS_TABLE",
 }
 
+# the tables are fetched concurrently, sharing the session's rate limit
+start = time.perf_counter()
+tables_data = airtable.get_tables_data(list(TABLES.values()))
+at_data = {table_name: tables_data[table_key] for table_name, table_key in TABLES.items()}
+logging.info(f"Fetched {sum(len(table) for table in at_data.values())} records "
+             f"in {time.perf_counter() - start:.1f}s")
+
 unix_timestamp = int(time.time())
 for table_name, table in at_data.items():
     with open(f"{table_name}_{unix_timestamp}.json", "w") as storage:
@@ -0,0 +1,81 @@
+"""Gunicorn settings for serving the widget API.
+
+Widget requests spend most of their time waiting on the database, so each worker
+serves many requests concurrently instead of one at a time:
+
+- `gthread` (default): `GUNICORN_THREADS` threads per worker.
+- `gevent`: `GUNICORN_WORKER_CONNECTIONS` greenlets per worker. Needs `gevent` and,
+  on Postgres, `psycogreen` installed.
+- `sync`: one request at a time.
+
+The app sizes its database pool from the same settings, both come from
+`tfp_widget/serving.py`. This module does not import the app, so gevent can patch the
+standard library before anything else is loaded; `serving.py` is loaded by path, without
+`tfp_widget/__init__.py`.
+"""
+import glob
+import importlib.util
+import multiprocessing
+import os
+
+_spec = importlib.util.spec_from_file_location(
+    "tfp_widget_serving", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tfp_widget", "serving.py"))
+serving = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(serving)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 4)))
+worker_class = serving.worker_class()
+threads = serving.worker_threads()
+worker_connections = serving.worker_connections()
+
+# Heroku's router gives up after 30 seconds
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 20
+keepalive = 5
+
+# recycle workers now and then so slow leaks cannot build up
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = 200
+
+# loading the app before forking saves memory, but gevent has to patch first
+preload_app = worker_class != "gevent"
+
+accesslog = "-"
+
+
+# workers write Prometheus metrics here, see tfp_widget.metrics
+prometheus_multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+    # values left by the workers of an earlier run would be added to the new ones
+    if prometheus_multiproc_dir:
+        os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(prometheus_multiproc_dir, "*.db")):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    # connections opened before the fork belong to the master, see `tfp_widget.database.init_worker`
+    if preload_app:
+        from tfp_widget.database import init_worker
+
+        init_worker(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    if worker_class == "gevent":
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            worker.log.warning("psycogreen is not installed, Postgres queries will block the whole worker")
+        else:
+            patch_psycopg()
+
+
+def child_exit(server, worker):
+    if prometheus_multiproc_dir:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -90,11 +90,22 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    connectable = get_engine()
+
+    # the rep search structures are dialect specific and maintained by hand in
+    # the migrations, see tfp_widget.search
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'table' and name.startswith('reps_fts'):
+            return False
+        if type_ == 'index' and name.endswith('_trgm') and connectable.dialect.name != 'postgresql':
+            return False
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
-
-    connectable = get_engine()
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     with connectable.connect() as connection:
         context.configure(
@@ -0,0 +1,61 @@
+"""rep search indexes
+
+Revision ID: 52aa73b58e8c
+Revises: 91cfe59c44de
+Create Date: 2026-10-18 09:12:44.218301
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '52aa73b58e8c'
+down_revision = '91cfe59c44de'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ['name', 'state', 'district', 'role']
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in SEARCH_COLUMNS:
+            op.create_index(f'ix_reps_{column}_trgm', 'reps', [column], unique=False,
+                            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+    elif dialect == 'sqlite':
+        # reps_fts is keyed on the rowid of reps, which has no INTEGER PRIMARY KEY, so the
+        # rowids are not stable: VACUUM may renumber them, and rebuilding reps (any
+        # batch_alter_table on it) renumbers them and drops these triggers. A migration
+        # doing either must end with tfp_widget.search.rebuild_sqlite_fts(op.get_bind()),
+        # which recreates the triggers and runs the FTS 'rebuild' command.
+        op.execute("""CREATE VIRTUAL TABLE reps_fts USING fts5(
+            name, state, district, role, content='reps', content_rowid='rowid', tokenize='trigram')""")
+        op.execute("""CREATE TRIGGER reps_fts_ai AFTER INSERT ON reps BEGIN
+            INSERT INTO reps_fts(rowid, name, state, district, role)
+            VALUES (new.rowid, new.name, new.state, new.district, new.role);
+        END""")
+        op.execute("""CREATE TRIGGER reps_fts_ad AFTER DELETE ON reps BEGIN
+            INSERT INTO reps_fts(reps_fts, rowid, name, state, district, role)
+            VALUES ('delete', old.rowid, old.name, old.state, old.district, old.role);
+        END""")
+        op.execute("""CREATE TRIGGER reps_fts_au AFTER UPDATE ON reps BEGIN
+            INSERT INTO reps_fts(reps_fts, rowid, name, state, district, role)
+            VALUES ('delete', old.rowid, old.name, old.state, old.district, old.role);
+            INSERT INTO reps_fts(rowid, name, state, district, role)
+            VALUES (new.rowid, new.name, new.state, new.district, new.role);
+        END""")
+        op.execute("INSERT INTO reps_fts(reps_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for column in SEARCH_COLUMNS:
+            op.drop_index(f'ix_reps_{column}_trgm', table_name='reps')
+    elif dialect == 'sqlite':
+        for trigger in ['reps_fts_ai', 'reps_fts_ad', 'reps_fts_au']:
+            op.execute(f'DROP TRIGGER {trigger}')
+        op.execute('DROP TABLE reps_fts')
@@ -0,0 +1,45 @@
+"""reps_to_negative_bills indexes and foreign keys
+
+Revision ID: cedb78276723
+Revises: e9f0316c5f27
+Create Date: 2026-10-18 12:08:41.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cedb78276723'
+down_revision = 'e9f0316c5f27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # relations pointing at reps or bills that were never imported would violate the new keys
+    op.execute("""
+        DELETE FROM reps_to_negative_bills
+        WHERE rep_id NOT IN (SELECT id FROM reps)
+        OR negative_bills_id NOT IN (SELECT id FROM negative_bills)
+    """)
+    with op.batch_alter_table('reps_to_negative_bills', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_reps_to_negative_bills_relation', type_='unique')
+        batch_op.create_index('ix_reps_to_negative_bills_rep_type_bill',
+                              ['rep_id', 'relation_type', 'negative_bills_id'], unique=True)
+        batch_op.create_index('ix_reps_to_negative_bills_bill_type',
+                              ['negative_bills_id', 'relation_type'], unique=False)
+        batch_op.create_foreign_key('fk_reps_to_negative_bills_rep_id_reps',
+                                    'reps', ['rep_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_foreign_key('fk_reps_to_negative_bills_negative_bills_id_negative_bills',
+                                    'negative_bills', ['negative_bills_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('reps_to_negative_bills', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_reps_to_negative_bills_negative_bills_id_negative_bills', type_='foreignkey')
+        batch_op.drop_constraint('fk_reps_to_negative_bills_rep_id_reps', type_='foreignkey')
+        batch_op.drop_index('ix_reps_to_negative_bills_bill_type')
+        batch_op.drop_index('ix_reps_to_negative_bills_rep_type_bill')
+        batch_op.create_unique_constraint('uq_reps_to_negative_bills_relation',
+                                          ['rep_id', 'negative_bills_id', 'relation_type'])
@@ -0,0 +1,35 @@
+"""unique rep negative bill relations
+
+Revision ID: e9f0316c5f27
+Revises: 074dd2da43b8
+Create Date: 2026-10-18 11:26:05.318467
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9f0316c5f27'
+down_revision = '074dd2da43b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # keep the oldest copy of any duplicated relation so the constraint can be created
+    op.execute("""
+        DELETE FROM reps_to_negative_bills
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM reps_to_negative_bills
+            GROUP BY rep_id, negative_bills_id, relation_type
+        )
+    """)
+    with op.batch_alter_table('reps_to_negative_bills', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_reps_to_negative_bills_relation',
+                                          ['rep_id', 'negative_bills_id', 'relation_type'])
+
+
+def downgrade():
+    with op.batch_alter_table('reps_to_negative_bills', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_reps_to_negative_bills_relation', type_='unique')
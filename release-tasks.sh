@@ -7,13 +7,5 @@ set -x
 # Populate schema
 flask --app "tfp_widget:create_app('production')" db upgrade
 
-# Fetch airtable
-rm -f state_reps*.json national_reps*.json negative_bills*.json
-python dump_airtable.py
-ls -la *.json
-
-# Import airtable
-flask --app "tfp_widget:create_app('production')" import-airtable-json \
-  --state-reps-file state_reps*.json \
-  --national-reps-file national_reps*.json \
-  --negative-bills-file negative_bills*.json
\ No newline at end of file
+# Stream airtable into the database
+flask --app "tfp_widget:create_app('production')" sync-airtable
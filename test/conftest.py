@@ -1,5 +1,16 @@
+import gzip
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
 import pytest
+from sqlalchemy import event
 
+import tfp_widget.airtable.tfp_air_table as airtable
 from tfp_widget import create_app
 from tfp_widget.database import db
 
@@ -14,3 +25,121 @@ def client():
 
             db.session.remove()
             db.drop_all()
+
+
+@contextmanager
+def count_statements():
+    """Collect the SQL statements run on the app's engine inside the block.
+
+    Yields:
+        list: The statements, filled in as they are executed.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+TABLES = {
+    "tblStateReps": [{"id": f"recState{i}", "fields": {"Name": f"State {i}"}} for i in range(7)],
+    "tblNationalReps": [{"id": f"recNational{i}", "fields": {"Name": f"National {i}"}} for i in range(3)],
+    "tblBills": [{"id": f"recBill{i}", "fields": {"Case Name": f"Bill {i}"}} for i in range(5)],
+}
+PAGE_SIZE = 2
+
+
+class FakeAirtable(ThreadingHTTPServer):
+    """Serves `tables` in pages of PAGE_SIZE, answering selected requests with error statuses.
+
+    A `filterByFormula` from `modified_since_formula` is applied to the records' `Last Modified`,
+    `fields[]` projects the returned fields and bodies are gzipped when the client accepts it.
+    Every response takes at least `delay` seconds.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeAirtableHandler)
+        self.tables = TABLES
+        self.requests = []
+        self.formulas = []
+        self.fields = []
+        self.failures = []
+        self.delay = 0
+        self.lock = threading.Lock()
+
+
+class FakeAirtableHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        table_id = url.path.rsplit("/", 1)[-1]
+        query = parse_qs(url.query)
+        offset = int(query.get("offset", ["0"])[0])
+        formula = query.get("filterByFormula", [""])[0]
+        fields = query.get("fields[]")
+        with self.server.lock:
+            self.server.requests.append((table_id, offset))
+            self.server.formulas.append(formula)
+            self.server.fields.append(fields)
+            status = self.server.failures.pop(0) if self.server.failures else 200
+        time.sleep(self.server.delay)
+
+        if status != 200:
+            self.send_response(status)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        records = self.server.tables[table_id]
+        modified_since = re.search(r"DATETIME_PARSE\('([^']+)'\)", formula)
+        if modified_since:
+            records = [record for record in records
+                       if record["fields"].get("Last Modified", "") > modified_since.group(1)]
+        page = {"records": records[offset:offset + PAGE_SIZE]}
+        if fields:
+            page["records"] = [
+                {**record, "fields": {name: value for name, value in record["fields"].items() if name in fields}}
+                for record in page["records"]
+            ]
+        if offset + PAGE_SIZE < len(records):
+            page["offset"] = str(offset + PAGE_SIZE)
+        body = json.dumps(page).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_airtable(monkeypatch):
+    server = FakeAirtable()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    host, port = server.server_address
+    monkeypatch.setenv("AIRTABLE_API_URL", f"http://{host}:{port}/v0")
+    monkeypatch.setenv("AIRTABLE_BASE", "appTest")
+    monkeypatch.setenv("AIRTABLE_API_TOKEN", "token")
+    monkeypatch.setenv("STATE_REPS_TABLE", "tblStateReps")
+    monkeypatch.setenv("NATIONAL_REPS_TABLE", "tblNationalReps")
+    monkeypatch.setenv("NEGATIVE_BILLS_TABLE", "tblBills")
+    monkeypatch.setattr(airtable, "RETRY_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(airtable, "RATE_LIMITED_BACKOFF_SECONDS", 0.01)
+    # a fresh session, so the rate limit state does not leak between tests
+    monkeypatch.setattr(airtable, "session", airtable.LimiterSession(per_second=100))
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
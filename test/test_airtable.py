@@ -0,0 +1,110 @@
+import json
+import time
+
+import pytest
+
+import tfp_widget.airtable.tfp_air_table as airtable
+from conftest import TABLES
+
+
+def test_get_table_data_follows_offsets(fake_airtable):
+    records = airtable.get_table_data("STATE_REPS_TABLE")
+
+    assert records == TABLES["tblStateReps"]
+    assert fake_airtable.requests == [("tblStateReps", offset) for offset in [0, 2, 4, 6]]
+
+
+def test_get_tables_data(fake_airtable):
+    data = airtable.get_tables_data(["STATE_REPS_TABLE", "NATIONAL_REPS_TABLE", "NEGATIVE_BILLS_TABLE"])
+
+    assert data == {
+        "STATE_REPS_TABLE": TABLES["tblStateReps"],
+        "NATIONAL_REPS_TABLE": TABLES["tblNationalReps"],
+        "NEGATIVE_BILLS_TABLE": TABLES["tblBills"],
+    }
+
+
+def test_get_tables_data_fetches_tables_concurrently(fake_airtable):
+    fake_airtable.delay = 0.05
+
+    airtable.get_tables_data(["STATE_REPS_TABLE", "NATIONAL_REPS_TABLE", "NEGATIVE_BILLS_TABLE"])
+
+    # every table sent its first request before any table got to its second page
+    assert sorted(fake_airtable.requests[:3]) == [(table_id, 0) for table_id in sorted(TABLES)]
+
+
+def test_get_tables_data_shares_the_rate_limit(fake_airtable, monkeypatch):
+    # 2 pages per table, 6 requests in total
+    fake_airtable.tables = {table_id: records[:3] for table_id, records in TABLES.items()}
+    monkeypatch.setattr(airtable, "session", airtable.LimiterSession(per_second=3))
+
+    start = time.perf_counter()
+    airtable.get_tables_data(["STATE_REPS_TABLE", "NATIONAL_REPS_TABLE", "NEGATIVE_BILLS_TABLE"])
+
+    # with a budget per table no request would wait, with one shared budget the last 3 wait
+    # for the first second to pass
+    assert len(fake_airtable.requests) == 6
+    assert time.perf_counter() - start >= 0.9
+
+
+def test_retries_rate_limited_and_server_errors(fake_airtable):
+    fake_airtable.failures = [429, 503]
+
+    records = airtable.get_table_data("NATIONAL_REPS_TABLE")
+
+    assert records == TABLES["tblNationalReps"]
+    assert fake_airtable.requests == [("tblNationalReps", 0)] * 3 + [("tblNationalReps", 2)]
+
+
+def test_gives_up_after_max_retries(fake_airtable, monkeypatch):
+    monkeypatch.setattr(airtable, "MAX_RETRIES", 2)
+    fake_airtable.failures = [500] * 3
+
+    with pytest.raises(ConnectionError):
+        airtable.get_table_data("NEGATIVE_BILLS_TABLE")
+    assert len(fake_airtable.requests) == 3
+
+
+def test_get_table_data_modified_since(fake_airtable):
+    fake_airtable.tables = {"tblBills": [
+        {"id": "recOld", "fields": {"Last Modified": "2023-01-01T00:00:00.000Z"}},
+        {"id": "recNew", "fields": {"Last Modified": "2023-06-01T00:00:00.000Z"}},
+    ]}
+
+    records = airtable.get_table_data("NEGATIVE_BILLS_TABLE", modified_since="2023-03-01T00:00:00.000Z")
+
+    assert [record["id"] for record in records] == ["recNew"]
+    assert fake_airtable.formulas == [airtable.modified_since_formula("2023-03-01T00:00:00.000Z")]
+
+
+def test_does_not_retry_client_errors(fake_airtable):
+    fake_airtable.failures = [404]
+
+    with pytest.raises(ConnectionError):
+        airtable.get_table_data("NEGATIVE_BILLS_TABLE")
+    assert len(fake_airtable.requests) == 1
+
+
+def test_field_projection_and_transfer_stats(fake_airtable):
+    fake_airtable.tables = {"tblBills": [
+        {"id": f"rec{i}", "fields": {"Case Name": f"Bill {i}", "Summary": "lorem ipsum " * 200}} for i in range(3)
+    ]}
+    stats = {}
+
+    pages = list(airtable.iter_table_pages("NEGATIVE_BILLS_TABLE", fields=["Case Name"], stats=stats))
+
+    assert [record["fields"] for page in pages for record in page] == [{"Case Name": f"Bill {i}"} for i in range(3)]
+    assert fake_airtable.fields == [["Case Name"], ["Case Name"]]
+    assert stats["pages"] == 2
+    assert 0 < stats["bytes"] < len(json.dumps(fake_airtable.tables))
+
+
+def test_transferred_bytes_counts_compressed_body(fake_airtable):
+    fake_airtable.tables = {"tblBills": [{"id": "rec1", "fields": {"Summary": "lorem ipsum " * 1000}}]}
+    stats = {}
+
+    records = airtable.get_table_data("NEGATIVE_BILLS_TABLE")
+    list(airtable.iter_table_pages("NEGATIVE_BILLS_TABLE", stats=stats))
+
+    assert records[0]["fields"]["Summary"] == "lorem ipsum " * 1000
+    assert stats["bytes"] < 1000
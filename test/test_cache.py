@@ -0,0 +1,103 @@
+import time
+
+import pytest
+from flask import current_app
+
+from tfp_widget.cache import LocalCacheBackend, ResponseCache, SharedCacheBackend
+from tfp_widget.database import db
+from tfp_widget.models import DatasetVersion, Rep
+from test_views import negative_rep_example
+
+
+class FakeRedis:
+    """Local stand-in for the parts of the redis client used by SharedCacheBackend."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def scan_iter(self, match):
+        return [key for key in self.values if key.startswith(match.rstrip("*"))]
+
+    def delete(self, *keys):
+        for key in keys:
+            del self.values[key]
+
+
+@pytest.fixture
+def response_cache(client):
+    response_cache = ResponseCache(LocalCacheBackend())
+    current_app.extensions["tfp_response_cache"] = response_cache
+    db.session.add(Rep.from_airtable_record(negative_rep_example))
+    DatasetVersion.bump(db.session)
+    return response_cache
+
+
+def test_local_backend_evicts_least_recently_used():
+    backend = LocalCacheBackend(max_size=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+    assert backend.get("a") == 1
+    assert backend.get("b") is None
+    assert backend.get("c") == 3
+
+
+def test_local_backend_expires_entries():
+    backend = LocalCacheBackend(ttl=0)
+    backend.set("a", 1)
+    time.sleep(0.01)
+    assert backend.get("a") is None
+
+
+def test_shared_backend_with_local_stand_in():
+    response_cache = ResponseCache(SharedCacheBackend(FakeRedis()))
+    entry, hit = response_cache.get_or_build("key", 1, lambda: ("[]", {}))
+    assert not hit
+    entry, hit = response_cache.get_or_build("key", 1, lambda: ("[1]", {}))
+    assert hit
+    assert entry["body"] == "[]"
+    entry, hit = response_cache.get_or_build("key", 2, lambda: ("[1]", {}))
+    assert not hit
+    assert entry["body"] == "[1]"
+
+
+def test_search_is_cached(client, response_cache):
+    response = client.get('/api/reps/search/barhorst')
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+
+    response = client.get('/api/reps/search/%20BARHORST')
+    assert response.headers["X-Cache"] == "HIT"
+    assert response.json[0]["name"] == "Tim Barhorst"
+    assert response_cache.stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+    assert client.get('/api/status/cache').json["hits"] == 1
+
+
+def test_search_revalidation(client, response_cache):
+    etag = client.get('/api/reps/search/barhorst').headers["ETag"]
+    response = client.get('/api/reps/search/barhorst', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_import_invalidates_cache(client, response_cache):
+    assert len(client.get('/api/reps/search/barhorst').json) == 1
+
+    at_rep = dict(negative_rep_example, id="recOther")
+    at_rep["fields"] = dict(negative_rep_example["fields"], Name="Jim Barhorst")
+    db.session.add(Rep.from_airtable_record(at_rep))
+    db.session.commit()
+    assert len(client.get('/api/reps/search/barhorst').json) == 1
+
+    DatasetVersion.bump(db.session)
+    response = client.get('/api/reps/search/barhorst')
+    assert response.headers["X-Cache"] == "MISS"
+    assert len(response.json) == 2
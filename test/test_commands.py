@@ -0,0 +1,99 @@
+import copy
+import io
+import json
+
+import pytest
+
+from tfp_widget.database import db
+from tfp_widget.models import DatasetVersion, NegativeBills, Rep, RepDocument, RepsToNegativeBills
+from tfp_widget.streaming import batched, iter_json_records, prefetch, write_json_array
+from test_views import negative_bill_example, negative_rep_example
+
+RECORDS = [
+    {"id": "rec1", "fields": {"Name": "Ünïcode ☃", "Number": 12345}},
+    {"id": "rec2", "fields": {"Name": "Second", "List": [1, 2, {"nested": "]},"}]}},
+    {"id": "rec3", "fields": {}},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 65536])
+@pytest.mark.parametrize("document", [
+    json.dumps(RECORDS),
+    json.dumps(RECORDS, indent=4),
+    json.dumps({"records": RECORDS, "offset": "itr123/rec3"}),
+    json.dumps({"offset": "itr123/rec3", "records": RECORDS}, indent=2),
+    "\n".join(json.dumps(record) for record in RECORDS) + "\n",
+])
+def test_iter_json_records(document, chunk_size):
+    fp = io.BytesIO(document.encode("utf-8"))
+    assert list(iter_json_records(fp, chunk_size=chunk_size)) == RECORDS
+
+
+def test_iter_json_records_empty_array():
+    assert list(iter_json_records(io.BytesIO(b" [ ] "))) == []
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_prefetch_keeps_order():
+    assert list(prefetch(range(100), depth=3)) == list(range(100))
+
+
+def test_prefetch_raises_producer_errors():
+    def produce():
+        yield 1
+        raise ValueError("page failed")
+
+    items = prefetch(produce())
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="page failed"):
+        next(items)
+
+
+def test_prefetch_stops_producer_when_closed():
+    produced = []
+
+    def produce():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    items = prefetch(produce(), depth=2)
+    assert next(items) == 0
+    items.close()
+    # the producer only ran ahead by the queue depth and the item it was putting
+    assert len(produced) <= 4
+
+
+def test_write_json_array():
+    fp = io.StringIO()
+    assert list(write_json_array(iter(RECORDS), fp)) == RECORDS
+    assert json.loads(fp.getvalue()) == RECORDS
+
+
+def test_import_airtable_json(client, tmp_path):
+    at_reps = []
+    for i in range(5):
+        at_rep = copy.deepcopy(negative_rep_example)
+        at_rep["id"] = f"rec{i}"
+        at_reps.append(at_rep)
+    reps_file = tmp_path / "state_reps.json"
+    reps_file.write_text(json.dumps(at_reps))
+    bills_file = tmp_path / "negative_bills.json"
+    bills_file.write_text(json.dumps([negative_bill_example]))
+
+    runner = client.application.test_cli_runner()
+    result = runner.invoke(args=[
+        "import-airtable-json", "--state-reps-file", str(reps_file),
+        "--negative-bills-file", str(bills_file), "--batch-size", "2",
+    ])
+    assert result.exit_code == 0, result.output
+
+    assert Rep.query.count() == 5
+    assert NegativeBills.query.count() == 1
+    # a sponsorship and a yea vote per rep
+    assert RepsToNegativeBills.query.count() == 10
+    assert RepDocument.query.count() == 5
+    assert DatasetVersion.current(db.session).version == 1
@@ -0,0 +1,141 @@
+import copy
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+
+from tfp_widget import TestingConfig, config_by_name, create_app, database, serving
+from tfp_widget.database import (REPLICA_BIND_KEY, PoolStats, TimedQueuePool, db, engine_options, pool_status,
+                                 replica_binds)
+from tfp_widget.models import Rep
+from test_views import negative_rep_example
+
+POSTGRES_URL = "postgresql://user@localhost/tfp"
+
+
+@pytest.fixture
+def pool_stats(monkeypatch):
+    stats = PoolStats()
+    monkeypatch.setattr(database, "POOL_STATS", stats)
+    return stats
+
+
+def test_engine_options_defaults(monkeypatch):
+    monkeypatch.setenv("GUNICORN_WORKER_CLASS", "gthread")
+    monkeypatch.setenv("GUNICORN_THREADS", "4")
+    options = engine_options()
+    assert options["poolclass"] is TimedQueuePool
+    assert options["pool_size"] == 4
+    assert options["max_overflow"] == 0
+    assert options["pool_recycle"] == 1800
+    assert options["pool_pre_ping"] is True
+    assert "connect_args" not in engine_options(POSTGRES_URL)
+
+
+@pytest.mark.parametrize("worker_class, concurrency", [("gthread", 4), ("gevent", 50), ("sync", 1)])
+def test_worker_concurrency(monkeypatch, worker_class, concurrency):
+    monkeypatch.setenv("GUNICORN_WORKER_CLASS", worker_class)
+    monkeypatch.setenv("GUNICORN_THREADS", "4")
+    monkeypatch.setenv("GUNICORN_WORKER_CONNECTIONS", "50")
+    assert serving.worker_concurrency() == concurrency
+    assert engine_options()["pool_size"] == min(concurrency, database.MAX_DEFAULT_POOL_SIZE)
+    # sync workers with threads would silently run as gthread
+    assert serving.worker_threads() == (4 if worker_class == "gthread" else 1)
+
+
+def test_engine_options_from_env(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "2")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "60")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "5000")
+    options = engine_options(POSTGRES_URL)
+    assert (options["pool_size"], options["max_overflow"], options["pool_recycle"]) == (3, 2, 60)
+    assert options["pool_pre_ping"] is False
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+
+    # statement timeouts are passed to Postgres only
+    assert "connect_args" not in engine_options("sqlite:///test.db")
+
+
+def test_engine_options_pgbouncer(monkeypatch):
+    monkeypatch.setenv("DB_PGBOUNCER", "1")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "5000")
+    assert "connect_args" not in engine_options(POSTGRES_URL)
+    assert engine_options("postgresql+psycopg://user@localhost/tfp")["connect_args"] == {"prepare_threshold": None}
+
+
+def test_timed_pool_records_checkouts(pool_stats, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=TimedQueuePool, pool_size=1,
+                           max_overflow=0, pool_timeout=0.1)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        assert pool_status(engine)["checkedout"] == 1
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    assert pool_status(engine) == {"pool": "TimedQueuePool", "size": 1, "checkedin": 1, "checkedout": 0,
+                                   "overflow": 0}
+
+    stats = pool_stats.to_dict()
+    assert stats["checkouts"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["max_wait_seconds"] >= 0.1
+    engine.dispose()
+
+
+def test_pool_status_endpoint(client, pool_stats):
+    response = client.get("/api/status/pool")
+    assert response.status_code == 200
+    assert set(response.json["engines"]) == {"default"}
+    assert response.json["checkouts"] == 0
+
+
+@pytest.fixture
+def replica_app(tmp_path, monkeypatch):
+    class ReplicaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path}/primary.db"
+        SQLALCHEMY_BINDS = {REPLICA_BIND_KEY: f"sqlite:///{tmp_path}/replica.db"}
+
+    monkeypatch.setitem(config_by_name, "replica", ReplicaConfig)
+    app = create_app("replica")
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines[REPLICA_BIND_KEY])
+        yield app
+        db.session.remove()
+    # `db` is shared by all apps, keep the other tests' create_all and drop_all off the replica
+    db.metadatas.pop(REPLICA_BIND_KEY)
+
+
+def add_rep(bind, name):
+    at_rep = copy.deepcopy(negative_rep_example)
+    at_rep["fields"]["Name"] = name
+    with Session(bind) as session:
+        session.add(Rep.from_airtable_record(at_rep))
+        session.commit()
+
+
+def test_read_views_use_replica(replica_app):
+    add_rep(db.engines[None], "Primary Barhorst")
+    add_rep(db.engines[REPLICA_BIND_KEY], "Replica Barhorst")
+
+    with replica_app.test_client() as client:
+        response = client.get("/api/reps/search/barhorst")
+    assert [rep["name"] for rep in response.json] == ["Replica Barhorst"]
+
+    # outside read only views, e.g. in commands, the session uses the primary
+    assert db.session.get_bind() is db.engines[None]
+    assert db.session.scalars(select(Rep.name)).all() == ["Primary Barhorst"]
+
+
+def test_without_replica_reads_use_primary(client):
+    add_rep(db.engine, "Primary Barhorst")
+    assert [rep["name"] for rep in client.get("/api/reps/search/barhorst").json] == ["Primary Barhorst"]
+
+
+def test_replica_binds():
+    assert replica_binds(None) == {}
+    bind = replica_binds("postgres://user@replica/tfp")[REPLICA_BIND_KEY]
+    assert bind["url"] == "postgresql://user@replica/tfp"
+    assert bind["poolclass"] is TimedQueuePool
@@ -0,0 +1,72 @@
+import gzip
+import json
+
+from tfp_widget import exports, schema
+from tfp_widget.database import db
+from tfp_widget.models import ExportSnapshot, NegativeBills
+from test_views import add_reps_with_bill
+
+
+def test_reps_export(client):
+    add_reps_with_bill(3)
+    assert exports.refresh_exports(db.session) == {"reps": "built", "negative_bills": "built"}
+
+    response = client.get("/api/reps/export", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.content_encoding == "gzip"
+    assert response.headers["ETag"] == f'"{db.session.get(ExportSnapshot, "reps").etag}"'
+    documents = json.loads(gzip.decompress(response.data))
+    assert [document["id"] for document in documents] == ["rec0", "rec1", "rec2"]
+    assert documents == client.get("/api/reps/search/barhorst").json
+
+
+def test_export_without_gzip(client):
+    add_reps_with_bill(1)
+    exports.refresh_exports(db.session)
+
+    response = client.get("/api/negative-bills/export")
+    assert response.content_encoding is None
+    bills = json.loads(response.data)
+    assert [bill["caseName"] for bill in bills] == ["OH HB68"]
+    assert bills[0]["category"] == ["Health Care", "Sports"]
+
+
+def test_export_if_none_match(client):
+    add_reps_with_bill(2)
+    exports.refresh_exports(db.session)
+    etag = client.get("/api/reps/export").headers["ETag"]
+
+    response = client.get("/api/reps/export", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    response = client.get("/api/reps/export", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+
+
+def test_exports_rebuild_when_rows_change(client):
+    add_reps_with_bill(2)
+    exports.refresh_exports(db.session)
+    old_etag = db.session.get(ExportSnapshot, "reps").etag
+    assert exports.refresh_exports(db.session) == {"reps": "unchanged", "negative_bills": "unchanged"}
+
+    # rep documents list bill case names, so a bill change changes the reps export too
+    bill = db.session.query(NegativeBills).one()
+    bill.case_name = "OH HB69"
+    bill.checksum = bill.sha256()
+    db.session.commit()
+    schema.refresh_rep_documents(db.session)
+
+    assert exports.refresh_exports(db.session) == {"reps": "built", "negative_bills": "built"}
+    assert db.session.get(ExportSnapshot, "reps").etag != old_etag
+    documents = json.loads(client.get("/api/reps/export").data)
+    assert documents[0]["billsSponsored"] == ["OH HB69"]
+
+
+def test_export_built_on_demand_before_first_import(client):
+    add_reps_with_bill(1)
+
+    response = client.get("/api/reps/export")
+    assert response.status_code == 200
+    assert len(json.loads(response.data)) == 1
+    assert db.session.get(ExportSnapshot, "reps") is None
@@ -0,0 +1,77 @@
+import logging
+import re
+
+from flask import current_app
+
+from tfp_widget.instrumentation import get_request_metrics, timed
+from test_views import add_reps_with_bill, count_search_queries
+
+
+def server_timing(response):
+    """Parse a Server-Timing header into name -> (duration, description)."""
+    metrics = {}
+    for metric in response.headers["Server-Timing"].split(", "):
+        name, *params = metric.split(";")
+        params = dict(param.split("=", 1) for param in params)
+        metrics[name] = (float(params["dur"]), params.get("desc", "").strip('"'))
+    return metrics
+
+
+def request_log_lines(caplog):
+    # `client` keeps the last request context open, the log line is written when it ends,
+    # so tests checking it use clients from `current_app.test_client()`
+    return [record for record in caplog.records if record.getMessage().startswith("request ")]
+
+
+def test_server_timing(client):
+    add_reps_with_bill(3)
+    query_count, _ = count_search_queries(client, "barhorst")
+
+    metrics = server_timing(client.get("/api/reps/search/barhorst"))
+    assert set(metrics) == {"db", "serialize", "total"}
+    assert metrics["db"][1] == f"{query_count} queries"
+    assert metrics["total"][0] >= metrics["db"][0]
+
+    current_app.config["SERVER_TIMING"] = False
+    assert "Server-Timing" not in client.get("/api/reps/search/barhorst").headers
+
+
+def test_request_log_and_query_budget(client, caplog):
+    add_reps_with_bill(3)
+    query_count, _ = count_search_queries(client, "barhorst")
+    closing_client = current_app.test_client()
+
+    with caplog.at_level(logging.INFO):
+        caplog.clear()
+        closing_client.get("/api/reps/search/barhorst")
+        [record] = request_log_lines(caplog)
+        assert record.levelno == logging.INFO
+        assert re.match(rf"request method=GET path=/api/reps/search/barhorst status=200 queries={query_count} "
+                        r"db_ms=[\d.]+ rows=\d+ serialize_ms=[\d.]+ total_ms=[\d.]+$", record.getMessage())
+
+        current_app.config["QUERY_BUDGET"] = query_count - 1
+        caplog.clear()
+        closing_client.get("/api/reps/search/barhorst")
+        [record] = request_log_lines(caplog)
+        assert record.levelno == logging.WARNING
+        assert record.getMessage().endswith(f"over_query_budget={query_count - 1}")
+
+
+def test_streamed_queries_are_logged(client, caplog):
+    add_reps_with_bill(3)
+    closing_client = current_app.test_client()
+
+    with caplog.at_level(logging.INFO):
+        response = closing_client.get("/api/reps/search/barhorst?format=ndjson")
+        # the log line is written once the last batch has been sent
+        response.get_data()
+        [record] = request_log_lines(caplog)
+        response.close()
+    queries = int(re.search(r"queries=(\d+)", record.getMessage()).group(1))
+    assert queries > 0
+
+
+def test_timed_outside_requests(client):
+    with timed("serialize"):
+        pass
+    assert get_request_metrics() is None
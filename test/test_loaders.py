@@ -0,0 +1,78 @@
+import copy
+
+from flask import current_app
+
+from tfp_widget import schema
+from tfp_widget.database import db
+from tfp_widget.loaders import NegativeBillsLoader
+from tfp_widget.models import NegativeBills
+from conftest import count_statements
+from test_views import negative_bill_example
+
+
+def add_bills(count):
+    for i in range(count):
+        at_bill = copy.deepcopy(negative_bill_example)
+        at_bill["id"] = f"bill{i}"
+        at_bill["fields"]["Case Name"] = f"OH HB{i}"
+        db.session.add(NegativeBills.from_airtable_record(at_bill))
+    db.session.commit()
+
+
+def test_get_negative_bill(client):
+    add_bills(2)
+
+    response = client.get("/api/negative-bills/bill1")
+    assert response.status_code == 200
+    assert response.json == schema.negative_bills_schema.dump([db.session.get(NegativeBills, "bill1")])[0]
+
+    assert client.get("/api/negative-bills/nope").status_code == 404
+
+
+def test_get_negative_bills_by_ids(client):
+    add_bills(3)
+
+    response = client.get("/api/negative-bills?ids=bill2, nope,bill0,bill2")
+    assert response.status_code == 200
+    assert [bill["caseName"] for bill in response.json] == ["OH HB2", "OH HB0", "OH HB2"]
+
+    assert client.get("/api/negative-bills").status_code == 400
+    ids = ",".join(f"bill{i}" for i in range(501))
+    assert client.get(f"/api/negative-bills?ids={ids}").status_code == 400
+
+
+def test_loader_batches_and_caches(client):
+    add_bills(20)
+    documents = current_app.extensions["tfp_bill_documents"]
+    bill_ids = [f"bill{i}" for i in range(20)]
+
+    # one query for the checksums, one for the bills to serialize
+    loader = NegativeBillsLoader(db.session, documents)
+    with count_statements() as statements:
+        bills = loader.load_many(bill_ids)
+    assert len(statements) == 2
+    assert [bill["id"] for bill in bills] == bill_ids
+
+    # the request's identity map answers repeated lookups without a query
+    with count_statements() as statements:
+        loader.load("bill3")
+    assert statements == []
+
+    # a later request only needs the checksums
+    with count_statements() as statements:
+        cached_bills = NegativeBillsLoader(db.session, documents).load_many(bill_ids)
+    assert len(statements) == 1
+    assert cached_bills == bills
+
+
+def test_loader_cache_follows_checksums(client):
+    add_bills(1)
+    documents = current_app.extensions["tfp_bill_documents"]
+    NegativeBillsLoader(db.session, documents).load("bill0")
+
+    bill = db.session.get(NegativeBills, "bill0")
+    bill.case_name = "OH HB999"
+    bill.checksum = bill.sha256()
+    db.session.commit()
+
+    assert NegativeBillsLoader(db.session, documents).load("bill0")["caseName"] == "OH HB999"
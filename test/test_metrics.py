@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+
+from flask import current_app
+from prometheus_client import REGISTRY
+
+from tfp_widget import metrics
+from tfp_widget.airtable import tfp_air_table as airtable
+from tfp_widget.models import Rep
+from test_views import add_reps_with_bill, negative_rep_example
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_endpoint(client):
+    add_reps_with_bill(3)
+    labels = dict(endpoint="repsresource", method="GET", status="200")
+    before = sample("tfp_request_duration_seconds_count", **labels)
+
+    # a client that ends its request contexts, the request is observed when it ends
+    current_app.test_client().get("/api/reps/search/barhorst")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    assert sample("tfp_request_duration_seconds_count", **labels) == before + 1
+    assert 'tfp_request_duration_seconds_count{endpoint="repsresource",method="GET",status="200"}' \
+        in response.get_data(as_text=True)
+
+
+def test_metrics_token(client):
+    current_app.config["METRICS_TOKEN"] = "secret"
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+def test_relation_counters(client):
+    added = sample("tfp_import_relations_total", result="added")
+
+    add_reps_with_bill(3)
+
+    assert sample("tfp_import_relations_total", result="added") == added + 6
+
+
+def test_bulk_upsert_counters(client):
+    before = {result: sample("tfp_import_rows_total", model="Rep", result=result)
+              for result in ["inserted", "unchanged"]}
+    Rep.bulk_upsert([negative_rep_example])
+    Rep.bulk_upsert([negative_rep_example])
+
+    assert sample("tfp_import_rows_total", model="Rep", result="inserted") == before["inserted"] + 1
+    assert sample("tfp_import_rows_total", model="Rep", result="unchanged") == before["unchanged"] + 1
+
+
+def test_airtable_counters(fake_airtable):
+    fake_airtable.failures = [429]
+    pages = sample("tfp_airtable_pages_total", table="tblStateReps")
+    retries = sample("tfp_airtable_retries_total", table="tblStateReps", status="429")
+
+    airtable.get_table_data("STATE_REPS_TABLE")
+
+    assert sample("tfp_airtable_pages_total", table="tblStateReps") == pages + 4
+    assert sample("tfp_airtable_retries_total", table="tblStateReps", status="429") == retries + 1
+
+
+def test_airtable_throttle_wait(fake_airtable, monkeypatch):
+    # the fourth of the four pages has to wait for the first to leave the one second window
+    monkeypatch.setattr(airtable, "session", airtable.LimiterSession(per_second=3))
+    before = sample("tfp_airtable_throttle_wait_seconds_total", table="tblStateReps")
+
+    airtable.get_table_data("STATE_REPS_TABLE")
+
+    assert sample("tfp_airtable_throttle_wait_seconds_total", table="tblStateReps") - before > 0.5
+
+
+def test_import_command_pushes(monkeypatch):
+    pushed = []
+    monkeypatch.setattr(metrics, "push_to_gateway", lambda url, job, registry: pushed.append((url, job)))
+    before = sample("tfp_import_duration_seconds_count", command="test-import")
+
+    metrics.import_command("test-import")(lambda: None)()
+    assert pushed == []
+
+    monkeypatch.setenv("PROMETHEUS_PUSHGATEWAY_URL", "localhost:9091")
+    metrics.import_command("test-import")(lambda: None)()
+    assert pushed == [("localhost:9091", "test-import")]
+    assert sample("tfp_import_duration_seconds_count", command="test-import") == before + 2
+
+
+def test_multiprocess_metrics_are_summed(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), PYTHONPATH=os.getcwd())
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", "from tfp_widget import metrics; "
+                        "metrics.CACHE_LOOKUPS.labels('response', 'hit').inc(3)"], env=env, check=True)
+
+    output = subprocess.run([sys.executable, "-c", "from tfp_widget import metrics; "
+                             "print(metrics.generate()[0].decode())"],
+                            env=env, check=True, capture_output=True, text=True).stdout
+    assert 'tfp_cache_lookups_total{cache="response",result="hit"} 6.0' in output
+
+
+def test_multiprocess_dir_is_created(tmp_path):
+    multiproc_dir = tmp_path / "metrics" / "workers"
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(multiproc_dir), PYTHONPATH=os.getcwd())
+    subprocess.run([sys.executable, "-c", "from tfp_widget import metrics; print(metrics.generate()[0].decode())"],
+                   env=env, check=True, capture_output=True)
+    assert multiproc_dir.is_dir()
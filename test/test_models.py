@@ -1,9 +1,12 @@
 import copy
 from unittest.mock import patch
 
+from sqlalchemy import select, text
+
 from tfp_widget import create_app
 from tfp_widget.database import db
-from tfp_widget.models import Rep, RepsToNegativeBills
+from tfp_widget.models import NegativeBills, PendingRelation, Rep, RepsToNegativeBills
+from conftest import count_statements
 
 app = create_app("testing")
 
@@ -145,14 +148,17 @@ def test_rep_upsert_no_changes(client):
         assert observed_william.count() == 1, "There should be only one William record"
 
 
-def test_relation_insert(client):
-    with app.test_client():
-        RepsToNegativeBills.rep_negative_bill_relation_insert("foo", "bar", "test", db.session)
-        db.session.commit()
-        result = RepsToNegativeBills.query.filter_by(rep_id="foo").first()
-        assert result.rep_id == "foo"
-        assert result.negative_bills_id == "bar"
-        assert result.relation_type == "test"
+def add_rep_and_bills(at_reps):
+    """Store the reps and every negative bill they link to, so relations can reference them."""
+    Rep.bulk_upsert(at_reps)
+    bills = []
+    for at_rep in at_reps:
+        for _, bill_id, _ in RepsToNegativeBills.relations_from_airtable_record(at_rep):
+            bill = copy.deepcopy(negative_bills_json_example)
+            bill["id"] = bill_id
+            bill["fields"]["Case Name"] = bill_id
+            bills.append(bill)
+    NegativeBills.bulk_upsert(bills)
 
 
 def test_insert_of_multiple_relations(client):
@@ -161,6 +167,7 @@ def test_insert_of_multiple_relations(client):
     rep["fields"]["Nay Votes"] = ["Nay", "Nay2"]
     rep["fields"]["Bills to Contact about"] = ["Contact1", "Contact2"]
     rep["fields"]["Sponsorships"] = ["Sponsor1", "Sponsor2"]
+    add_rep_and_bills([rep])
 
     with app.app_context():
         RepsToNegativeBills.rep_build_all_relations([rep], db.session)
@@ -191,3 +198,202 @@ def test_insert_of_relations_no_relations(client):
 
         results = RepsToNegativeBills.query.filter_by(rep_id=rep_json_example["id"])
         assert results.count() == 0
+
+
+def test_bulk_upsert_counts(client):
+    other_rep = copy.deepcopy(rep_json_example)
+    other_rep["id"] = "recOther"
+    other_rep["fields"]["Name"] = "Other Rep"
+    invalid_rep = {"id": "recInvalid", "fields": {}}
+
+    counts = Rep.bulk_upsert([rep_json_example, other_rep, invalid_rep])
+    assert counts == {"inserted": 2, "updated": 0, "unchanged": 0, "invalid": 1}
+
+    changed_rep = copy.deepcopy(rep_json_example)
+    changed_rep["fields"]["Name"] = "Winifred Galvin"
+    counts = Rep.bulk_upsert([changed_rep, other_rep], batch_size=1)
+    assert counts == {"inserted": 0, "updated": 1, "unchanged": 1, "invalid": 0}
+
+    assert Rep.query.count() == 2
+    assert db.session.get(Rep, rep_json_example["id"]).name == "Winifred Galvin"
+    assert db.session.get(Rep, rep_json_example["id"]).checksum == Rep.from_airtable_record(changed_rep).checksum
+
+
+def test_bulk_upsert_is_batched(client):
+    at_reps = []
+    for i in range(250):
+        at_rep = copy.deepcopy(rep_json_example)
+        at_rep["id"] = f"rec{i}"
+        at_reps.append(at_rep)
+
+    with count_statements() as statements:
+        counts = Rep.bulk_upsert(at_reps, batch_size=100)
+
+    assert counts["inserted"] == 250
+    assert Rep.query.count() == 250
+    # one checksum lookup, then an INSERT per batch of 100
+    assert len(statements) == 4
+
+
+def test_bulk_upsert_unchanged_reimport_does_not_write(client):
+    other_rep = copy.deepcopy(rep_json_example)
+    other_rep["id"] = "recOther"
+    Rep.bulk_upsert([rep_json_example, other_rep])
+
+    with count_statements() as statements:
+        counts = Rep.bulk_upsert([rep_json_example, other_rep])
+
+    assert counts == {"inserted": 0, "updated": 0, "unchanged": 2, "invalid": 0}
+    assert [statement for statement in statements if not statement.startswith("SELECT")] == []
+
+
+def test_checksum_of_matches_sha256():
+    for model, at_record in [(Rep, rep_json_example), (NegativeBills, negative_bills_json_example)]:
+        instance = model.from_airtable_record(at_record)
+        assert model.checksum_of(model.columns_from_airtable_record(at_record)) == instance.checksum
+
+
+def test_rep_upsert_unchanged_record_is_not_rewritten(client):
+    with app.app_context():
+        db.session.add(Rep.upsert(at_record=rep_json_example))
+        db.session.commit()
+
+        found = Rep.upsert(at_record=rep_json_example)
+        assert found not in db.session.dirty
+
+
+def test_relation_sync_adds_and_removes(client):
+    rep = copy.deepcopy(rep_json_example)
+    rep["fields"]["Yea Votes"] = ["Bill1", "Bill2"]
+    rep["fields"]["Sponsorships"] = ["Bill1"]
+    add_rep_and_bills([rep])
+    counts = RepsToNegativeBills.rep_build_all_relations([rep], db.session)
+    assert counts == {"added": 3, "removed": 0, "unchanged": 0, "pending": 0}
+
+    rep["fields"]["Yea Votes"] = ["Bill2", "Bill3", "Bill3"]
+    add_rep_and_bills([rep])
+    counts = RepsToNegativeBills.rep_build_all_relations([rep], db.session)
+    assert counts == {"added": 1, "removed": 1, "unchanged": 2, "pending": 0}
+
+    relations = set(RepsToNegativeBills.load_relations([rep["id"]], db.session))
+    assert relations == {
+        (rep["id"], "Bill2", "yea_vote"),
+        (rep["id"], "Bill3", "yea_vote"),
+        (rep["id"], "Bill1", "sponsorship"),
+    }
+
+
+def test_relation_sync_leaves_other_reps_alone(client):
+    rep = copy.deepcopy(rep_json_example)
+    rep["fields"]["Yea Votes"] = ["Bill1"]
+    other_rep = copy.deepcopy(rep)
+    other_rep["id"] = "recOther"
+    add_rep_and_bills([rep, other_rep])
+    RepsToNegativeBills.rep_build_all_relations([rep, other_rep], db.session)
+
+    rep["fields"]["Yea Votes"] = []
+    RepsToNegativeBills.rep_build_all_relations([rep], db.session)
+
+    assert RepsToNegativeBills.query.filter_by(rep_id=rep["id"]).count() == 0
+    assert RepsToNegativeBills.query.filter_by(rep_id="recOther").count() == 1
+
+
+def test_relation_sync_defers_missing_bills(client):
+    rep = copy.deepcopy(rep_json_example)
+    rep["fields"]["Yea Votes"] = ["Bill1"]
+    add_rep_and_bills([rep])
+    rep["fields"]["Yea Votes"] = ["Bill1", "Missing"]
+
+    counts = RepsToNegativeBills.rep_build_all_relations([rep], db.session)
+    assert counts == {"added": 1, "removed": 0, "unchanged": 0, "pending": 1}
+    assert PendingRelation.query.count() == 1
+
+    bill = copy.deepcopy(negative_bills_json_example)
+    bill["id"] = "Missing"
+    NegativeBills.bulk_upsert([bill])
+    assert RepsToNegativeBills.insert_pending(db.session) == 1
+
+    assert (rep["id"], "Missing", "yea_vote") in RepsToNegativeBills.load_relations([rep["id"]], db.session)
+    assert PendingRelation.query.count() == 0
+
+
+def test_relations_to_bills_imported_later(client):
+    """Relations imported before their negative bills are inserted once the bills arrive."""
+    rep = copy.deepcopy(rep_json_example)
+    rep["fields"]["Yea Votes"] = ["Yea1", "Yea2"]
+    rep["fields"]["Nay Votes"] = ["Nay", "Nay2"]
+    rep["fields"]["Bills to Contact about"] = ["Contact1", "Contact2"]
+    rep["fields"]["Sponsorships"] = ["Sponsor1", "Sponsor2"]
+    Rep.bulk_upsert([rep])
+
+    counts = RepsToNegativeBills.rep_build_all_relations([rep], db.session)
+    assert counts["pending"] == 8
+    assert RepsToNegativeBills.query.filter_by(rep_id=rep["id"]).count() == 0
+
+    # a rep resync replaces its pending relations
+    rep["fields"]["Sponsorships"] = ["Sponsor1"]
+    counts = RepsToNegativeBills.rep_build_all_relations([rep], db.session)
+    assert counts["pending"] == 7
+
+    add_rep_and_bills([rep])
+    assert RepsToNegativeBills.insert_pending(db.session) == 7
+    assert RepsToNegativeBills.query.filter_by(rep_id=rep["id"]).count() == 7
+    assert RepsToNegativeBills.insert_pending(db.session) == 0
+
+
+def query_plan(statement):
+    compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return " / ".join(row[-1] for row in rows)
+
+
+def test_relation_queries_use_indexes(client):
+    by_rep = query_plan(RepsToNegativeBills.case_names_query(["rec1", "rec2"], ["yea_vote", "nay_vote"]))
+    assert "SEARCH reps_to_negative_bills USING COVERING INDEX ix_reps_to_negative_bills_rep_type_bill" in by_rep
+    assert "SEARCH negative_bills USING INDEX sqlite_autoindex_negative_bills_1 (id=?)" in by_rep
+    # relations come back in insertion order, which no index over several reps provides;
+    # the sort only sees the matched rows, never a scan of the table
+    assert "USE TEMP B-TREE FOR ORDER BY" in by_rep
+    assert "SCAN" not in by_rep
+
+    duplicate_check = query_plan(
+        select(RepsToNegativeBills)
+        .where(RepsToNegativeBills.rep_id == "rec1")
+        .where(RepsToNegativeBills.negative_bills_id == "bill1")
+        .where(RepsToNegativeBills.relation_type == "yea_vote")
+    )
+    assert "SEARCH reps_to_negative_bills USING COVERING INDEX ix_reps_to_negative_bills_rep_type_bill" \
+           in duplicate_check
+
+    by_bill = query_plan(
+        select(RepsToNegativeBills.rep_id)
+        .where(RepsToNegativeBills.negative_bills_id == "bill1")
+        .where(RepsToNegativeBills.relation_type == "sponsorship")
+    )
+    assert "SEARCH reps_to_negative_bills USING INDEX ix_reps_to_negative_bills_bill_type" in by_bill
+
+
+class FieldRecorder(dict):
+    """Airtable `fields` stand-in remembering which fields were read."""
+
+    def __init__(self):
+        super().__init__()
+        self.read = set()
+
+    def __getitem__(self, name):
+        self.read.add(name)
+        return "value"
+
+    def get(self, name, default=None):
+        self.read.add(name)
+        return default
+
+
+def test_airtable_fields_cover_what_importers_read():
+    for model in [Rep, NegativeBills]:
+        fields = FieldRecorder()
+        at_record = {"id": "rec1", "createdTime": "2023-04-11T23:16:25.000Z", "fields": fields}
+        model.columns_from_airtable_record(at_record)
+        if model is Rep:
+            RepsToNegativeBills.relations_from_airtable_record(at_record)
+        assert fields.read == set(model.airtable_fields), model.__name__
@@ -0,0 +1,265 @@
+import copy
+import json
+import os
+import random
+
+import pytest
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from flask import current_app
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from tfp_widget.database import db
+from tfp_widget.models import DatasetVersion, Rep
+from tfp_widget.search_index import RepSearchIndex
+from tfp_widget.search import LikeSearchBackend, MemorySearchBackend, PostgresTrigramSearchBackend, SqliteFtsSearchBackend
+from tfp_widget.search import rebuild_sqlite_fts
+from test_views import negative_rep_example
+
+
+def add_rep(rep_id, name, district="85"):
+    at_rep = copy.deepcopy(negative_rep_example)
+    at_rep["id"] = rep_id
+    at_rep["fields"]["Name"] = name
+    at_rep["fields"]["District"] = district
+    rep = Rep.from_airtable_record(at_rep)
+    db.session.add(rep)
+    db.session.commit()
+    return rep
+
+
+@pytest.fixture
+def reps(client):
+    add_rep("recA", "Timothy Alexander Barhorst the Third")
+    add_rep("recB", "Tim Barhorst")
+    add_rep("recC", "Jane Doe", district="Barhorst County")
+    add_rep("recD", "John Smith")
+
+
+def search_ids(backend, search_query, limit=10, position=None):
+    reps, next_position = backend.search(db.session, search_query, limit, position)
+    return [rep.id for rep in reps], next_position
+
+
+def test_fts_matches_like_backend(reps):
+    for search_query in ["barhorst", "BARH", "ohio", "house rep", "nobody"]:
+        fts_ids, _ = search_ids(SqliteFtsSearchBackend(), search_query)
+        like_ids, _ = search_ids(LikeSearchBackend(), search_query)
+        assert sorted(fts_ids) == sorted(like_ids), search_query
+
+
+def test_fts_ranks_by_relevance(reps):
+    ids, _ = search_ids(SqliteFtsSearchBackend(), "barhorst")
+    assert ids[0] == "recB"
+    assert set(ids) == {"recA", "recB", "recC"}
+
+
+def test_fts_pagination(reps):
+    backend = SqliteFtsSearchBackend()
+    all_ids, _ = search_ids(backend, "barhorst")
+
+    paged_ids = []
+    position = None
+    while True:
+        ids, position = search_ids(backend, "barhorst", limit=1, position=position)
+        paged_ids.extend(ids)
+        if position is None:
+            break
+    assert paged_ids == all_ids
+
+
+def test_fts_short_query_falls_back_to_like(reps):
+    ids, _ = search_ids(SqliteFtsSearchBackend(), "oe")
+    assert ids == ["recC"]
+
+
+def test_fts_follows_updates(reps):
+    rep = db.session.get(Rep, "recD")
+    rep.name = "John Barhorst"
+    db.session.commit()
+    ids, _ = search_ids(SqliteFtsSearchBackend(), "smith")
+    assert ids == []
+    ids, _ = search_ids(SqliteFtsSearchBackend(), "barhorst")
+    assert "recD" in ids
+
+    db.session.delete(rep)
+    db.session.commit()
+    ids, _ = search_ids(SqliteFtsSearchBackend(), "barhorst")
+    assert "recD" not in ids
+
+
+def test_fts_rebuild_after_reps_table_rebuild(reps):
+    db.session.delete(db.session.get(Rep, "recA"))
+    db.session.commit()
+    # what a migration altering reps does on SQLite: copy it, renumbering the rowids
+    with db.engine.begin() as connection:
+        with Operations(MigrationContext.configure(connection)).batch_alter_table("reps", recreate="always"):
+            pass
+    ids, _ = search_ids(SqliteFtsSearchBackend(), "barhorst")
+    assert sorted(ids) != ["recB", "recC"]
+
+    with db.engine.begin() as connection:
+        rebuild_sqlite_fts(connection)
+    ids, _ = search_ids(SqliteFtsSearchBackend(), "barhorst")
+    assert sorted(ids) == ["recB", "recC"]
+    add_rep("recE", "Ann Barhorst")
+    ids, _ = search_ids(SqliteFtsSearchBackend(), "barhorst")
+    assert sorted(ids) == ["recB", "recC", "recE"]
+
+
+def test_memory_index_matches_like_backend(reps):
+    backend = MemorySearchBackend()
+    for search_query in ["barhorst", "BARH", "o", "oe", "ohio", "house rep", "nobody"]:
+        documents, _ = backend.search_documents(db.session, search_query, 10)
+        like_ids, _ = search_ids(LikeSearchBackend(), search_query)
+        assert sorted(document["id"] for document in documents) == sorted(like_ids), search_query
+
+
+def test_memory_index_ranking_and_pagination(reps):
+    backend = MemorySearchBackend()
+    documents, _ = backend.search_documents(db.session, "barhorst", 10)
+    assert [document["id"] for document in documents] == ["recB", "recC", "recA"]
+
+    paged_ids = []
+    position = None
+    while True:
+        documents, position = backend.search_documents(db.session, "barhorst", 1, position)
+        paged_ids.extend(document["id"] for document in documents)
+        if position is None:
+            break
+    assert paged_ids == ["recB", "recC", "recA"]
+
+
+def test_memory_index_pages_match_a_full_ranking():
+    rng = random.Random(0)
+    documents = [
+        {"id": f"rec{i:04d}", "name": "".join(rng.choices("abcde ", k=rng.randint(3, 30))),
+         "state": rng.choice(["Ohio", "Texas", "New Hampshire"]), "district": str(rng.randint(1, 99)),
+         "role": rng.choice(["House Representative", "Senator"])}
+        for i in range(300)
+    ]
+    index = RepSearchIndex(documents)
+    for search_query in ["a", "Ab", "cde", "abca", "e ab", "ohio", "house rep", "1", "zzzz"]:
+        query = search_query.lower()
+        expected = sorted(
+            (-len(query) / min(len(value) for value in values if query in value), document["id"])
+            for document, values in zip(index.documents, index.values) if any(query in value for value in values)
+        )
+
+        paged_ids = []
+        position = None
+        while True:
+            page, position = index.search(search_query, 7, position)
+            paged_ids.extend(document["id"] for document in page)
+            if position is None:
+                break
+        assert paged_ids == [rep_id for _, rep_id in expected], search_query
+
+
+def test_memory_index_rejects_foreign_positions():
+    index = RepSearchIndex([{"id": "recA", "name": "Tim"}])
+    with pytest.raises(ValueError):
+        index.search("tim", 1, [0, "recA"])
+
+
+def test_memory_index_rebuilds_on_new_dataset_version(reps):
+    current_app.config["SEARCH_INDEX_REFRESH_SECONDS"] = 0
+    backend = MemorySearchBackend()
+    documents, _ = backend.search_documents(db.session, "smith", 10)
+    assert [document["id"] for document in documents] == ["recD"]
+
+    add_rep("recE", "Will Smith")
+    documents, _ = backend.search_documents(db.session, "smith", 10)
+    assert len(documents) == 1, "index is only rebuilt when the dataset version changes"
+
+    DatasetVersion.bump(db.session)
+    documents, _ = backend.search_documents(db.session, "smith", 10)
+    assert [document["id"] for document in documents] == ["recD", "recE"]
+
+
+@pytest.mark.parametrize("backend", [LikeSearchBackend(), SqliteFtsSearchBackend(), MemorySearchBackend()],
+                         ids=lambda backend: backend.name)
+@pytest.mark.parametrize("search_query", ["barhorst", "oe", "nobody"])
+def test_iter_documents_matches_search_documents(reps, backend, search_query):
+    documents, _ = backend.search_documents(db.session, search_query, 10)
+    batches = list(backend.iter_documents(db.session, search_query, batch_size=2))
+
+    assert all(len(batch) <= 2 for batch in batches)
+    assert [document for batch in batches for document in batch] == documents
+
+
+@pytest.mark.parametrize("backend", [LikeSearchBackend(), SqliteFtsSearchBackend(), MemorySearchBackend()],
+                         ids=lambda backend: backend.name)
+def test_wildcards_are_matched_literally(reps, backend):
+    add_rep("recE", "Anne O_Brien 100%")
+    for search_query in ["_", "%", "o_b", "100%"]:
+        documents, _ = backend.search_documents(db.session, search_query, 10)
+        assert [document["id"] for document in documents] == ["recE"], search_query
+    documents, _ = backend.search_documents(db.session, "o%b", 10)
+    assert documents == []
+
+
+def test_postgres_patterns_are_escaped():
+    query = PostgresTrigramSearchBackend().build_query("100%_", None, None)
+    compiled = query.compile(dialect=postgresql.dialect())
+    assert "ESCAPE '\\\\'" in str(compiled)
+    assert "%100\\%\\_%" in compiled.params.values()
+
+
+@pytest.fixture
+def postgres_session():
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("Set TEST_POSTGRES_URL to run tests against Postgres.")
+    engine = create_engine(url)
+    Rep.__table__.create(engine)
+    try:
+        with Session(engine) as session:
+            yield session
+    finally:
+        Rep.__table__.drop(engine)
+        engine.dispose()
+
+
+def test_postgres_search_uses_trigram_indexes(postgres_session):
+    for i in range(200):
+        at_rep = copy.deepcopy(negative_rep_example)
+        at_rep["id"] = f"rec{i}"
+        at_rep["fields"]["Name"] = f"Rep Number {i}"
+        postgres_session.add(Rep.from_airtable_record(at_rep))
+    postgres_session.commit()
+    postgres_session.execute(text("ANALYZE reps"))
+    # the table is tiny, make the planner prefer any usable index over a scan
+    postgres_session.execute(text("SET LOCAL enable_seqscan = off"))
+
+    query = PostgresTrigramSearchBackend().build_query("number 1", 100, None)
+    compiled = query.compile(dialect=postgres_session.bind.dialect, compile_kwargs={"literal_binds": True})
+    plan = "\n".join(postgres_session.execute(text(f"EXPLAIN {compiled}")).scalars())
+    for name in ["name", "state", "district", "role"]:
+        assert f"ix_reps_{name}_trgm" in plan, plan
+
+
+def test_unlimited_postgres_query():
+    query = PostgresTrigramSearchBackend().build_query("barhorst", None, None)
+    assert "LIMIT" not in str(query.compile(dialect=postgresql.dialect()))
+
+
+def test_ndjson_search(reps, client, monkeypatch):
+    monkeypatch.setattr("tfp_widget.views.STREAM_BATCH_SIZE", 1)
+    paged = client.get("/api/reps/search/barhorst").json
+
+    for path, headers in [
+        ("/api/reps/search/barhorst?format=ndjson", {}),
+        ("/api/reps/search/barhorst", {"Accept": "application/x-ndjson"}),
+    ]:
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert response.is_streamed
+        lines = response.get_data(as_text=True).splitlines()
+        # the streamed request context is only popped once the response is closed
+        response.close()
+        assert [json.loads(line) for line in lines] == paged
@@ -0,0 +1,150 @@
+import copy
+import json
+from datetime import datetime, timedelta, timezone
+
+from tfp_widget.database import db
+from tfp_widget.models import DatasetVersion, NegativeBills, Rep, RepsToNegativeBills, SyncState
+from tfp_widget.sync import format_timestamp
+from test_views import negative_bill_example, negative_rep_example
+
+
+def make_reps(count):
+    at_reps = []
+    for i in range(count):
+        at_rep = copy.deepcopy(negative_rep_example)
+        at_rep["id"] = f"rec{i}"
+        at_reps.append(at_rep)
+    return at_reps
+
+
+def sync(client, *args):
+    result = client.application.test_cli_runner().invoke(args=["sync-airtable", *args])
+    assert result.exit_code == 0, result.output
+
+
+def test_first_sync_is_full(client, fake_airtable):
+    fake_airtable.tables = {"tblStateReps": make_reps(3), "tblBills": [negative_bill_example]}
+
+    sync(client)
+
+    assert Rep.query.count() == 3
+    assert NegativeBills.query.count() == 1
+    assert RepsToNegativeBills.query.count() == 6
+    assert DatasetVersion.current(db.session).version == 1
+    assert all(formula == "" for formula in fake_airtable.formulas)
+    for table_key in ["STATE_REPS_TABLE", "NEGATIVE_BILLS_TABLE"]:
+        sync_state = db.session.get(SyncState, table_key)
+        assert sync_state.high_water_mark == sync_state.last_full_sync
+
+
+def test_tables_are_fetched_concurrently(client, fake_airtable):
+    # the reps vote on the last bill
+    at_bills = []
+    for i in range(4):
+        at_bill = copy.deepcopy(negative_bill_example)
+        at_bill["id"] = f"recBill{i}"
+        at_bills.append(at_bill)
+    at_bills.append(negative_bill_example)
+    fake_airtable.tables = {"tblStateReps": make_reps(7), "tblBills": at_bills}
+    fake_airtable.delay = 0.05
+
+    sync(client)
+
+    tables = [table_id for table_id, _ in fake_airtable.requests]
+    # reps are requested while the bill pages are still coming in
+    assert tables.index("tblStateReps") < len(tables) - tables[::-1].index("tblBills") - 1
+    # and still written after the bills, so their relations are all kept
+    assert RepsToNegativeBills.query.count() == 14
+
+
+def test_incremental_sync_fetches_modified_records(client, fake_airtable):
+    at_reps = make_reps(3)
+    fake_airtable.tables = {"tblStateReps": at_reps, "tblBills": [negative_bill_example]}
+    sync(client)
+
+    fake_airtable.requests.clear()
+    fake_airtable.formulas.clear()
+    sync(client)
+    # nothing was modified since the last sync, so nothing is transferred or bumped
+    assert all("LAST_MODIFIED_TIME" in formula for formula in fake_airtable.formulas)
+    assert DatasetVersion.current(db.session).version == 1
+
+    at_reps[1]["fields"]["Name"] = "Renamed Rep"
+    at_reps[1]["fields"]["Last Modified"] = format_timestamp(datetime.now(timezone.utc) + timedelta(minutes=1))
+    sync(client)
+
+    assert db.session.get(Rep, "rec1").name == "Renamed Rep"
+    assert DatasetVersion.current(db.session).version == 2
+
+
+def test_relations_wait_for_their_bills(client, fake_airtable):
+    fake_airtable.tables = {"tblStateReps": make_reps(2), "tblBills": []}
+    sync(client)
+    assert RepsToNegativeBills.query.count() == 0
+
+    # the reps are unchanged, only the bill they link to is new
+    at_bill = copy.deepcopy(negative_bill_example)
+    at_bill["fields"]["Last Modified"] = format_timestamp(datetime.now(timezone.utc) + timedelta(minutes=1))
+    fake_airtable.tables["tblBills"] = [at_bill]
+    sync(client)
+
+    assert RepsToNegativeBills.query.count() == 4
+    assert DatasetVersion.current(db.session).version == 2
+
+
+def test_full_sweep_deletes_removed_records(client, fake_airtable):
+    at_reps = make_reps(3)
+    fake_airtable.tables = {"tblStateReps": at_reps, "tblBills": [negative_bill_example]}
+    sync(client)
+
+    # an incremental sync cannot see deletions
+    del at_reps[0]
+    sync(client)
+    assert Rep.query.count() == 3
+
+    sync(client, "--full")
+    assert Rep.query.count() == 2
+    assert db.session.get(Rep, "rec0") is None
+    assert RepsToNegativeBills.query.filter_by(rep_id="rec0").count() == 0
+    assert RepsToNegativeBills.query.count() == 4
+
+
+def test_full_sweep_interval(client, fake_airtable):
+    fake_airtable.tables = {"tblStateReps": make_reps(1), "tblBills": [negative_bill_example]}
+    sync(client)
+
+    fake_airtable.formulas.clear()
+    sync(client, "--full-sweep-hours", "0")
+
+    assert fake_airtable.formulas and all(formula == "" for formula in fake_airtable.formulas)
+
+
+def test_snapshot(client, fake_airtable, tmp_path):
+    at_reps = make_reps(5)
+    fake_airtable.tables = {"tblStateReps": at_reps, "tblBills": [negative_bill_example]}
+
+    sync(client, "--snapshot", "--snapshot-dir", str(tmp_path), "--batch-size", "2")
+
+    def project(at_record, fields):
+        return {**at_record, "fields": {name: at_record["fields"][name] for name in fields if name in at_record["fields"]}}
+
+    snapshots = {path.name.rsplit("_", 1)[0]: json.loads(path.read_text()) for path in tmp_path.iterdir()}
+    # snapshots hold what was fetched, only the fields the models read
+    assert snapshots == {
+        "state_reps": [project(at_rep, Rep.airtable_fields) for at_rep in at_reps],
+        "negative_bills": [project(negative_bill_example, NegativeBills.airtable_fields)],
+    }
+    assert Rep.query.count() == 5
+
+
+def test_failed_fetch_keeps_high_water_mark(client, fake_airtable):
+    fake_airtable.tables = {"tblStateReps": make_reps(5), "tblBills": [negative_bill_example]}
+    sync(client)
+    high_water_mark = db.session.get(SyncState, "STATE_REPS_TABLE").high_water_mark
+
+    fake_airtable.failures = [200, 404]
+    result = client.application.test_cli_runner().invoke(args=["sync-airtable", "--full"])
+
+    assert result.exit_code != 0
+    db.session.expire_all()
+    assert db.session.get(SyncState, "STATE_REPS_TABLE").high_water_mark == high_water_mark
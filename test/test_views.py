@@ -1,7 +1,11 @@
+import copy
 import json
+from unittest.mock import patch
 
 from tfp_widget.database import db
-from tfp_widget.models import Rep, NegativeBills, RepsToNegativeBills
+from tfp_widget import schema
+from tfp_widget.models import Rep, NegativeBills, RepDocument, RepsToNegativeBills
+from conftest import count_statements
 
 negative_rep_example = {"id": "recaMS906YE9Kq2bj", "createdTime": "2021-10-20T15:36:50.000Z", "fields": {
 "Name": "Tim Barhorst",
@@ -84,3 +88,109 @@ def test_basic_rep(client):
     assert response.json[0]["name"] == "Tim Barhorst"
 
 
+def count_search_queries(client, search_query):
+    with count_statements() as statements:
+        response = client.get(f'/api/reps/search/{search_query}')
+    assert response.status_code == 200
+    return len(statements), response.json
+
+
+def add_reps_with_bill(count):
+    db.session.add(NegativeBills.from_airtable_record(negative_bill_example))
+    at_reps = []
+    for i in range(count):
+        at_rep = copy.deepcopy(negative_rep_example)
+        at_rep["id"] = f"rec{i}"
+        at_rep["fields"]["Name"] = f"Tim Barhorst {i}"
+        at_reps.append(at_rep)
+        db.session.add(Rep.from_airtable_record(at_rep))
+    RepsToNegativeBills.rep_build_all_relations(at_reps, db.session)
+
+
+def test_search_query_count_is_flat(client):
+    add_reps_with_bill(1)
+    single_count, single_json = count_search_queries(client, 'barhorst')
+
+    db.session.query(Rep).delete()
+    db.session.query(NegativeBills).delete()
+    db.session.query(RepsToNegativeBills).delete()
+    db.session.commit()
+
+    add_reps_with_bill(20)
+    many_count, many_json = count_search_queries(client, 'barhorst')
+
+    assert len(single_json) == 1
+    assert len(many_json) == 20
+    assert many_count == single_count
+    assert many_json[0]["billsSponsored"] == ["OH HB68"]
+    assert many_json[0]["billsYeaVotes"] == ["OH HB68"]
+    assert many_json[0]["billsNayVotes"] == []
+
+
+def test_search_pagination(client):
+    add_reps_with_bill(5)
+
+    response = client.get('/api/reps/search/barhorst?limit=2')
+    assert [rep["id"] for rep in response.json] == ["rec0", "rec1"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(f'/api/reps/search/barhorst?limit=2&cursor={cursor}')
+    assert [rep["id"] for rep in response.json] == ["rec2", "rec3"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(f'/api/reps/search/barhorst?limit=2&cursor={cursor}')
+    assert [rep["id"] for rep in response.json] == ["rec4"]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_search_cursor_is_exposed_cross_origin(client):
+    add_reps_with_bill(3)
+    response = client.get('/api/reps/search/barhorst?limit=2', headers={"Origin": "https://widget.example.org"})
+    assert "X-Next-Cursor" in response.headers
+    assert response.headers["Access-Control-Allow-Origin"] == "https://widget.example.org"
+    assert "X-Next-Cursor" in response.headers["Access-Control-Expose-Headers"]
+
+
+def test_search_invalid_cursor(client):
+    response = client.get('/api/reps/search/barhorst?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+
+def test_search_serves_stored_documents(client):
+    add_reps_with_bill(3)
+    live_json = client.get('/api/reps/search/barhorst').json
+
+    assert schema.refresh_rep_documents(db.session) == {"written": 3, "unchanged": 0, "deleted": 0}
+    with patch.object(schema, "serialize_reps", side_effect=AssertionError("serialized at request time")):
+        stored_json = client.get('/api/reps/search/barhorst').json
+
+    assert stored_json == live_json
+
+
+def test_refresh_rep_documents_writes_changes_only(client):
+    add_reps_with_bill(3)
+    schema.refresh_rep_documents(db.session, batch_size=2)
+    assert schema.refresh_rep_documents(db.session, batch_size=2) == {"written": 0, "unchanged": 3, "deleted": 0}
+
+    db.session.get(Rep, "rec1").name = "Renamed"
+    db.session.delete(db.session.get(Rep, "rec2"))
+    db.session.commit()
+
+    assert schema.refresh_rep_documents(db.session, batch_size=2) == {"written": 1, "unchanged": 1, "deleted": 1}
+    assert json.loads(db.session.get(RepDocument, "rec1").document)["name"] == "Renamed"
+    assert RepDocument.is_complete(db.session)
+
+
+def test_serialize_reps_matches_rep_schema(client):
+    add_reps_with_bill(3)
+    rep = db.session.get(Rep, "rec1")
+    rep.name = "Ünïcode ☃ \"quoted\""
+    rep.email = None
+    rep.twitter = None
+    db.session.commit()
+
+    reps = db.session.query(Rep).order_by(Rep.id).all()
+    mappings = RepsToNegativeBills.case_names_for_reps([rep.id for rep in reps], schema.REP_BILL_TYPES, db.session)
+    expected = [schema.RepSchema(context={"mapping": mappings[rep.id]}).dump(rep) for rep in reps]
+
+    assert json.dumps(schema.serialize_reps(reps, mappings)) == json.dumps(expected)
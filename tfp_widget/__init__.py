@@ -7,31 +7,59 @@ from flask_marshmallow import Marshmallow
 from flask_migrate import Migrate
 from flask_restful import Api
 
+from . import cache
 from . import database
+from . import instrumentation
+from . import loaders
 from . import models as m
 from . import views
-from .commands import import_airtable_json
+from .commands import import_airtable_json, sync_airtable
 
 
 class Config:
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
+    # optional read replica serving the read only API views, see database.read_from_replica
+    SQLALCHEMY_BINDS = database.replica_binds(os.getenv('DATABASE_REPLICA_URL'))
+    # rep search backend, one of search.BACKENDS; picked from the database dialect when unset
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND')
+    # how often the "memory" search backend checks for a new dataset version
+    SEARCH_INDEX_REFRESH_SECONDS = int(os.getenv('SEARCH_INDEX_REFRESH_SECONDS', 30))
+    # response cache for rep search, a size of 0 disables it; see cache.init_app
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 1024))
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+    RESPONSE_CACHE_URL = os.getenv('RESPONSE_CACHE_URL')
+    # Cache-Control max-age sent to browsers and CDNs with cached responses
+    RESPONSE_CACHE_MAX_AGE = int(os.getenv('RESPONSE_CACHE_MAX_AGE', 60))
+    # serialized negative bills kept per process, keyed on their checksum
+    BILL_CACHE_SIZE = int(os.getenv('BILL_CACHE_SIZE', 4096))
+    # per request query count, DB and serialization time; see instrumentation.init_app
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() == 'true'
+    QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', 20))
+    # bearer token /metrics asks for, open when unset
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(os.getcwd()) + "/test.db"
+    SQLALCHEMY_BINDS = {}
 
 
 class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:/'
+    SQLALCHEMY_BINDS = {}
+    # tests change the data without importing, which would serve stale cached responses
+    RESPONSE_CACHE_SIZE = 0
 
 
 class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', "").replace("postgres://", "postgresql://", 1)
+    # pool sized for the gunicorn worker and tuned from DB_* variables, see database.engine_options
+    SQLALCHEMY_ENGINE_OPTIONS = database.engine_options(SQLALCHEMY_DATABASE_URI)
 
 
 config_by_name = dict(
@@ -44,7 +72,8 @@ config_by_name = dict(
 def create_app(config_name="development"):
     app = Flask(__name__)
     app.config.from_object(config_by_name[config_name])
-    CORS(app)
+    # widgets are embedded on other sites, their scripts can only read exposed headers
+    CORS(app, expose_headers=["X-Next-Cursor"])
     if app.debug:
         logging.basicConfig(level=logging.DEBUG)
 
@@ -52,13 +81,24 @@ def create_app(config_name="development"):
 
     Migrate(app, database.db)
 
-    database.db.init_app(app)
+    database.init_app(app)
 
     Marshmallow(app)
+    cache.init_app(app)
+    loaders.init_app(app)
     api = Api(app)
+    instrumentation.init_app(app, api)
 
     api.add_resource(views.RepsResource, '/api/reps/search/<string:search_query>')
+    api.add_resource(views.CacheStatsResource, '/api/status/cache')
+    api.add_resource(views.PoolStatsResource, '/api/status/pool')
+    api.add_resource(views.MetricsResource, '/metrics')
+    api.add_resource(views.RepsExportResource, '/api/reps/export')
+    api.add_resource(views.NegativeBillsExportResource, '/api/negative-bills/export')
+    api.add_resource(views.NegativeBillsResource, '/api/negative-bills')
+    api.add_resource(views.NegativeBillResource, '/api/negative-bills/<string:bill_id>')
 
     app.cli.add_command(import_airtable_json)
+    app.cli.add_command(sync_airtable)
 
     return app
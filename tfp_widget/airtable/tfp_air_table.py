@@ -1,8 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import os
+import random
+import time
+import requests
 from requests_ratelimiter import LimiterSession
 import logging
 
+from ..metrics import AIRTABLE_BYTES, AIRTABLE_PAGES, AIRTABLE_RETRIES, AIRTABLE_RETRY_WAIT, AIRTABLE_THROTTLE_WAIT
+
 logging.basicConfig(level=logging.INFO)
 
 
@@ -15,8 +21,48 @@ session = LimiterSession(per_second=5)
 # Load environment variables from .env
 load_dotenv()
 
+# Responses worth retrying: rate limited, or a temporary problem on Airtable's side
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+# First retry waits about this long, doubling on every further attempt
+RETRY_BACKOFF_SECONDS = 1.0
+# Airtable asks clients to wait 30 seconds after a 429
+RATE_LIMITED_BACKOFF_SECONDS = 30.0
+
+
+def get_api_url():
+    """URL of the airtable base, `AIRTABLE_API_URL` can point it at another server."""
+    api_url = os.getenv("AIRTABLE_API_URL", "https://api.airtable.com/v0")
+    return f"{api_url}/{os.getenv('AIRTABLE_BASE')}"
+
+
+def retry_delay(response, attempt):
+    """Seconds to wait before retrying after `response`, or after a connection error if None."""
+    if response is not None and "Retry-After" in response.headers:
+        try:
+            return float(response.headers["Retry-After"])
+        except ValueError:
+            pass
+    base = RATE_LIMITED_BACKOFF_SECONDS if response is not None and response.status_code == 429 \
+        else RETRY_BACKOFF_SECONDS
+    return base * 2 ** attempt * random.uniform(0.5, 1.0)
 
-def get_records_by_page(url, table_id, token, offset=None):
+
+def mark_received(response, **kwargs):
+    """Response hook noting when the headers of a response arrived, before its body is read."""
+    response.received_at = time.perf_counter()
+
+
+def throttle_wait(response, sent_at):
+    """Seconds a request sent at `sent_at` waited for the rate limiter of `session`.
+
+    `response.elapsed` only covers the round trip, the rest of the time until the
+    `mark_received` hook ran was spent before sending.
+    """
+    return max(response.received_at - sent_at - response.elapsed.total_seconds(), 0.0)
+
+
+def get_records_by_page(url, table_id, token, offset=None, formula=None, fields=None):
     """Get a single page of records from airtable. If offset is provided, this will
     return the page identified by the offset string.
 
@@ -25,52 +71,145 @@ def get_records_by_page(url, table_id, token, offset=None):
         table_id (string): airtable table identifier. Probably looks like `tblcW1C6fiNHBnDaC`
         token (string): Authentication token for airtable API.
         offset (string, optional): Offset string provided by airtable in the previous page of data. Defaults to None.
+        formula (string, optional): `filterByFormula` only records matching it are returned.
+        fields (list, optional): Names of the fields to return, all fields if None.
 
     Returns:
-        list: List of records translated to Python dicts.
+        requests.Response: The page. Rate limited (429) and 5xx responses and connection errors are
+        retried with exponential backoff up to `MAX_RETRIES` times, after which the last response
+        is returned.
     """
     url = f"{url}/{table_id}"
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json",
+        "Accept-Encoding": "gzip",
     }
 
     params = {"pageSize": 100}
 
     if offset:
         params["offset"] = offset
-
-    response = session.request("GET", url, headers=headers, params=params)
+    if formula:
+        params["filterByFormula"] = formula
+    if fields:
+        params["fields[]"] = list(fields)
+
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            sent_at = time.perf_counter()
+            response = session.request("GET", url, headers=headers, params=params,
+                                       hooks={"response": mark_received})
+            AIRTABLE_THROTTLE_WAIT.labels(table_id).inc(throttle_wait(response, sent_at))
+        except requests.ConnectionError:
+            if attempt == MAX_RETRIES:
+                raise
+            response = None
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            return response
+        if attempt < MAX_RETRIES:
+            delay = retry_delay(response, attempt)
+            status = response.status_code if response is not None else "connection error"
+            logging.warning(f"{table_id}: got {status}, retrying in {delay:.1f}s")
+            AIRTABLE_RETRIES.labels(table_id, str(status)).inc()
+            AIRTABLE_RETRY_WAIT.labels(table_id).inc(delay)
+            time.sleep(delay)
 
     return response
 
 
-def get_table_data(table_key):
+def modified_since_formula(timestamp):
+    """Formula matching records modified after an ISO 8601 `timestamp`."""
+    return f"IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE('{timestamp}'))"
+
+
+def transferred_bytes(response):
+    """Size of a response body as sent over the wire, before decompression."""
+    try:
+        return response.raw.tell()
+    except AttributeError:
+        return len(response.content)
+
+
+def iter_table_pages(table_key, modified_since=None, fields=None, stats=None):
+    """Iterate over the pages of an airtable table, requesting each page when it is needed.
+
+    Args:
+        table_key (string): Environment variable *key* to look up the table id.
+        modified_since (string, optional): ISO 8601 timestamp, only records modified after it
+            are requested.
+        fields (list, optional): Names of the fields to request, all fields if None.
+        stats (dict, optional): `pages` and `bytes` transferred are added to it.
+
+    Yields:
+        list: The records of one page translated to Python dicts.
+    """
+    table_id = os.getenv(table_key)
+    token = os.getenv("AIRTABLE_API_TOKEN")
+    url = get_api_url()
+    formula = modified_since_formula(modified_since) if modified_since else None
+    offset = None
+    count = 0
+    total_bytes = 0
+    while True:
+        response = get_records_by_page(url, table_id, token, offset, formula=formula, fields=fields)
+        check_response(response)
+        page = response.json()
+        page_bytes = transferred_bytes(response)
+        count += len(page["records"])
+        total_bytes += page_bytes
+        if stats is not None:
+            stats["pages"] = stats.get("pages", 0) + 1
+            stats["bytes"] = stats.get("bytes", 0) + page_bytes
+        AIRTABLE_PAGES.labels(table_id).inc()
+        AIRTABLE_BYTES.labels(table_id).inc(page_bytes)
+        logging.info(f"{table_key} Records: {count}, {total_bytes} bytes")
+        yield page["records"]
+        if "offset" not in page:
+            return
+        offset = page["offset"]
+
+
+def get_table_data(table_key, modified_since=None, fields=None):
     """Get all records in an airtable table, repeatedly requesting page after page.
 
     Args:
         table_key (string): Environment variable *key* to look up the table id.
+        modified_since (string, optional): ISO 8601 timestamp, only records modified after it
+            are requested.
+        fields (list, optional): Names of the fields to request, all fields if None.
 
     Returns:
         list: List of records translated to Python dicts.
     """
-    table_id = os.getenv(table_key)
-    token = os.getenv("AIRTABLE_API_TOKEN")
-    url = f"https://api.airtable.com/v0/{os.getenv('AIRTABLE_BASE')}"
-    response = get_records_by_page(url, table_id, token)
-    if response.status_code == 200:
-        records = response.json()["records"]
-
-        while "offset" in response.json():
-            offset = response.json()["offset"]
-            response = get_records_by_page(url, table_id, token, offset)
-            more_records = response.json()["records"]
-            records.extend(more_records)
-            logging.info(f"{table_key} Records: {len(records)}")
-
-        return records
-    else:
-        raise ConnectionError(f"Response code is not 200, got {response.status_code} and {response.json()}")
+    records = []
+    for page in iter_table_pages(table_key, modified_since, fields):
+        records.extend(page)
+    return records
+
+
+def check_response(response):
+    if response.status_code != 200:
+        raise ConnectionError(f"Response code is not 200, got {response.status_code} and {response.text}")
+
+
+def get_tables_data(table_keys, max_workers=None):
+    """Get all records of several airtable tables concurrently.
+
+    Every table is paged through in its own thread. All requests go through the module level
+    rate limited `session`, so the tables share one rate limit budget and together run at
+    about the rate limit instead of one table at a time.
+
+    Args:
+        table_keys (list): Environment variable *keys* to look up the table ids.
+        max_workers (int, optional): Number of threads, defaults to one per table.
+
+    Returns:
+        dict: Table key to list of records translated to Python dicts.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers or len(table_keys)) as executor:
+        futures = {table_key: executor.submit(get_table_data, table_key) for table_key in table_keys}
+        return {table_key: future.result() for table_key, future in futures.items()}
 
 
 def get_state_reps():
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from .metrics import CACHE_LOOKUPS
+
+LOGGER = logging.getLogger()
+
+
+class CacheBackend:
+    """Storage for cached responses. Values are JSON serializable dicts."""
+
+    # whether entries of older dataset versions should be dropped as soon as a new one is seen
+    clear_on_new_version = False
+
+    def get(self, key):
+        raise NotImplementedError()
+
+    def set(self, key, value):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+
+class LocalCacheBackend(CacheBackend):
+    """In-process LRU cache with a size bound and a time to live.
+
+    Args:
+        max_size (int): Maximum number of entries, the least recently used are evicted first.
+        ttl (int): Seconds an entry stays valid.
+    """
+
+    clear_on_new_version = True
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SharedCacheBackend(CacheBackend):
+    """Cache shared between processes, stored through a Redis compatible client.
+
+    Any client with `get(key)`, `set(key, value, ex=seconds)` and `scan_iter(match)` /
+    `delete(*keys)` works, so tests can hand in a local stand-in.
+
+    Args:
+        client: Redis compatible client.
+        ttl (int): Seconds an entry stays valid.
+        prefix (str): Prefix for every key written by this backend.
+    """
+
+    def __init__(self, client, ttl=300, prefix="tfp:response:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, ttl=300):
+        import redis
+
+        return cls(redis.Redis.from_url(url), ttl=ttl)
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class ResponseCache:
+    """Caches encoded API responses, keyed on the dataset version and a normalized request.
+
+    Keys include the `DatasetVersion`, so an import makes every older entry unreachable in
+    every process. The local backend is also cleared when a new version shows up, shared
+    backends let old entries expire.
+
+    Attributes:
+        backend (CacheBackend): Where entries are stored.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to build the response.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.version = None
+        self.lock = threading.Lock()
+
+    def get_or_build(self, key, version, build):
+        """Get a cached response, building and storing it on a miss.
+
+        Args:
+            key (str): Normalized request key.
+            version (int): Current dataset version.
+            build (callable): Returns `(body, headers)` for the response, `body` as a str.
+
+        Returns:
+            tuple: The entry dict (`body`, `etag` and `headers`) and whether it was a hit.
+        """
+        if version != self.version:
+            if self.backend.clear_on_new_version:
+                self.backend.clear()
+            self.version = version
+
+        versioned_key = f"{version}:{key}"
+        entry = self.backend.get(versioned_key)
+        if entry is not None:
+            with self.lock:
+                self.hits += 1
+            CACHE_LOOKUPS.labels("response", "hit").inc()
+            return entry, True
+
+        with self.lock:
+            self.misses += 1
+        CACHE_LOOKUPS.labels("response", "miss").inc()
+        body, headers = build()
+        entry = {
+            "body": body,
+            "etag": hashlib.sha256(body.encode("utf-8")).hexdigest()[:32],
+            "headers": headers,
+        }
+        self.backend.set(versioned_key, entry)
+        return entry, False
+
+    def stats(self):
+        """Get the hit and miss counters.
+
+        Returns:
+            dict: `hits`, `misses` and `hit_ratio`.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def normalize_query(search_query):
+    """Normalize a search query for use in a cache key. Searches ignore case and outer whitespace."""
+    return search_query.strip().lower()
+
+
+def init_app(app):
+    """Create the response cache for an app from its config.
+
+    `RESPONSE_CACHE_SIZE` of 0 disables caching. When `RESPONSE_CACHE_URL` is set entries
+    are stored in that Redis instead of in-process.
+    """
+    size = app.config.get("RESPONSE_CACHE_SIZE", 0)
+    if not size:
+        return
+    ttl = app.config.get("RESPONSE_CACHE_TTL", 300)
+    url = app.config.get("RESPONSE_CACHE_URL")
+    if url:
+        backend = SharedCacheBackend.from_url(url, ttl=ttl)
+    else:
+        backend = LocalCacheBackend(max_size=size, ttl=ttl)
+    app.extensions["tfp_response_cache"] = ResponseCache(backend)
+
+
+def get_response_cache():
+    """Get the response cache of the current app, or None when caching is disabled."""
+    return current_app.extensions.get("tfp_response_cache")
@@ -1,11 +1,16 @@
-import json
 import logging
+from datetime import timedelta
 
 import click
 from flask.cli import with_appcontext
 
+from . import exports
+from . import metrics
 from . import models
+from . import schema
+from . import sync
 from .database import db
+from .streaming import iter_json_records
 
 
 @click.command("import-airtable-json")
@@ -17,24 +22,89 @@ from .database import db
               help="CSV file with negative bills dump_airtable")
 @click.option("--build-rep-nb-relations", is_flag=True, default=True,
               help="Build relationship table between reps and negative-bills")
+@click.option("--batch-size", type=int, default=500, show_default=True,
+              help="Records read, upserted and related at a time; bounds memory use")
 @with_appcontext
-def import_airtable_json(state_reps_file, national_reps_file, negative_bills_file, build_rep_nb_relations):
+@metrics.import_command("import-airtable-json")
+def import_airtable_json(state_reps_file, national_reps_file, negative_bills_file, build_rep_nb_relations,
+                         batch_size):
+    """Import Airtable dumps, streaming records from the files in batches.
+
+    Files may hold a JSON array of records (as written by dump_airtable.py), an Airtable
+    API page or JSON Lines. Negative bills are imported first so rep relations can
+    reference them.
+    """
     logger = logging.getLogger()
-    state_reps = None
-    if state_reps_file:
-        state_reps = json.load(state_reps_file)
-        models.Rep.bulk_upsert(state_reps)
-    logger.info(f"Updated {len(state_reps)} State Reps")
 
-    negative_bills = None
     if negative_bills_file:
-        negative_bills = json.load(negative_bills_file)
-        models.NegativeBills.bulk_upsert(negative_bills)
-    logger.info(f"Updated {len(negative_bills)} Negative Bills")
+        counts = import_records(models.NegativeBills, negative_bills_file, batch_size)
+        logger.info(f"Updated {counts['total']} Negative Bills: {dict(counts)}")
+
+    if state_reps_file:
+        counts = import_records(models.Rep, state_reps_file, batch_size,
+                                build_relations=build_rep_nb_relations)
+        logger.info(f"Updated {counts['total']} State Reps: {dict(counts)}")
 
     if national_reps_file:
         # do nothing, haven't implemented this yet
         pass
 
-    if build_rep_nb_relations:
-        models.RepsToNegativeBills.rep_build_all_relations(at_reps=state_reps, session=db.session)
+    schema.refresh_rep_documents(db.session, batch_size=batch_size)
+    exports.refresh_exports(db.session, batch_size=batch_size)
+    models.DatasetVersion.bump(db.session)
+
+
+def import_records(model, fp, batch_size, build_relations=False):
+    """Upsert the records of a dump file into `model`, one batch at a time.
+
+    Args:
+        model: Model class to upsert into.
+        fp: Dump file, see `streaming.iter_json_records`.
+        batch_size (int): Number of records held in memory at a time.
+        build_relations (bool): Also sync each batch's rep/negative bill relations.
+
+    Returns:
+        Counter: Summed counts from `bulk_upsert` and `rep_build_all_relations`.
+    """
+    return sync.upsert_records(model, iter_json_records(fp), db.session, batch_size=batch_size,
+                               build_relations=build_relations)
+
+
+@click.command("sync-airtable")
+@click.option("--full", is_flag=True,
+              help="Fetch every record and delete records removed from Airtable")
+@click.option("--full-sweep-hours", type=float, default=24, show_default=True,
+              help="Do a full sweep when the last one of a table is older than this")
+@click.option("--batch-size", type=int, default=500, show_default=True,
+              help="Records upserted and related at a time")
+@click.option("--snapshot", is_flag=True,
+              help="Also write the fetched records to <table>_<timestamp>.json files for auditing")
+@click.option("--snapshot-dir", type=click.Path(file_okay=False, writable=True), default=".",
+              show_default=True, help="Directory the snapshot files are written to")
+@with_appcontext
+@metrics.import_command("sync-airtable")
+def sync_airtable(full, full_sweep_hours, batch_size, snapshot, snapshot_dir):
+    """Sync the database with Airtable, fetching only records modified since the last sync.
+
+    Pages are streamed from the Airtable API straight into the database, no dump files
+    are needed. All tables are fetched at once, and bills are written before reps. Every
+    `--full-sweep-hours` a table is fetched in full instead, to find deleted records.
+    The dataset version is only bumped when something changed, so caches stay warm.
+    """
+    logger = logging.getLogger()
+    changed = False
+    table_counts = sync.sync_tables(db.session, batch_size=batch_size, full=full,
+                                    full_sweep_interval=timedelta(hours=full_sweep_hours),
+                                    snapshot_dir=snapshot_dir if snapshot else None)
+    for table_key, counts in table_counts.items():
+        logger.info(f"{table_key}: transferred {counts['bytes']} bytes in {counts['pages']} pages")
+        changed = changed or sync.has_changes(counts)
+
+    if changed or not models.RepDocument.is_complete(db.session):
+        schema.refresh_rep_documents(db.session, batch_size=batch_size)
+    # only rebuilds exports whose rows changed
+    exports.refresh_exports(db.session, batch_size=batch_size)
+    if changed:
+        models.DatasetVersion.bump(db.session)
+    else:
+        logger.info("Airtable is unchanged since the last sync")
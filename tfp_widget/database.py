@@ -1,3 +1,224 @@
+import functools
+import logging
+import os
+import threading
+import time
+
+from flask import has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from .metrics import DB_POOL_CHECKED_OUT, DB_POOL_TIMEOUTS, DB_POOL_WAIT
+from .serving import worker_concurrency
+
+LOGGER = logging.getLogger()
+
+# bind key of the optional read replica, see `read_from_replica`
+REPLICA_BIND_KEY = "replica"
+
+
+class RoutingSession(Session):
+    """Session that sends the queries of read only views to the replica bind.
+
+    Queries go to the replica while `session.info` has `REPLICA_BIND_KEY` set, which
+    `read_from_replica` does for the rest of a request. Without a replica bind, or for
+    models on other binds, the session behaves like the default Flask-SQLAlchemy session.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is None and self.info.get(REPLICA_BIND_KEY):
+            engines = self._db.engines
+            if REPLICA_BIND_KEY in engines and engine is engines.get(None):
+                return engines[REPLICA_BIND_KEY]
+        return engine
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+# upper bound for the default pool size, gevent workers can serve far more requests than
+# the database accepts connections
+MAX_DEFAULT_POOL_SIZE = 20
+
+
+class PoolStats:
+    """Process wide counters of connection checkouts from `TimedQueuePool`s.
+
+    Attributes:
+        checkouts (int): Connections handed out.
+        wait_seconds (float): Total time spent waiting for a connection, including connecting.
+        max_wait_seconds (float): Longest single wait.
+        timeouts (int): Checkouts that gave up after `pool_timeout`.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def record(self, seconds, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_seconds": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+                "timeouts": self.timeouts,
+            }
+
+
+POOL_STATS = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    """`QueuePool` recording how long every checkout waits in `POOL_STATS` and the Prometheus metrics."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            POOL_STATS.record(time.perf_counter() - start, timed_out=True)
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        POOL_STATS.record(time.perf_counter() - start)
+        DB_POOL_WAIT.observe(time.perf_counter() - start)
+        return connection
+
+
+@event.listens_for(TimedQueuePool, "checkout")
+def count_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+@event.listens_for(TimedQueuePool, "checkin")
+def count_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+def env_flag(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def engine_options(database_url=None):
+    """SQLAlchemy engine options from the environment, with a pool sized for the serving worker.
+
+    | Variable | Default | |
+    |---|---|---|
+    | `DB_POOL_SIZE` | requests per worker, at most 20 | pooled connections |
+    | `DB_MAX_OVERFLOW` | 0 | extra connections opened under load |
+    | `DB_POOL_TIMEOUT` | 10 | seconds to wait for a connection |
+    | `DB_POOL_RECYCLE` | 1800 | seconds before a connection is replaced |
+    | `DB_POOL_PRE_PING` | true | test connections on checkout, survives database restarts |
+    | `DB_STATEMENT_TIMEOUT_MS` | | Postgres `statement_timeout` |
+    | `DB_PGBOUNCER` | false | connections go through PgBouncer in transaction pooling mode |
+
+    Args:
+        database_url (str, optional): URL the options are for, dialect specific options are
+            only added for Postgres.
+
+    Returns:
+        dict: Keyword arguments for `create_engine`.
+    """
+    pool_size = int(os.getenv("DB_POOL_SIZE", min(worker_concurrency(), MAX_DEFAULT_POOL_SIZE)))
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 0)),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 10)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": env_flag("DB_POOL_PRE_PING", True),
+    }
+
+    url = make_url(database_url) if database_url else None
+    if url is None or url.get_backend_name() != "postgresql":
+        return options
+
+    connect_args = {}
+    statement_timeout = os.getenv("DB_STATEMENT_TIMEOUT_MS")
+    pgbouncer = env_flag("DB_PGBOUNCER", False)
+    if pgbouncer:
+        # PgBouncer rejects startup parameters and hands each transaction to any server
+        # connection, so neither `options` nor prepared statements survive
+        if url.get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = None
+        if statement_timeout:
+            LOGGER.warning("DB_STATEMENT_TIMEOUT_MS is ignored behind PgBouncer, "
+                           "set statement_timeout on the database role instead")
+    elif statement_timeout:
+        connect_args["options"] = f"-c statement_timeout={int(statement_timeout)}"
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def pool_status(engine):
+    """Current occupancy of an engine's pool, as far as its pool class reports it."""
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    for name in ["size", "checkedin", "checkedout", "overflow"]:
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    return status
+
+
+def replica_binds(replica_url):
+    """`SQLALCHEMY_BINDS` adding the read replica at `replica_url`, if it is set.
+
+    Flask-SQLAlchemy does not apply `SQLALCHEMY_ENGINE_OPTIONS` to binds, so the replica
+    gets the `engine_options` of the primary here.
+    """
+    if not replica_url:
+        return {}
+    replica_url = replica_url.replace("postgres://", "postgresql://", 1)
+    return {REPLICA_BIND_KEY: dict(engine_options(replica_url), url=replica_url)}
+
+
+def read_from_replica(view):
+    """Decorate a read only view to run its queries on the replica, when one is configured.
+
+    Writes must not happen in such a view, a replica does not accept them. The routing ends
+    with the request, so commands and migrations always use the primary.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        db.session.info[REPLICA_BIND_KEY] = True
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def end_replica_reads(exc):
+    if has_app_context() and db.session.registry.has():
+        db.session.info.pop(REPLICA_BIND_KEY, None)
+
+
+def init_app(app):
+    db.init_app(app)
+    # streamed responses keep the request open, so they keep reading from the replica
+    app.teardown_request(end_replica_reads)
+
+
+def init_worker(app):
+    """Make the database safe to use in a worker forked from a process that loaded `app`.
 
-db = SQLAlchemy()
\ No newline at end of file
+    Pooled connections are not shared between processes, so the pools inherited from the
+    parent are replaced without closing the parent's connections.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import io
+import json
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from . import models as m
+from . import schema
+
+LOGGER = logging.getLogger()
+
+
+class Export:
+    """A downloadable dataset, see `EXPORTS`.
+
+    Args:
+        name (str): Export name.
+        checksum_statements (list): Selects of the rows the export is built from, ordered. The
+            ETag combines every row they return, so it changes whenever the export would.
+        model: Model whose rows are exported, in id order.
+        dump (callable): Turns a batch of `model` instances into dicts, given the batch and a session.
+    """
+
+    def __init__(self, name, checksum_statements, model, dump):
+        self.name = name
+        self.checksum_statements = checksum_statements
+        self.model = model
+        self.dump = dump
+
+    def etag(self, session):
+        """Combine the checksums of every row the export is built from into one ETag."""
+        digest = hashlib.sha256()
+        for statement in self.checksum_statements:
+            for row in session.execute(statement):
+                digest.update("\x1f".join(str(value) for value in row).encode("utf-8") + b"\n")
+        return digest.hexdigest()[:32]
+
+    def iter_batches(self, session, batch_size):
+        """Yield the exported dicts in batches, reading `batch_size` rows at a time by id."""
+        last_id = ""
+        while True:
+            rows = session.scalars(
+                select(self.model).where(self.model.id > last_id).order_by(self.model.id).limit(batch_size)).all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            yield self.dump(rows, session)
+
+    def build(self, session, batch_size=500):
+        """Build the gzip compressed JSON array of every exported record.
+
+        Returns:
+            tuple: The ETag, the compressed body and the number of records.
+        """
+        etag = self.etag(session)
+        buffer = io.BytesIO()
+        count = 0
+        # a fixed mtime keeps the bytes identical for identical data
+        with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as fp:
+            fp.write(b"[")
+            for batch in self.iter_batches(session, batch_size):
+                for document in batch:
+                    if count:
+                        fp.write(b",\n")
+                    fp.write(json.dumps(document).encode("utf-8"))
+                    count += 1
+            fp.write(b"]\n")
+        return etag, buffer.getvalue(), count
+
+
+EXPORTS = {
+    export.name: export
+    for export in [
+        Export(
+            "reps",
+            [
+                select(m.Rep.id, m.Rep.checksum).order_by(m.Rep.id),
+                select(m.RepsToNegativeBills.rep_id, m.RepsToNegativeBills.relation_type,
+                       m.RepsToNegativeBills.negative_bills_id).order_by(m.RepsToNegativeBills.id),
+                select(m.NegativeBills.id, m.NegativeBills.checksum).order_by(m.NegativeBills.id),
+            ],
+            m.Rep,
+            schema.load_rep_documents,
+        ),
+        Export(
+            "negative_bills",
+            [select(m.NegativeBills.id, m.NegativeBills.checksum).order_by(m.NegativeBills.id)],
+            m.NegativeBills,
+            lambda bills, session: schema.negative_bills_schema.dump(bills),
+        ),
+    ]
+}
+
+
+def refresh_exports(session, batch_size=500):
+    """Rebuild the stored `ExportSnapshot` of every export whose rows changed. Commits.
+
+    Returns:
+        dict: Export name to "built" or "unchanged".
+    """
+    results = {}
+    for name, export in EXPORTS.items():
+        snapshot = session.get(m.ExportSnapshot, name)
+        if snapshot is not None and snapshot.etag == export.etag(session):
+            results[name] = "unchanged"
+            continue
+
+        etag, body, count = export.build(session, batch_size)
+        if snapshot is None:
+            snapshot = m.ExportSnapshot(name=name)
+            session.add(snapshot)
+        snapshot.etag = etag
+        snapshot.body = body
+        snapshot.record_count = count
+        snapshot.created = datetime.now(timezone.utc).isoformat()
+        results[name] = "built"
+        LOGGER.info(f"Built {name} export: {count} records, {len(body)} bytes compressed")
+    session.commit()
+    return results
+
+
+def get_export(name, session):
+    """Get the stored snapshot of an export, building an unstored one if there is none yet.
+
+    Returns:
+        ExportSnapshot: Snapshot with `etag` loaded, `body` is loaded on access.
+    """
+    snapshot = session.get(m.ExportSnapshot, name)
+    if snapshot is None:
+        LOGGER.warning(f"No {name} export stored yet, building it for this request")
+        etag, body, count = EXPORTS[name].build(session)
+        snapshot = m.ExportSnapshot(name=name, etag=etag, body=body, record_count=count,
+                                    created=datetime.now(timezone.utc).isoformat())
+    return snapshot
@@ -0,0 +1,145 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_restful.representations.json import output_json as restful_output_json
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import metrics as prometheus
+
+LOGGER = logging.getLogger()
+
+
+class RequestMetrics:
+    """Where the time of one request goes.
+
+    Attributes:
+        queries (int): Statements executed.
+        db_seconds (float): Time spent executing them, fetching rows is not included.
+        rows (int): Rows the driver reported for them. Postgres reports the rows of
+            selects, SQLite only the rows written.
+        timings (dict): Seconds per `timed` section, e.g. "serialize".
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.timings = {}
+        self.status = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """`Server-Timing` header value with the durations in milliseconds."""
+        metrics = [f'db;dur={self.db_seconds * 1e3:.1f};desc="{self.queries} queries"']
+        metrics += [f"{name};dur={seconds * 1e3:.1f}" for name, seconds in self.timings.items()]
+        metrics.append(f"total;dur={self.elapsed() * 1e3:.1f}")
+        return ", ".join(metrics)
+
+
+def get_request_metrics():
+    """Get the metrics of the current request, or None outside of instrumented requests."""
+    if not (has_request_context() and has_app_context()):
+        return None
+    return g.get("request_metrics")
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the `name` timing of the current request."""
+    metrics = get_request_metrics()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] = metrics.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def output_json(data, code, headers=None):
+    """Flask-RESTful's JSON representation, timed as serialization."""
+    with timed("serialize"):
+        return restful_output_json(data, code, headers)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if get_request_metrics() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = get_request_metrics()
+    if metrics is None or not conn.info.get("query_start"):
+        return
+    metrics.queries += 1
+    metrics.db_seconds += time.perf_counter() - conn.info["query_start"].pop()
+    if cursor.rowcount > 0:
+        metrics.rows += cursor.rowcount
+
+
+def handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+
+def start_request():
+    g.request_metrics = RequestMetrics()
+
+
+def add_server_timing(response):
+    metrics = get_request_metrics()
+    if metrics is not None:
+        metrics.status = response.status_code
+        if current_app.config.get("SERVER_TIMING", True):
+            response.headers["Server-Timing"] = metrics.server_timing()
+    return response
+
+
+def log_request(exc):
+    """Log a logfmt line with the request's metrics, a warning when it went over the query budget.
+
+    The duration and query count also go to the Prometheus histograms, see `metrics`.
+
+    Runs when the request context ends, after a streamed body has been sent, so those
+    queries are counted too.
+    """
+    metrics = get_request_metrics()
+    if metrics is None:
+        return
+    del g.request_metrics
+    prometheus.observe_request(request.endpoint, request.method, metrics.status or 500, metrics.elapsed(),
+                               metrics.queries)
+    budget = current_app.config.get("QUERY_BUDGET", 0)
+    over_budget = bool(budget) and metrics.queries > budget
+    timings = "".join(f" {name}_ms={seconds * 1e3:.1f}" for name, seconds in metrics.timings.items())
+    line = (f"request method={request.method} path={request.path} status={metrics.status} "
+            f"queries={metrics.queries} db_ms={metrics.db_seconds * 1e3:.1f} rows={metrics.rows}"
+            f"{timings} total_ms={metrics.elapsed() * 1e3:.1f}")
+    if over_budget:
+        LOGGER.warning(f"{line} over_query_budget={budget}")
+    else:
+        LOGGER.info(line)
+
+
+def init_app(app, api):
+    """Instrument the requests of an app, and the JSON output of its Flask-RESTful `api`.
+
+    `SERVER_TIMING` turns the `Server-Timing` header off. Requests running more than
+    `QUERY_BUDGET` statements are logged as warnings, 0 disables the budget.
+    """
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(Engine, "handle_error", handle_error)
+    api.representation("application/json")(output_json)
+    app.before_request(start_request)
+    app.after_request(add_server_timing)
+    app.teardown_request(log_request)
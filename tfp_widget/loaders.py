@@ -0,0 +1,84 @@
+from flask import current_app, g
+from sqlalchemy import select
+
+from . import models as m
+from . import schema
+from .cache import LocalCacheBackend
+from .instrumentation import timed
+from .metrics import CACHE_LOOKUPS
+
+
+class NegativeBillsLoader:
+    """Resolves negative bill ids to API dicts with as few queries as possible.
+
+    A loader lives for one request. Ids it has already resolved are answered from its
+    identity map. Other ids are resolved together, first to their checksums with one
+    narrow `IN` query. Dicts whose checksum is in the process wide `documents` cache are
+    reused, only the remaining bills are loaded in full and serialized.
+
+    Args:
+        session: SQLAlchemy session.
+        documents (LocalCacheBackend): Serialized bills keyed on their checksum. A checksum
+            changes with every change of a bill, so entries never go stale.
+        chunk_size (int): Number of ids per `IN` clause.
+    """
+
+    def __init__(self, session, documents, chunk_size=500):
+        self.session = session
+        self.documents = documents
+        self.chunk_size = chunk_size
+        self.loaded = {}
+
+    def load(self, bill_id):
+        """Get one bill dict, or None if there is no such bill."""
+        return self.load_many([bill_id])[0]
+
+    def load_many(self, bill_ids):
+        """Get the dicts of several bills.
+
+        Args:
+            bill_ids (list): Bill ids, may contain duplicates.
+
+        Returns:
+            list: A dict, or None for unknown ids, per id in the order given.
+        """
+        missing = [bill_id for bill_id in dict.fromkeys(bill_ids) if bill_id not in self.loaded]
+        for i in range(0, len(missing), self.chunk_size):
+            self.resolve(missing[i:i + self.chunk_size])
+        return [self.loaded[bill_id] for bill_id in bill_ids]
+
+    def resolve(self, bill_ids):
+        checksums = dict(self.session.execute(
+            select(m.NegativeBills.id, m.NegativeBills.checksum).where(m.NegativeBills.id.in_(bill_ids))).all())
+
+        uncached = []
+        for bill_id in bill_ids:
+            checksum = checksums.get(bill_id)
+            document = self.documents.get(checksum) if checksum is not None else None
+            self.loaded[bill_id] = document
+            if checksum is not None and document is None:
+                uncached.append(bill_id)
+        CACHE_LOOKUPS.labels("bills", "hit").inc(len(checksums) - len(uncached))
+        CACHE_LOOKUPS.labels("bills", "miss").inc(len(uncached))
+
+        if uncached:
+            bills = self.session.scalars(select(m.NegativeBills).where(m.NegativeBills.id.in_(uncached))).all()
+            with timed("serialize"):
+                documents = schema.negative_bills_schema.dump(bills)
+            for bill, document in zip(bills, documents):
+                self.documents.set(bill.checksum, document)
+                self.loaded[bill.id] = document
+
+
+def init_app(app):
+    """Create the process wide cache of serialized bills, `BILL_CACHE_SIZE` entries big."""
+    # entries are keyed on content checksums, so they can live as long as the process
+    app.extensions["tfp_bill_documents"] = LocalCacheBackend(
+        max_size=app.config.get("BILL_CACHE_SIZE", 4096), ttl=float("inf"))
+
+
+def get_negative_bills_loader(session):
+    """Get the negative bills loader of the current request, creating it on first use."""
+    if "negative_bills_loader" not in g:
+        g.negative_bills_loader = NegativeBillsLoader(session, current_app.extensions["tfp_bill_documents"])
+    return g.negative_bills_loader
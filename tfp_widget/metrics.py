@@ -0,0 +1,108 @@
+import functools
+import logging
+import os
+import time
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess, push_to_gateway)
+
+LOGGER = logging.getLogger()
+
+# Prometheus metrics of the API and the import pipeline, served on /metrics.
+#
+# With `PROMETHEUS_MULTIPROC_DIR` set before the app is imported, every gunicorn worker
+# writes its values to files in that directory and /metrics adds up all workers.
+
+# values are written as soon as the metrics below are defined, so the directory has to
+# exist first, also for commands run outside gunicorn
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+REQUEST_DURATION = Histogram(
+    "tfp_request_duration_seconds", "Time to answer API requests", ["endpoint", "method", "status"])
+REQUEST_QUERIES = Histogram(
+    "tfp_request_queries", "Database statements per API request", ["endpoint"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+CACHE_LOOKUPS = Counter(
+    "tfp_cache_lookups_total", "Cache lookups by cache and result (hit or miss)", ["cache", "result"])
+
+DB_POOL_WAIT = Histogram(
+    "tfp_db_pool_wait_seconds", "Time to check a connection out of the pool, including connecting",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10))
+DB_POOL_TIMEOUTS = Counter("tfp_db_pool_timeouts_total", "Checkouts that gave up waiting for a connection")
+DB_POOL_CHECKED_OUT = Gauge(
+    "tfp_db_pool_checked_out", "Connections currently checked out of the pools", multiprocess_mode="livesum")
+
+IMPORT_ROWS = Counter(
+    "tfp_import_rows_total", "Imported Airtable records by result (inserted, updated, unchanged, invalid)",
+    ["model", "result"])
+IMPORT_RELATIONS = Counter(
+    "tfp_import_relations_total", "Rep to negative bill relations added or removed", ["result"])
+IMPORT_DURATION = Histogram(
+    "tfp_import_duration_seconds", "Duration of import commands", ["command"],
+    buckets=(10, 30, 60, 120, 300, 600, 1200, 1800, 3600))
+AIRTABLE_PAGES = Counter("tfp_airtable_pages_total", "Pages fetched from the Airtable API", ["table"])
+AIRTABLE_BYTES = Counter("tfp_airtable_bytes_total", "Bytes transferred from the Airtable API", ["table"])
+AIRTABLE_RETRIES = Counter(
+    "tfp_airtable_retries_total", "Airtable requests retried, by response status", ["table", "status"])
+AIRTABLE_RETRY_WAIT = Counter(
+    "tfp_airtable_retry_wait_seconds_total", "Time spent backing off before Airtable retries", ["table"])
+AIRTABLE_THROTTLE_WAIT = Counter(
+    "tfp_airtable_throttle_wait_seconds_total", "Time Airtable requests waited for the client side rate limit",
+    ["table"])
+
+
+def get_registry():
+    """Registry to expose, collecting the values of every process in multiprocess mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def generate():
+    """Get the metrics in the Prometheus text format.
+
+    Returns:
+        tuple: The encoded metrics and their content type.
+    """
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
+
+
+def observe_request(endpoint, method, status, seconds, queries):
+    endpoint = endpoint or "none"
+    REQUEST_DURATION.labels(endpoint, method, str(status)).observe(seconds)
+    REQUEST_QUERIES.labels(endpoint).observe(queries)
+
+
+def push(job):
+    """Push the metrics of a command to the Pushgateway at `PROMETHEUS_PUSHGATEWAY_URL`, if set.
+
+    Commands do not live long enough to be scraped, and usually run on other machines than
+    the web workers.
+    """
+    url = os.getenv("PROMETHEUS_PUSHGATEWAY_URL")
+    if not url:
+        return
+    try:
+        push_to_gateway(url, job=job, registry=REGISTRY)
+    except OSError as e:
+        LOGGER.warning(f"Could not push metrics to {url}: {e}")
+
+
+def import_command(name):
+    """Decorate an import command to record its duration, then `push` the process's metrics."""
+    def decorator(command):
+        @functools.wraps(command)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return command(*args, **kwargs)
+            finally:
+                IMPORT_DURATION.labels(name).observe(time.perf_counter() - start)
+                push(name)
+
+        return wrapper
+
+    return decorator
@@ -1,20 +1,37 @@
 import logging
 import pprint
 from abc import abstractmethod
+from collections import defaultdict
+from datetime import datetime, timezone
 from typing import Optional
 import json
 
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
 from sqlalchemy import Column
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
 from sqlalchemy import Integer
+from sqlalchemy import LargeBinary
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import insert
 from sqlalchemy import select
 import hashlib
 
 from .database import db
+from .metrics import IMPORT_RELATIONS, IMPORT_ROWS
 
 LOGGER = logging.getLogger()
 
+# Airtable rep fields linking to negative bills, and the relation type they are stored as
+REP_RELATION_FIELDS = {
+    "Yea Votes": "yea_vote",
+    "Nay Votes": "nay_vote",
+    "Sponsorships": "sponsorship",
+    "Bills to Contact about": "contact",
+}
+
 
 class Base:
     def to_dict(self):
@@ -38,14 +55,27 @@ class Base:
         Returns:
             str: The SHA-256 hash as a hexadecimal string.
         """
+        return self.checksum_of(self.to_dict())
+
+    @staticmethod
+    def checksum_of(values):
+        """
+        Calculate the SHA-256 hash of a dict of column values, the same way as `sha256`.
+
+        Lets imports compare Airtable records against stored checksums without building
+        model instances.
 
-        self_dict = self.to_dict()
-        # don't recheck the checksum to prevent recursive checksums
-        del self_dict["checksum"]
-        sorted_keys = sorted(self_dict.keys())
+        Args:
+            values (dict): Column name to value, for every column of the model. A 'checksum'
+                key is ignored.
+
+        Returns:
+            str: The SHA-256 hash as a hexadecimal string.
+        """
+        sorted_keys = sorted(key for key in values.keys() if key != "checksum")
 
         return hashlib.sha256(
-            "".join([str(self_dict.get(key, "")) for key in sorted_keys]).encode(
+            "".join([str(values.get(key, "")) for key in sorted_keys]).encode(
                 "utf-8"
             )
         ).hexdigest()
@@ -97,17 +127,17 @@ class Base:
         Note:
             This method checks if the record already exists in the database. If it does,
             it updates the existing record with the data from the Airtable record. If the
-            sha256 hash of the existing record is different from the new record, the existing
+            stored checksum of the existing record is different from the new record, the existing
             record is updated. If the sha256 hashes match, the record is skipped. If the record
             does not exist in the database, a new instance is created and inserted.
 
             Does not commit, caller expected to commit.
         """
-        found_instance = cls.query.get(at_record["id"])
+        found_instance = db.session.get(cls, at_record["id"])
         new_instance = cls.from_airtable_record(at_record)
 
         if found_instance:
-            if found_instance.sha256 != new_instance.sha256:
+            if found_instance.checksum != new_instance.checksum:
                 # Update the
                 found_instance.from_airtable_record(at_record, found_instance)
                 db.session.add(found_instance)
@@ -122,40 +152,122 @@ class Base:
             return new_instance
 
     @classmethod
-    def bulk_upsert(cls, at_records):
+    def bulk_upsert(cls, at_records, batch_size=500, checksums=None):
         """Do a bulk upsert of a list of airtable records `at_records`
 
-        Uses the `id` and sha256 field to detect conflicts. If there is a conflict
-        this function *replaces* the existing record in the sql database.
+        Loads every stored `(id, checksum)` pair in one query, then computes the checksum of each
+        record straight from its column values. Only new or changed records are written, in
+        batches of `batch_size` with a single multi-row `INSERT ... ON CONFLICT (id) DO UPDATE`.
+        If there is a conflict this function *replaces* the existing record in the sql database.
+        Records missing a required field are logged and skipped.
 
         Args:
-            at_records (list): list of records obtained from Airtable api.
+            at_records (iterable): records obtained from Airtable api.
+            batch_size (int): Number of records per INSERT statement.
+            checksums (dict, optional): Result of `load_checksums`, to share one load across
+                several calls. Updated in place with the written checksums.
+
+        Returns:
+            dict: Number of records `inserted`, `updated`, `unchanged` and `invalid`.
 
         Example:
             `db_utils.bulk_upsert(state_reps)`
         """
+        upsert = cls.get_upsert_builder(db.session.get_bind())
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "invalid": 0}
+        if checksums is None:
+            checksums = cls.load_checksums(db.session)
 
-        total_count = 0
-
+        # keyed on id, a single statement may not touch the same row twice
+        batch = {}
         for at_record in at_records:
             try:
-                cls.upsert(at_record=at_record)
-                total_count += 1
+                row = cls.columns_from_airtable_record(at_record)
             except KeyError as e:
                 logging.error(
                     f"""ERROR: Record missing required field: {e}\n{pprint.pformat(at_record)}\n"""
                 )
-            if total_count % 100 == 0:
-                logging.info(f"Total records inserted into {cls.__name__}: {total_count}")
-
-        logging.info(f"Total records inserted into {cls.__name__}: {total_count}")
+                counts["invalid"] += 1
+                continue
+            row["checksum"] = cls.checksum_of(row)
+
+            stored_checksum = checksums.get(row["id"])
+            if stored_checksum == row["checksum"]:
+                counts["unchanged"] += 1
+                continue
+            counts["inserted" if stored_checksum is None else "updated"] += 1
+            checksums[row["id"]] = row["checksum"]
+
+            batch[row["id"]] = row
+            if len(batch) >= batch_size:
+                cls.upsert_batch(list(batch.values()), upsert)
+                batch = {}
+        if batch:
+            cls.upsert_batch(list(batch.values()), upsert)
 
         db.session.commit()
+        for result, count in counts.items():
+            IMPORT_ROWS.labels(cls.__name__, result).inc(count)
+        logging.info(f"Upserted into {cls.__name__}: {counts}")
+        return counts
+
+    @classmethod
+    def load_ids(cls, ids, session, chunk_size=500):
+        """Find which of the given ids are stored.
+
+        Args:
+            ids (iterable): Record ids to look for.
+            session: SQLAlchemy session to query with.
+            chunk_size (int): Number of ids per IN clause.
+
+        Returns:
+            set: The ids that exist in the database.
+        """
+        ids = list(ids)
+        found = set()
+        for i in range(0, len(ids), chunk_size):
+            found.update(session.scalars(select(cls.id).where(cls.id.in_(ids[i:i + chunk_size]))))
+        return found
+
+    @classmethod
+    def load_checksums(cls, session):
+        """Load the checksum of every stored record in a single query.
+
+        Returns:
+            dict: Record id to checksum.
+        """
+        return dict(session.execute(select(cls.id, cls.checksum)).all())
+
+    @classmethod
+    def upsert_batch(cls, rows, upsert):
+        """Write a batch of rows with one `INSERT ... ON CONFLICT (id) DO UPDATE` statement.
+
+        Args:
+            rows (list): Column dicts, including `checksum`, with unique ids.
+            upsert: Dialect specific insert construct from `get_upsert_builder`.
+
+        Note:
+            Rows whose stored checksum matches are left untouched.
+            Does not commit, caller expected to commit.
+        """
+        stmt = upsert(cls.__table__).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.__table__.c.id],
+            set_={name: stmt.excluded[name] for name in cls.__table__.columns.keys() if name != "id"},
+            where=cls.__table__.c.checksum != stmt.excluded.checksum,
+        )
+        db.session.execute(stmt)
+        logging.info(f"Upserted {len(rows)} records into {cls.__name__}")
 
     @abstractmethod
     def from_airtable_record(self, at_record):
         raise NotImplementedError()
 
+    @classmethod
+    @abstractmethod
+    def columns_from_airtable_record(cls, at_record):
+        raise NotImplementedError()
+
 
 class RepsToNegativeBills(db.Model, Base):
     """
@@ -170,72 +282,260 @@ class RepsToNegativeBills(db.Model, Base):
     """
 
     __tablename__ = "reps_to_negative_bills"
+    __table_args__ = (
+        # serves the lookups by rep (search, relation sync) and keeps relations unique
+        Index("ix_reps_to_negative_bills_rep_type_bill", "rep_id", "relation_type", "negative_bills_id",
+              unique=True),
+        Index("ix_reps_to_negative_bills_bill_type", "negative_bills_id", "relation_type"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    rep_id: Mapped[str]
-    negative_bills_id: Mapped[str]
+    rep_id: Mapped[str] = mapped_column(ForeignKey("reps.id", ondelete="CASCADE"))
+    negative_bills_id: Mapped[str] = mapped_column(ForeignKey("negative_bills.id", ondelete="CASCADE"))
     relation_type: Mapped[str]
 
     @classmethod
-    def rep_build_all_relations(cls, at_reps, session):
-        logger = logging.getLogger()
-        total = {"yea_vote": 0, "nay_vote": 0, "sponsorship_vote": 0, "contact_bills": 0}
-        last_total = 0
-        for at_rep in at_reps:
-            for yea_vote in at_rep.get("fields").get("Yea Votes", []):
-                cls.rep_negative_bill_relation_insert(at_rep["id"], yea_vote, "yea_vote", session)
-                total["yea_vote"] += 1
-            for nay_vote in at_rep.get("fields").get("Nay Votes", []):
-                cls.rep_negative_bill_relation_insert(at_rep["id"], nay_vote, "nay_vote", session)
-                total["nay_vote"] += 1
-            for sponsorship in at_rep.get("fields").get("Sponsorships", []):
-                cls.rep_negative_bill_relation_insert(
-                    at_rep["id"], sponsorship, "sponsorship", session
-                )
-                total["sponsorship_vote"] += 1
-            for contact_bills in at_rep.get("fields").get("Bills to Contact about", []):
-                cls.rep_negative_bill_relation_insert(
-                    at_rep["id"], contact_bills, "contact", session
-                )
-                total["contact_bills"] += 1
+    def relations_from_airtable_record(cls, at_rep):
+        """Get the relations a rep's Airtable record links to.
 
-            total_so_far = sum([y for x, y in total.items()])
+        Args:
+            at_rep (dict): Nested dict representing an airtable rep record.
 
-            if total_so_far - last_total > 500:
-                LOGGER.info(f"Total records inserted into {cls.__name__}: {total_so_far}")
-                last_total = total_so_far
+        Returns:
+            list: `(rep_id, negative_bills_id, relation_type)` tuples, in Airtable order.
+        """
+        return [
+            (at_rep["id"], bill_id, relation_type)
+            for field, relation_type in REP_RELATION_FIELDS.items()
+            for bill_id in at_rep.get("fields").get(field, [])
+        ]
 
-        db.session.commit()
-        logger.info(
-            f"Relationships created: yea_vote={total['yea_vote']}, nay_vote={total['nay_vote']}, \
-            sponsorship_vote={total['sponsorship_vote']}, contact_bills={total['contact_bills']}")
+    @classmethod
+    def load_relations(cls, rep_ids, session, chunk_size=500):
+        """Load the stored relations of a set of reps.
+
+        Args:
+            rep_ids (iterable): Ids of the reps to load relations for.
+            session: SQLAlchemy session to query with.
+            chunk_size (int): Number of rep ids per IN clause.
+
+        Returns:
+            dict: `(rep_id, negative_bills_id, relation_type)` tuple to relation id.
+        """
+        rep_ids = list(rep_ids)
+        relations = {}
+        for i in range(0, len(rep_ids), chunk_size):
+            stmt = (
+                select(cls.id, cls.rep_id, cls.negative_bills_id, cls.relation_type)
+                .where(cls.rep_id.in_(rep_ids[i:i + chunk_size]))
+            )
+            for relation_id, rep_id, negative_bills_id, relation_type in session.execute(stmt):
+                relations[(rep_id, negative_bills_id, relation_type)] = relation_id
+        return relations
+
+    @classmethod
+    def rep_build_all_relations(cls, at_reps, session, batch_size=1000):
+        """Sync the relations of the given reps with their Airtable records.
+
+        Loads the stored relations of the reps once, diffs them against the relations in
+        `at_reps` that point at stored reps and negative bills, then inserts the missing ones
+        with multi-row INSERTs and deletes the ones no longer in Airtable, `batch_size` rows
+        per statement. Relations of reps not in `at_reps` are left alone.
+
+        Relations to negative bills that are not stored yet are saved as `PendingRelation`
+        rows instead, and inserted by `insert_pending` once their bill is imported.
+
+        Args:
+            at_reps (iterable): Rep records obtained from Airtable api.
+            session: SQLAlchemy session to write with. Commits.
+            batch_size (int): Number of rows per INSERT or DELETE statement.
+
+        Returns:
+            dict: Number of relations `added`, `removed`, `unchanged` and `pending`.
+        """
+        logger = logging.getLogger()
+        rep_ids = set()
+        # dict rather than set keeps the Airtable order, which search results are listed in
+        desired = {}
+        for at_rep in at_reps:
+            rep_ids.add(at_rep["id"])
+            for relation in cls.relations_from_airtable_record(at_rep):
+                desired[relation] = None
+
+        # links to reps or bills that were not imported would violate the foreign keys. Reps
+        # are upserted right before, so a missing rep had an invalid record and is skipped.
+        # A missing bill may not be imported yet, its relations are kept as pending.
+        known_rep_ids = Rep.load_ids(rep_ids, session)
+        known_bill_ids = NegativeBills.load_ids({relation[1] for relation in desired}, session)
+        missing_reps = [relation for relation in desired if relation[0] not in known_rep_ids]
+        pending = [
+            relation for relation in desired
+            if relation[0] in known_rep_ids and relation[1] not in known_bill_ids
+        ]
+        for relation in missing_reps + pending:
+            del desired[relation]
+        if missing_reps:
+            logger.warning(f"Skipped {len(missing_reps)} relations of reps missing from the database")
+        if pending:
+            logger.warning(f"Deferred {len(pending)} relations to negative bills missing from the database")
+        PendingRelation.replace(rep_ids, pending, session)
+
+        existing = cls.load_relations(rep_ids, session)
+        additions = [relation for relation in desired if relation not in existing]
+        stale_ids = [relation_id for relation, relation_id in existing.items() if relation not in desired]
+
+        for i in range(0, len(additions), batch_size):
+            rows = [
+                {"rep_id": rep_id, "negative_bills_id": negative_bills_id, "relation_type": relation_type}
+                for rep_id, negative_bills_id, relation_type in additions[i:i + batch_size]
+            ]
+            session.execute(insert(cls).values(rows))
+            LOGGER.info(f"Total records inserted into {cls.__name__}: {i + len(rows)}")
+        for i in range(0, len(stale_ids), batch_size):
+            session.execute(delete(cls).where(cls.id.in_(stale_ids[i:i + batch_size])))
+
+        session.commit()
+        counts = {
+            "added": len(additions),
+            "removed": len(stale_ids),
+            "unchanged": len(desired) - len(additions),
+            "pending": len(pending),
+        }
+        IMPORT_RELATIONS.labels("added").inc(counts["added"])
+        IMPORT_RELATIONS.labels("removed").inc(counts["removed"])
+        logger.info(f"Relationships synced for {len(rep_ids)} reps: {counts}")
+        return counts
 
     @classmethod
     def from_airtable_record(cls, at_record):
         raise NotImplementedError()
 
     @classmethod
-    def rep_negative_bill_relation_insert(cls, rep_id, bill_id, rtype, session):
-        # check for duplicate record
-        existing_stmt = (
-            select(cls)
-            .where(cls.rep_id == rep_id)
-            .where(cls.negative_bills_id == bill_id)
-            .where(cls.relation_type == rtype)
+    def case_names_query(cls, rep_ids, relation_types):
+        """Select the `(rep_id, relation_type, case_name)` rows read by `case_names_for_reps`."""
+        return (
+            select(cls.rep_id, cls.relation_type, NegativeBills.case_name)
+            .join(NegativeBills, NegativeBills.id == cls.negative_bills_id)
+            .where(cls.rep_id.in_(list(rep_ids)))
+            .where(cls.relation_type.in_(relation_types))
+            .order_by(cls.id)
         )
 
-        if len(session.scalars(existing_stmt).all()) == 0:
-            logging.debug(f"Adding bill relation: {rep_id}, {bill_id}, {rtype}")
-            new_relation = cls()
-            new_relation.rep_id = rep_id
-            new_relation.negative_bills_id = bill_id
-            new_relation.relation_type = rtype
+    @classmethod
+    def case_names_for_reps(cls, rep_ids, relation_types, session):
+        """Load the negative bill case names related to a set of reps in a single query.
+
+        Args:
+            rep_ids (list): Ids of the reps to load relations for.
+            relation_types (list): Relation types to include (e.g. "sponsorship", "yea_vote").
+            session: SQLAlchemy session to query with.
 
-            session.add(new_relation)
+        Returns:
+            dict: Maps each rep id to a `defaultdict(list)` of relation type -> case names,
+            in relation insertion order. Reps without relations map to an empty mapping.
+        """
+        mappings = {rep_id: defaultdict(list) for rep_id in rep_ids}
+        if not mappings:
+            return mappings
+
+        for rep_id, relation_type, case_name in session.execute(cls.case_names_query(mappings, relation_types)):
+            mappings[rep_id][relation_type].append(case_name)
+
+        return mappings
+
+    @classmethod
+    def insert_pending(cls, session, batch_size=1000):
+        """Insert the pending relations whose negative bill is stored by now.
+
+        Pending relations of reps that were deleted meanwhile are dropped. Commits.
+
+        Args:
+            session: SQLAlchemy session to write with.
+            batch_size (int): Number of rows per INSERT statement.
+
+        Returns:
+            int: Number of relations added.
+        """
+        pending = session.execute(
+            select(PendingRelation.rep_id, PendingRelation.negative_bills_id, PendingRelation.relation_type)
+            .join(Rep, Rep.id == PendingRelation.rep_id)
+            .join(NegativeBills, NegativeBills.id == PendingRelation.negative_bills_id)
+            .order_by(PendingRelation.id)
+        ).all()
+        existing = cls.load_relations({rep_id for rep_id, _, _ in pending}, session)
+        additions = [tuple(relation) for relation in pending if tuple(relation) not in existing]
+        for i in range(0, len(additions), batch_size):
+            rows = [
+                {"rep_id": rep_id, "negative_bills_id": negative_bills_id, "relation_type": relation_type}
+                for rep_id, negative_bills_id, relation_type in additions[i:i + batch_size]
+            ]
+            session.execute(insert(cls).values(rows))
+        session.execute(delete(PendingRelation).where(
+            PendingRelation.negative_bills_id.in_(select(NegativeBills.id))
+            | PendingRelation.rep_id.not_in(select(Rep.id))
+        ))
+        session.commit()
+        IMPORT_RELATIONS.labels("added").inc(len(additions))
+        if additions:
+            LOGGER.info(f"Inserted {len(additions)} pending relations to negative bills imported since")
+        return len(additions)
+
+
+class PendingRelation(db.Model):
+    """
+    A rep's link to a negative bill that was not imported yet, see `RepsToNegativeBills.insert_pending`.
+
+    Has no foreign key to the bill, which is why it is stored here rather than in
+    `reps_to_negative_bills`.
+
+    Attributes:
+        id (int): Insertion order, kept when the relations are inserted.
+        rep_id (str): Id of the rep.
+        negative_bills_id (str): Id of the missing negative bill.
+        relation_type (str): Type of the relation, e.g. "yea_vote".
+    """
+
+    __tablename__ = "pending_relations"
+    __table_args__ = (
+        Index("ix_pending_relations_rep_type_bill", "rep_id", "relation_type", "negative_bills_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    rep_id: Mapped[str] = mapped_column(ForeignKey("reps.id", ondelete="CASCADE"))
+    negative_bills_id: Mapped[str]
+    relation_type: Mapped[str]
+
+    @classmethod
+    def replace(cls, rep_ids, relations, session, chunk_size=500):
+        """Replace the pending relations of the given reps. Does not commit.
+
+        Args:
+            rep_ids (iterable): Ids of the reps whose pending relations are replaced.
+            relations (list): `(rep_id, negative_bills_id, relation_type)` tuples now pending.
+            session: SQLAlchemy session to write with.
+            chunk_size (int): Number of ids or rows per statement.
+        """
+        rep_ids = list(rep_ids)
+        for i in range(0, len(rep_ids), chunk_size):
+            session.execute(delete(cls).where(cls.rep_id.in_(rep_ids[i:i + chunk_size])))
+        for i in range(0, len(relations), chunk_size):
+            rows = [
+                {"rep_id": rep_id, "negative_bills_id": negative_bills_id, "relation_type": relation_type}
+                for rep_id, negative_bills_id, relation_type in relations[i:i + chunk_size]
+            ]
+            session.execute(insert(cls).values(rows))
 
 
 class Rep(db.Model, Base):
     __tablename__ = "reps"
+    # trigram indexes serving rep search on postgres, see `search.PostgresTrigramSearchBackend`
+    __table_args__ = tuple(
+        Index(
+            f"ix_reps_{name}_trgm", name,
+            postgresql_using="gin", postgresql_ops={name: "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql")
+        for name in ["name", "state", "district", "role"]
+    )
 
     id: Mapped[str] = mapped_column(primary_key=True)
     # required fields
@@ -266,6 +566,51 @@ class Rep(db.Model, Base):
     legiscan_id: Mapped[Optional[int]]
     checksum: Mapped[str] = mapped_column(index=True, unique=True)
 
+    # Airtable fields read by `columns_from_airtable_record` and the relation sync, the
+    # only ones requested from the API
+    airtable_fields = [
+        "Name", "District", "State", "Role", "Created", "Last Modified", "Political Party",
+        "Up For Reelection On", "Website", "Email", "Facebook", "Twitter", "Capitol Address",
+        "Capitol Phone Number", "District Address", "District Phone Number", "Follow the Money EID",
+        "Legiscan ID", *REP_RELATION_FIELDS,
+    ]
+
+    @classmethod
+    def columns_from_airtable_record(cls, at_record):
+        """Maps airtable fields to SQL column values, without building a model instance.
+
+        Args:
+            at_record (dict): Nested dict representing an airtable data record.
+
+        Returns:
+            dict: Column name to value for every column but `checksum`.
+
+        Raises:
+            KeyError: If a required field is missing.
+        """
+        return {
+            "id": at_record["id"],
+            "name": at_record["fields"]["Name"],
+            "district": at_record["fields"]["District"],
+            "state": at_record["fields"]["State"],
+            "role": at_record["fields"]["Role"],
+            "created": at_record["fields"]["Created"],
+            "modified": at_record["fields"]["Last Modified"],
+
+            "political_party": at_record.get("fields").get("Political Party"),
+            "reelection_date": at_record.get("fields").get("Up For Reelection On"),
+            "website": at_record.get("fields").get("Website"),
+            "email": at_record.get("fields").get("Email"),
+            "facebook": at_record.get("fields").get("Facebook"),
+            "twitter": at_record.get("fields").get("Twitter"),
+            "capitol_address": at_record.get("fields").get("Capitol Address"),
+            "capitol_phone": at_record.get("fields").get("Capitol Phone Number"),
+            "district_address": at_record.get("fields").get("District Address"),
+            "district_phone": at_record.get("fields").get("District Phone Number"),
+            "ftm_eid": at_record.get("fields").get("Follow the Money EID"),
+            "legiscan_id": at_record.get("fields").get("Legiscan ID"),
+        }
+
     @classmethod
     def from_airtable_record(cls, at_record, existing_instance=None):
         """Imports airtable record mapping airtable fields to SQL columns.
@@ -281,26 +626,8 @@ class Rep(db.Model, Base):
             new_instance = cls()
         else:
             new_instance = existing_instance
-        new_instance.id = at_record["id"]
-        new_instance.name = at_record["fields"]["Name"]
-        new_instance.district = at_record["fields"]["District"]
-        new_instance.state = at_record["fields"]["State"]
-        new_instance.role = at_record["fields"]["Role"]
-        new_instance.created = at_record["fields"]["Created"]
-        new_instance.modified = at_record["fields"]["Last Modified"]
-
-        new_instance.political_party = at_record.get("fields").get("Political Party")
-        new_instance.reelection_date = at_record.get("fields").get("Up For Reelection On")
-        new_instance.website = at_record.get("fields").get("Website")
-        new_instance.email = at_record.get("fields").get("Email")
-        new_instance.facebook = at_record.get("fields").get("Facebook")
-        new_instance.twitter = at_record.get("fields").get("Twitter")
-        new_instance.capitol_address = at_record.get("fields").get("Capitol Address")
-        new_instance.capitol_phone = at_record.get("fields").get("Capitol Phone Number")
-        new_instance.district_address = at_record.get("fields").get("District Address")
-        new_instance.district_phone = at_record.get("fields").get("District Phone Number")
-        new_instance.ftm_eid = at_record.get("fields").get("Follow the Money EID")
-        new_instance.legiscan_id = at_record.get("fields").get("Legiscan ID")
+        for name, value in cls.columns_from_airtable_record(at_record).items():
+            setattr(new_instance, name, value)
         new_instance.checksum = new_instance.sha256()
 
         # Do not commit the instance inside this function.
@@ -328,6 +655,41 @@ class NegativeBills(db.Model, Base):
 
     checksum: Mapped[str] = mapped_column(index=True, unique=True)
 
+    # Airtable fields read by `columns_from_airtable_record`, the only ones requested from the API
+    airtable_fields = [
+        "Case Name", "Category", "Expanded Category", "Last Activity Date", "Last Modified",
+        "Legiscan Bill ID", "Progress", "State", "Status", "Summary", "Bill Information Link",
+    ]
+
+    @classmethod
+    def columns_from_airtable_record(cls, at_record):
+        """Maps airtable fields to SQL column values, without building a model instance.
+
+        Args:
+            at_record (dict): Nested dict representing an airtable data record.
+
+        Returns:
+            dict: Column name to value for every column but `checksum`.
+
+        Raises:
+            KeyError: If a required field is missing.
+        """
+        return {
+            "id": at_record["id"],
+            "created": at_record["createdTime"],
+            "case_name": at_record["fields"]["Case Name"],
+            "category": json.dumps(at_record["fields"].get("Category")),
+            "expanded_category": json.dumps(at_record["fields"].get("Expanded Category")),
+            "last_activity": at_record["fields"].get("Last Activity Date"),
+            "last_modified": at_record["fields"].get("Last Modified"),
+            "legiscan_id": at_record["fields"].get("Legiscan Bill ID"),
+            "progress": at_record["fields"].get("Progress"),
+            "state": at_record["fields"].get("State"),
+            "status": at_record["fields"].get("Status"),
+            "summary": at_record["fields"].get("Summary"),
+            "bill_information_link": at_record["fields"].get("Bill Information Link"),
+        }
+
     @classmethod
     def from_airtable_record(cls, at_record, existing_instance=None):
         """Imports airtable record mapping airtable fields to SQL columns.
@@ -343,25 +705,150 @@ class NegativeBills(db.Model, Base):
             new_instance = cls()
         else:
             new_instance = existing_instance
-        new_instance.id = at_record["id"]
-        new_instance.created = at_record["createdTime"]
-        new_instance.case_name = at_record["fields"]["Case Name"]
-        new_instance.category = json.dumps(at_record["fields"].get("Category"))
-        new_instance.expanded_category = json.dumps(at_record["fields"].get("Expanded Category"))
-        new_instance.last_activity = at_record["fields"].get("Last Activity Date")
-        new_instance.last_modified = at_record["fields"].get("Last Modified")
-        new_instance.legiscan_id = at_record["fields"].get("Legiscan Bill ID")
-        new_instance.progress = at_record["fields"].get("Progress")
-        new_instance.state = at_record["fields"].get("State")
-        new_instance.status = at_record["fields"].get("Status")
-        new_instance.summary = at_record["fields"].get("Summary")
-        new_instance.bill_information_link = at_record["fields"].get("Bill Information Link")
+        for name, value in cls.columns_from_airtable_record(at_record).items():
+            setattr(new_instance, name, value)
 
         new_instance.checksum = new_instance.sha256()
 
         return new_instance
 
 
+class DatasetVersion(db.Model):
+    """
+    Version counter for the imported Airtable dataset, bumped every time an import commits.
+
+    Processes that keep derived data around (search indexes, caches) compare their copy
+    against this row to find out when to rebuild.
+
+    Attributes:
+        id (int): Always 1, there is a single row.
+        version (int): Incremented by every import.
+        updated (str): ISO 8601 UTC timestamp of the last import.
+    """
+
+    __tablename__ = "dataset_version"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int]
+    updated: Mapped[str]
+
+    @classmethod
+    def current(cls, session):
+        """Get the current dataset version row, or None if nothing was imported yet."""
+        return session.get(cls, 1)
+
+    @classmethod
+    def bump(cls, session):
+        """Increment the dataset version. Commits, so call it after the import has committed.
+
+        Returns:
+            DatasetVersion: The updated row.
+        """
+        dataset_version = cls.current(session)
+        if dataset_version is None:
+            dataset_version = cls(id=1, version=0)
+            session.add(dataset_version)
+        dataset_version.version += 1
+        dataset_version.updated = datetime.now(timezone.utc).isoformat()
+        session.commit()
+        LOGGER.info(f"Dataset version is now {dataset_version.version}")
+        return dataset_version
+
+
+class RepDocument(db.Model):
+    """
+    A rep's search API payload, serialized at import time.
+
+    Holds the final JSON of `schema.RepSchema` with the bill case names resolved, so requests
+    only have to look documents up by id. Rebuilt by `schema.refresh_rep_documents` after
+    every import that changed something.
+
+    Attributes:
+        rep_id (str): Id of the rep.
+        document (str): JSON encoded rep dict.
+    """
+
+    __tablename__ = "rep_documents"
+
+    rep_id: Mapped[str] = mapped_column(ForeignKey("reps.id", ondelete="CASCADE"), primary_key=True)
+    document: Mapped[str]
+
+    @classmethod
+    def load(cls, rep_ids, session, chunk_size=500):
+        """Load the stored documents of a set of reps.
+
+        Args:
+            rep_ids (list): Ids of the reps.
+            session: SQLAlchemy session to query with.
+            chunk_size (int): Number of ids per IN clause.
+
+        Returns:
+            dict: Rep id to JSON encoded document, reps without a document are left out.
+        """
+        rep_ids = list(rep_ids)
+        documents = {}
+        for i in range(0, len(rep_ids), chunk_size):
+            stmt = select(cls.rep_id, cls.document).where(cls.rep_id.in_(rep_ids[i:i + chunk_size]))
+            documents.update(session.execute(stmt).tuples().all())
+        return documents
+
+    @classmethod
+    def is_complete(cls, session):
+        """Whether every rep has a document, i.e. no rep was stored without a refresh."""
+        rep_count = session.scalar(select(func.count()).select_from(Rep))
+        return session.scalar(select(func.count()).select_from(cls)) == rep_count
+
+
+class ExportSnapshot(db.Model):
+    """
+    Gzip compressed JSON export of a whole dataset, built once per import by `exports.refresh_exports`.
+
+    Attributes:
+        name (str): Export name, a key of `exports.EXPORTS`.
+        etag (str): Combined checksum of the rows the export was built from.
+        body (bytes): Gzip compressed JSON array.
+        record_count (int): Number of records in the export.
+        created (str): ISO 8601 UTC timestamp the export was built.
+    """
+
+    __tablename__ = "export_snapshots"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    etag: Mapped[str]
+    # only loaded when the body is sent, revalidations only need the etag
+    body: Mapped[bytes] = mapped_column(LargeBinary, deferred=True)
+    record_count: Mapped[int]
+    created: Mapped[str]
+
+
+class SyncState(db.Model):
+    """
+    Progress of the incremental Airtable sync, one row per table.
+
+    Attributes:
+        table_key (str): Environment variable key of the Airtable table, e.g. `STATE_REPS_TABLE`.
+        high_water_mark (str): ISO 8601 UTC time the last successful sync started. The next
+            sync only requests records modified after it.
+        last_full_sync (str): ISO 8601 UTC time the last full sweep started, which also
+            deletes records removed from Airtable.
+    """
+
+    __tablename__ = "sync_state"
+
+    table_key: Mapped[str] = mapped_column(primary_key=True)
+    high_water_mark: Mapped[Optional[str]]
+    last_full_sync: Mapped[Optional[str]]
+
+    @classmethod
+    def for_table(cls, table_key, session):
+        """Get the sync state of a table, adding an empty one if it was never synced."""
+        sync_state = session.get(cls, table_key)
+        if sync_state is None:
+            sync_state = cls(table_key=table_key)
+            session.add(sync_state)
+        return sync_state
+
+
 negative_bills_json_example = """{'createdTime': '2023-04-11T23:16:25.000Z',
   'fields': {'Bill Information Link': 'https://legiscan.com/AL/bill/HB261/2023',
              'Case Name': 'AL HB261',
@@ -1,11 +1,65 @@
+import json
+import logging
+
 from marshmallow import fields
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema, auto_field
+from sqlalchemy import delete, select
+
+from .instrumentation import timed
+from .models import Base, NegativeBills, Rep, RepDocument, RepsToNegativeBills
+
+LOGGER = logging.getLogger()
 
-from .models import Rep
+# payload fields listing related bill case names, and the relation type each lists
+REP_BILL_FIELDS = {
+    "billsSponsored": "sponsorship",
+    "billsYeaVotes": "yea_vote",
+    "billsNayVotes": "nay_vote",
+}
 
+# relation types included in the rep search payload
+REP_BILL_TYPES = list(REP_BILL_FIELDS.values())
 
+
+# noinspection PyUnusedLocal
 class NegativeBillsSchema(SQLAlchemyAutoSchema):
-    pass
+    class Meta:
+        fields = (
+            "id",
+            "caseName",
+            "state",
+            "status",
+            "progress",
+            "category",
+            "expandedCategory",
+            "lastActivityDate",
+            "lastModified",
+            "legiscanId",
+            "billInformationLink",
+            "summary",
+        )
+        model = NegativeBills
+        load_instance = True
+
+    id = auto_field()
+    caseName = auto_field("case_name", dump_only=True)
+    category = fields.Method("get_category", dump_only=True)
+    expandedCategory = fields.Method("get_expanded_category", dump_only=True)
+    lastActivityDate = auto_field("last_activity", dump_only=True)
+    lastModified = auto_field("last_modified", dump_only=True)
+    legiscanId = auto_field("legiscan_id", dump_only=True)
+    billInformationLink = auto_field("bill_information_link", dump_only=True)
+
+    def get_category(self, bill):
+        # stored JSON encoded, see `NegativeBills.columns_from_airtable_record`
+        return json.loads(bill.category) if bill.category else None
+
+    def get_expanded_category(self, bill):
+        return json.loads(bill.expanded_category) if bill.expanded_category else None
+
+
+# one instance for every dump, building a schema is much slower than dumping with it
+negative_bills_schema = NegativeBillsSchema(many=True)
 
 
 # noinspection PyUnusedLocal
@@ -49,3 +103,119 @@ class RepSchema(SQLAlchemyAutoSchema):
     def get_bills_nay_votes(self, rep):
         mapping = self.context.get("mapping")
         return mapping["nay_vote"]
+
+
+def compile_rep_fields():
+    """Read the payload layout off `RepSchema` once, for `serialize_reps`.
+
+    Returns:
+        list: `(key, attribute, relation_type)` per payload field in `RepSchema` order, with
+        either the `Rep` attribute or the relation type whose case names are listed set.
+    """
+    rep_fields = []
+    for key, field in RepSchema().dump_fields.items():
+        if key in REP_BILL_FIELDS:
+            rep_fields.append((key, None, REP_BILL_FIELDS[key]))
+        else:
+            rep_fields.append((key, field.attribute or key, None))
+    return rep_fields
+
+
+REP_FIELDS = compile_rep_fields()
+
+
+def serialize_reps(reps, mappings):
+    """Serialize reps exactly like `RepSchema`, without building a schema per rep.
+
+    Args:
+        reps (list): `Rep` instances, or rows with the same attributes.
+        mappings (dict): Rep id to relation type -> case names, see `case_names_for_reps`.
+
+    Returns:
+        list: One dict per rep, in the order given.
+    """
+    result = []
+    with timed("serialize"):
+        for rep in reps:
+            mapping = mappings[rep.id]
+            result.append({
+                key: getattr(rep, attribute) if relation_type is None else mapping[relation_type]
+                for key, attribute, relation_type in REP_FIELDS
+            })
+    return result
+
+
+def dump_reps(reps, session):
+    """Serialize reps for the search API.
+
+    Args:
+        reps (list): `Rep` instances to serialize.
+        session: SQLAlchemy session used to load the bill case names, in a single query.
+
+    Returns:
+        list: One dict per rep, in the order given.
+    """
+    mappings = RepsToNegativeBills.case_names_for_reps([rep.id for rep in reps], REP_BILL_TYPES, session)
+    return serialize_reps(reps, mappings)
+
+
+def load_rep_documents(reps, session):
+    """Get the search API dicts of reps, from their stored `RepDocument` when there is one.
+
+    Reps stored without a document refresh are serialized on the spot.
+
+    Args:
+        reps (list): `Rep` instances.
+        session: SQLAlchemy session.
+
+    Returns:
+        list: One dict per rep, in the order given.
+    """
+    stored = RepDocument.load([rep.id for rep in reps], session)
+    missing = [rep for rep in reps if rep.id not in stored]
+    live = dict(zip([rep.id for rep in missing], dump_reps(missing, session))) if missing else {}
+    return [json.loads(stored[rep.id]) if rep.id in stored else live[rep.id] for rep in reps]
+
+
+def refresh_rep_documents(session, batch_size=500):
+    """Serialize every rep into `rep_documents`, writing only documents that changed.
+
+    Reps are read in id order, `batch_size` at a time, and documents of deleted reps are
+    removed. Commits.
+
+    Args:
+        session: SQLAlchemy session.
+        batch_size (int): Number of reps serialized at a time.
+
+    Returns:
+        dict: Number of documents `written`, `unchanged` and `deleted`.
+    """
+    upsert = Base.get_upsert_builder(session.get_bind())
+    counts = {"written": 0, "unchanged": 0, "deleted": 0}
+    last_id = ""
+    while True:
+        reps = session.scalars(select(Rep).where(Rep.id > last_id).order_by(Rep.id).limit(batch_size)).all()
+        if not reps:
+            break
+        last_id = reps[-1].id
+
+        stored = RepDocument.load([rep.id for rep in reps], session)
+        rows = []
+        for rep, document in zip(reps, dump_reps(reps, session)):
+            encoded = json.dumps(document)
+            if stored.get(rep.id) == encoded:
+                counts["unchanged"] += 1
+            else:
+                rows.append({"rep_id": rep.id, "document": encoded})
+        if rows:
+            stmt = upsert(RepDocument.__table__).values(rows)
+            stmt = stmt.on_conflict_do_update(index_elements=[RepDocument.rep_id],
+                                              set_={"document": stmt.excluded.document})
+            session.execute(stmt)
+            counts["written"] += len(rows)
+
+    result = session.execute(delete(RepDocument).where(RepDocument.rep_id.not_in(select(Rep.id))))
+    counts["deleted"] = result.rowcount
+    session.commit()
+    LOGGER.info(f"Refreshed rep documents: {counts}")
+    return counts
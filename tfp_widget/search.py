@@ -0,0 +1,332 @@
+import logging
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import DDL, and_, event, func, literal_column, or_, select, table, text
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from sqlalchemy.sql.expression import cast, column
+
+from . import models as m
+from . import schema
+from .database import db
+from .search_index import SEARCH_COLUMNS, RepSearchIndex
+
+LOGGER = logging.getLogger()
+
+# FTS5 table mirroring the searchable rep columns, kept in sync by triggers.
+# The trigram tokenizer gives the same substring semantics as `ilike('%...%')`.
+# It is keyed on the implicit rowid of `reps`, which has no INTEGER PRIMARY KEY and so
+# no stable rowid, see `rebuild_sqlite_fts`.
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS reps_fts USING fts5(
+        name, state, district, role, content='reps', content_rowid='rowid', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS reps_fts_ai AFTER INSERT ON reps BEGIN
+        INSERT INTO reps_fts(rowid, name, state, district, role)
+        VALUES (new.rowid, new.name, new.state, new.district, new.role);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS reps_fts_ad AFTER DELETE ON reps BEGIN
+        INSERT INTO reps_fts(reps_fts, rowid, name, state, district, role)
+        VALUES ('delete', old.rowid, old.name, old.state, old.district, old.role);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS reps_fts_au AFTER UPDATE ON reps BEGIN
+        INSERT INTO reps_fts(reps_fts, rowid, name, state, district, role)
+        VALUES ('delete', old.rowid, old.name, old.state, old.district, old.role);
+        INSERT INTO reps_fts(rowid, name, state, district, role)
+        VALUES (new.rowid, new.name, new.state, new.district, new.role);
+    END""",
+]
+SQLITE_FTS_TRIGGERS = ["reps_fts_ai", "reps_fts_ad", "reps_fts_au"]
+
+event.listen(
+    m.Rep.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+for _statement in SQLITE_FTS_DDL:
+    event.listen(m.Rep.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(m.Rep.__table__, "before_drop", DDL("DROP TABLE IF EXISTS reps_fts").execute_if(dialect="sqlite"))
+
+
+def rebuild_sqlite_fts(connection):
+    """Recreate the `reps_fts` triggers and reindex it from the current rowids of `reps`.
+
+    VACUUM may renumber the rowids of `reps`, and a table rebuild such as Alembic's
+    `batch_alter_table` renumbers them and drops the triggers, both leave `reps_fts`
+    pointing at the wrong reps. Run this after either, e.g. at the end of a migration
+    rebuilding `reps`.
+
+    Args:
+        connection: SQLAlchemy connection to a SQLite database, `op.get_bind()` in a migration.
+    """
+    for trigger in SQLITE_FTS_TRIGGERS:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    for statement in SQLITE_FTS_DDL:
+        connection.execute(text(statement))
+    connection.execute(text("INSERT INTO reps_fts(reps_fts) VALUES ('rebuild')"))
+
+
+LIKE_ESCAPE = "\\"
+
+
+def contains_pattern(search_query):
+    """`ilike` pattern matching `search_query` anywhere, with its `%` and `_` taken literally.
+
+    Use with `escape=LIKE_ESCAPE`. Unescaped, a query of `_` would match every rep.
+    """
+    for char in (LIKE_ESCAPE, "%", "_"):
+        search_query = search_query.replace(char, LIKE_ESCAPE + char)
+    return f"%{search_query}%"
+
+
+class SearchBackend:
+    """Finds reps matching a search query, one keyset-paginated page at a time.
+
+    Each backend orders its results by its own sort keys. `search` returns the sort key
+    values of the last row on the page as the position to resume from.
+    """
+
+    name = None
+
+    def search(self, session, search_query, limit, position=None):
+        """Search for reps.
+
+        Args:
+            session: SQLAlchemy session to query with.
+            search_query (str): Text typed by the user.
+            limit (int): Maximum number of reps to return.
+            position (list, optional): Position returned with the previous page.
+
+        Returns:
+            tuple: List of `Rep` instances and the position of the next page, or None
+            when there are no more results.
+        """
+        rows = session.execute(self.build_query(search_query, limit + 1, position)).all()
+        next_position = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_position = self.position_of(rows[-1])
+        return [row[0] for row in rows], next_position
+
+    def search_documents(self, session, search_query, limit, position=None):
+        """Search for reps and serialize them for the search API.
+
+        Takes the same arguments as `search`.
+
+        Returns:
+            tuple: List of rep dicts and the position of the next page, or None.
+        """
+        reps, next_position = self.search(session, search_query, limit, position)
+        return schema.load_rep_documents(reps, session), next_position
+
+    def iter_documents(self, session, search_query, batch_size=500):
+        """Serialize every rep matching a query, in result order, `batch_size` reps at a time.
+
+        Rows are streamed with `yield_per`, a server-side cursor on Postgres, so memory use
+        does not grow with the number of results.
+
+        Args:
+            session: SQLAlchemy session to query with.
+            search_query (str): Text typed by the user.
+            batch_size (int): Number of reps loaded and serialized at a time.
+
+        Yields:
+            list: Rep dicts of one batch.
+        """
+        query = self.build_query(search_query, None, None).execution_options(yield_per=batch_size)
+        for rows in session.execute(query).partitions():
+            yield schema.load_rep_documents([row[0] for row in rows], session)
+
+    def build_query(self, search_query, limit, position):
+        raise NotImplementedError()
+
+    def position_of(self, row):
+        raise NotImplementedError()
+
+
+class LikeSearchBackend(SearchBackend):
+    """Unranked `ilike('%...%')` scan over the search columns, ordered by rep id.
+
+    Works on every dialect, and is used for queries too short for trigram matching.
+    """
+
+    name = "like"
+
+    def build_query(self, search_query, limit, position):
+        pattern = contains_pattern(search_query)
+        conditions = [getattr(m.Rep, name).ilike(pattern, escape=LIKE_ESCAPE) for name in SEARCH_COLUMNS]
+        query = select(m.Rep).where(or_(*conditions))
+        if position:
+            query = query.where(m.Rep.id > position[0])
+        return query.order_by(m.Rep.id).limit(limit)
+
+    def position_of(self, row):
+        return [row[0].id]
+
+
+class PostgresTrigramSearchBackend(SearchBackend):
+    """Relevance ranked search backed by the `pg_trgm` GIN indexes on the search columns.
+
+    The GIN indexes serve the `ilike('%...%')` predicates, and results are ranked by the
+    best `word_similarity` of the query against any search column.
+    """
+
+    name = "postgres-trgm"
+
+    def build_query(self, search_query, limit, position):
+        columns = [getattr(m.Rep, name) for name in SEARCH_COLUMNS]
+        pattern = contains_pattern(search_query)
+        conditions = [col.ilike(pattern, escape=LIKE_ESCAPE) for col in columns]
+        # word_similarity returns a float4; widen it so cursor values round trip exactly
+        rank = cast(
+            func.greatest(*[func.word_similarity(search_query, col) for col in columns]),
+            DOUBLE_PRECISION,
+        )
+        query = select(m.Rep, rank.label("rank")).where(or_(*conditions))
+        if position:
+            last_rank, last_id = position
+            query = query.where(or_(rank < last_rank, and_(rank == last_rank, m.Rep.id > last_id)))
+        return query.order_by(rank.desc(), m.Rep.id).limit(limit)
+
+    def position_of(self, row):
+        return [row.rank, row[0].id]
+
+
+class SqliteFtsSearchBackend(SearchBackend):
+    """Relevance ranked search over the `reps_fts` FTS5 trigram table, ordered by bm25."""
+
+    name = "sqlite-fts"
+    min_query_length = 3
+
+    def __init__(self):
+        self.fallback = LikeSearchBackend()
+
+    def search(self, session, search_query, limit, position=None):
+        if len(search_query) < self.min_query_length:
+            # the trigram tokenizer cannot match fewer than three characters
+            return self.fallback.search(session, search_query, limit, position)
+        return super().search(session, search_query, limit, position)
+
+    def iter_documents(self, session, search_query, batch_size=500):
+        if len(search_query) < self.min_query_length:
+            return self.fallback.iter_documents(session, search_query, batch_size)
+        return super().iter_documents(session, search_query, batch_size)
+
+    def build_query(self, search_query, limit, position):
+        fts = table("reps_fts", column("rowid"))
+        fts_table = literal_column("reps_fts")
+        rank = func.bm25(fts_table)
+        # quote the query as a single FTS5 string so its characters are matched literally
+        phrase = '"{}"'.format(search_query.replace('"', '""'))
+
+        query = (
+            select(m.Rep, rank.label("rank"))
+            .join_from(m.Rep, fts, fts.c.rowid == literal_column("reps.rowid"))
+            .where(fts_table.op("MATCH")(phrase))
+        )
+        if position:
+            last_rank, last_id = position
+            query = query.where(or_(rank > last_rank, and_(rank == last_rank, m.Rep.id > last_id)))
+        return query.order_by(rank, m.Rep.id).limit(limit)
+
+    def position_of(self, row):
+        return [row.rank, row[0].id]
+
+
+class MemorySearchBackend(SearchBackend):
+    """Searches an in-process `RepSearchIndex` of serialized reps, without touching the database.
+
+    The index is built on first use and rebuilt when `DatasetVersion` changes, checked at most
+    every `SEARCH_INDEX_REFRESH_SECONDS`. Requests keep using the old index while a new one is
+    built, and the new one is swapped in with a single assignment.
+    """
+
+    name = "memory"
+    build_batch_size = 500
+
+    def __init__(self):
+        self.index = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def search_documents(self, session, search_query, limit, position=None):
+        return self.get_index(session).search(search_query, limit, position)
+
+    def iter_documents(self, session, search_query, batch_size=500):
+        # the documents are in memory already, batches only keep the response streaming
+        index = self.get_index(session)
+        documents, _ = index.search(search_query, len(index))
+        for i in range(0, len(documents), batch_size):
+            yield documents[i:i + batch_size]
+
+    def get_index(self, session):
+        refresh_seconds = current_app.config.get("SEARCH_INDEX_REFRESH_SECONDS", 30)
+        if self.index is not None and time.monotonic() - self.checked_at < refresh_seconds:
+            return self.index
+
+        # only one thread checks and rebuilds, the others keep serving the current index
+        if not self.lock.acquire(blocking=self.index is None):
+            return self.index
+        try:
+            if self.index is None or time.monotonic() - self.checked_at >= refresh_seconds:
+                dataset_version = m.DatasetVersion.current(session)
+                version = dataset_version.version if dataset_version else None
+                if self.index is None or self.index.version != version:
+                    self.index = self.build_index(session, version)
+                self.checked_at = time.monotonic()
+        finally:
+            self.lock.release()
+        return self.index
+
+    def build_index(self, session, version):
+        """Serialize every rep and build a new index from them.
+
+        Args:
+            session: SQLAlchemy session to load the reps with.
+            version (int): Dataset version the index is built from.
+
+        Returns:
+            RepSearchIndex: The new index.
+        """
+        start = time.perf_counter()
+        documents = []
+        reps = session.scalars(
+            select(m.Rep).order_by(m.Rep.id).execution_options(yield_per=self.build_batch_size))
+        for batch in reps.partitions():
+            documents.extend(schema.load_rep_documents(batch, session))
+        index = RepSearchIndex(documents, version)
+        LOGGER.info(f"Built rep search index for dataset version {version}: {len(documents)} reps "
+                    f"in {time.perf_counter() - start:.2f}s")
+        return index
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in [LikeSearchBackend, PostgresTrigramSearchBackend, SqliteFtsSearchBackend, MemorySearchBackend]
+}
+
+DIALECT_BACKENDS = {
+    "postgresql": PostgresTrigramSearchBackend,
+    "sqlite": SqliteFtsSearchBackend,
+}
+
+
+def get_search_backend():
+    """Get the search backend for the current app.
+
+    Uses the `SEARCH_BACKEND` config value when set, otherwise picks the indexed backend
+    for the database dialect, falling back to `LikeSearchBackend`.
+
+    Returns:
+        SearchBackend: Backend instance, created once per app.
+    """
+    backend = current_app.extensions.get("tfp_search")
+    if backend is None:
+        backend_name = current_app.config.get("SEARCH_BACKEND")
+        if backend_name:
+            backend_cls = BACKENDS[backend_name]
+        else:
+            backend_cls = DIALECT_BACKENDS.get(db.engine.dialect.name, LikeSearchBackend)
+        backend = backend_cls()
+        current_app.extensions["tfp_search"] = backend
+        LOGGER.info(f"Using rep search backend: {backend.name}")
+    return backend
@@ -0,0 +1,134 @@
+import bisect
+from array import array
+from collections import defaultdict
+
+# Rep columns matched by a search query
+SEARCH_COLUMNS = ["name", "state", "district", "role"]
+
+# Longest n-gram kept in the index, longer queries walk the postings of one of their trigrams
+MAX_GRAM = 3
+
+EMPTY_POSTING = array("I")
+
+
+def ngrams(value, n):
+    """Get the distinct substrings of length `n` of `value`."""
+    return {value[i:i + n] for i in range(len(value) - n + 1)}
+
+
+class RepSearchIndex:
+    """Immutable in-memory n-gram index over serialized rep documents.
+
+    Every lowercased 1, 2 and 3 character substring of the search columns maps to an
+    `array` of document numbers, pre-ranked: ordered by the length of the shortest search
+    column containing the n-gram, then by rep id. That is the result order of a query
+    equal to the n-gram, so queries of up to 3 characters read a page straight off their
+    posting. Longer queries walk the posting of their rarest trigram and confirm the
+    substring match, stopping once no later document can make the page. Results are the
+    same as the `ilike('%...%')` search.
+
+    Attributes:
+        documents (list): Rep dicts as returned by the search API, ordered by id.
+        version (int): Dataset version the index was built from.
+    """
+
+    def __init__(self, documents, version=None):
+        self.documents = sorted(documents, key=lambda document: document["id"])
+        self.version = version
+        self.values = [
+            tuple(str(document.get(name) or "").lower() for name in SEARCH_COLUMNS)
+            for document in self.documents
+        ]
+
+        # entries are `length << 32 | doc_number`, so sorting them ranks the posting
+        ranked = defaultdict(lambda: array("Q"))
+        for doc_number, values in enumerate(self.values):
+            shortest = {}
+            for value in sorted(values, key=len, reverse=True):
+                for n in range(1, MAX_GRAM + 1):
+                    shortest.update(dict.fromkeys(ngrams(value, n), len(value)))
+            for gram, length in shortest.items():
+                ranked[gram].append(length << 32 | doc_number)
+        self.postings = {
+            gram: array("I", [entry & 0xFFFFFFFF for entry in sorted(entries)])
+            for gram, entries in ranked.items()
+        }
+
+    def __len__(self):
+        return len(self.documents)
+
+    def rank(self, doc_number, search_query):
+        """Sort key of a document for a query: length of the shortest column containing it, then id.
+
+        Returns:
+            tuple: `(length, id)`, or None if no column contains the query.
+        """
+        lengths = [len(value) for value in self.values[doc_number] if search_query in value]
+        if not lengths:
+            return None
+        return min(lengths), self.documents[doc_number]["id"]
+
+    def top_matches(self, search_query, count, after=None):
+        """Get the first `count` matches of a lowercased query, after the rank `after` if given.
+
+        Walks the posting of the query, or of its rarest trigram. A document ranks no better
+        for the query than for any n-gram of it, so the walk stops at the first document
+        whose n-gram rank is past the worst match kept.
+
+        Returns:
+            list: `(rank, doc_number)` tuples, best first.
+        """
+        n = min(len(search_query), MAX_GRAM)
+        gram, posting = min(
+            ((gram, self.postings.get(gram, EMPTY_POSTING)) for gram in ngrams(search_query, n)),
+            key=lambda item: len(item[1]))
+        start = 0
+        if after is not None and gram == search_query:
+            start = bisect.bisect_right(posting, after, key=lambda doc_number: self.rank(doc_number, gram))
+
+        matches = []
+        for doc_number in posting[start:]:
+            if len(matches) == count and self.rank(doc_number, gram) > matches[-1][0]:
+                break
+            rank = self.rank(doc_number, search_query)
+            if rank is None or (after is not None and rank <= after):
+                continue
+            bisect.insort(matches, (rank, doc_number))
+            if len(matches) > count:
+                matches.pop()
+        return matches
+
+    def search(self, search_query, limit, position=None):
+        """Search the index, best matches first and ties ordered by rep id.
+
+        Matches are scored by the largest share of a search column the query covers.
+
+        Args:
+            search_query (str): Text typed by the user.
+            limit (int): Maximum number of reps to return.
+            position (list, optional): `[score, id]` of the last rep on the previous page.
+
+        Returns:
+            tuple: List of rep dicts and the position of the next page, or None.
+
+        Raises:
+            ValueError: If `position` was not returned by this index.
+        """
+        search_query = search_query.lower()
+        if not search_query:
+            return [], None
+
+        after = None
+        if position:
+            last_score, last_id = position
+            if not 0 < last_score <= 1:
+                raise ValueError(f"Invalid position: {position}")
+            after = (round(len(search_query) / last_score), last_id)
+        matches = self.top_matches(search_query, limit + 1, after)
+
+        next_position = None
+        if len(matches) > limit:
+            matches = matches[:limit]
+            (length, last_id), _ = matches[-1]
+            next_position = [len(search_query) / length, last_id]
+        return [self.documents[doc_number] for _, doc_number in matches], next_position
@@ -0,0 +1,33 @@
+import os
+
+# Gunicorn worker settings, shared by gunicorn.conf.py and the database pool sizing in
+# `database.engine_options`. Only reads the environment: gunicorn.conf.py loads this file
+# by path, before gevent has patched the standard library.
+
+
+def worker_class():
+    """Gunicorn worker class, `GUNICORN_WORKER_CLASS` (default `gthread`)."""
+    return os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+
+def worker_threads():
+    """Threads per worker, `GUNICORN_THREADS` (default 8) for `gthread` and 1 otherwise.
+
+    Gunicorn runs `sync` workers with more than one thread as `gthread`, so other worker
+    classes are given exactly one.
+    """
+    if worker_class() == "gthread":
+        return int(os.getenv("GUNICORN_THREADS", 8))
+    return 1
+
+
+def worker_connections():
+    """Greenlets per `gevent` worker, `GUNICORN_WORKER_CONNECTIONS` (default 100)."""
+    return int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 100))
+
+
+def worker_concurrency():
+    """Number of requests one gunicorn worker serves at once."""
+    if worker_class() == "gevent":
+        return worker_connections()
+    return worker_threads()
@@ -0,0 +1,231 @@
+import codecs
+import json
+import queue
+import re
+import threading
+from itertools import islice
+
+WHITESPACE = " \t\r\n"
+
+# an Airtable page or dump object, as opposed to JSON Lines of records
+WRAPPER_OBJECT = re.compile(r'\{\s*"(records|offset)"')
+
+
+class JsonStreamReader:
+    """Buffered reader decoding one JSON value at a time from a file.
+
+    Args:
+        fp: File opened in binary or text mode.
+        chunk_size (int): Number of bytes or characters read at a time.
+    """
+
+    def __init__(self, fp, chunk_size=65536):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        """Read more of the file into the buffer, dropping what was already consumed.
+
+        Returns:
+            bool: False if the file is exhausted.
+        """
+        if self.eof:
+            return False
+        raw = self.fp.read(size or self.chunk_size)
+        if not raw:
+            self.eof = True
+        chunk = self.text_decoder.decode(raw, final=self.eof) if isinstance(raw, bytes) else raw
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return not self.eof
+
+    def peek(self):
+        """Skip whitespace and return the next character, or "" at the end of the file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at {self.buffer[self.pos:self.pos + 20]!r}")
+        self.pos += 1
+
+    def decode(self):
+        """Decode the next JSON value, reading more of the file until it is complete."""
+        self.peek()
+        read_size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # values larger than a chunk double the read size instead of re-parsing many times
+            self.fill(read_size)
+            read_size *= 2
+
+    def iter_array(self):
+        """Yield the items of the JSON array starting at the current position."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' in array, got {char!r}")
+
+    def iter_records_member(self):
+        """Yield the items of the `records` array of the JSON object at the current position."""
+        self.expect("{")
+        while self.peek() != "}":
+            key = self.decode()
+            self.expect(":")
+            if key == "records":
+                yield from self.iter_array()
+            else:
+                self.decode()
+            if self.peek() == ",":
+                self.pos += 1
+        self.pos += 1
+
+
+def iter_json_records(fp, chunk_size=65536):
+    """Iterate over the Airtable records in a file without loading the whole file.
+
+    Understands a JSON array of records (as written by `dump_airtable.py`), an Airtable API
+    page (`{"records": [...], "offset": ...}`) and JSON Lines with one record per line.
+
+    Args:
+        fp: File opened in binary or text mode.
+        chunk_size (int): Number of bytes read at a time.
+
+    Yields:
+        dict: One Airtable record at a time.
+    """
+    reader = JsonStreamReader(fp, chunk_size)
+    first = reader.peek()
+    # make sure the first key is buffered before looking at it
+    while len(reader.buffer) - reader.pos < 64 and reader.fill():
+        pass
+    if first == "[":
+        yield from reader.iter_array()
+    elif first == "{" and WRAPPER_OBJECT.match(reader.buffer, reader.pos):
+        yield from reader.iter_records_member()
+    else:
+        while reader.peek():
+            yield reader.decode()
+
+
+def batched(iterable, size):
+    """Split an iterable into lists of at most `size` items."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Prefetcher:
+    """Iterator over the items a background thread produces, see `prefetch`."""
+
+    _done = object()
+
+    def __init__(self, iterable, depth=2):
+        self._items = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._finished = False
+        self._thread = threading.Thread(target=self._produce, args=(iterable,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # give up when the consumer stopped iterating, instead of blocking forever
+        while not self._stop.is_set():
+            try:
+                self._items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put((item, None)):
+                    return
+            self._put((self._done, None))
+        except BaseException as e:
+            self._put((self._done, e))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._finished:
+            raise StopIteration
+        item, error = self._items.get()
+        if error is not None or item is self._done:
+            self.close()
+            if error is not None:
+                raise error
+            raise StopIteration
+        return item
+
+    def close(self):
+        """Stop the producer, dropping the items it already produced."""
+        self._finished = True
+        self._stop.set()
+        self._thread.join()
+
+
+def prefetch(iterable, depth=2):
+    """Iterate over `iterable` in a background thread, keeping up to `depth` items ready.
+
+    Lets slow producers, like paging through an API, overlap with the work done on each
+    item. The producer starts right away, so several prefetchers created up front produce
+    at the same time. Exceptions raised by the producer are raised again by the consumer.
+    Close the returned iterator when stopping early.
+
+    Args:
+        iterable (iterable): Items to produce in the background.
+        depth (int): Number of items produced ahead of the consumer.
+
+    Returns:
+        Prefetcher: Iterator over the items of `iterable`, in order.
+    """
+    return Prefetcher(iterable, depth)
+
+
+def write_json_array(records, fp):
+    """Write records to a file as a JSON array while passing them on.
+
+    The closing bracket is only written once `records` is exhausted, so an interrupted
+    stream leaves an invalid file rather than a truncated valid one.
+
+    Args:
+        records (iterable): JSON serializable records.
+        fp: File opened in text mode.
+
+    Yields:
+        The records, after each was written.
+    """
+    fp.write("[")
+    for i, record in enumerate(records):
+        if i:
+            fp.write(",\n")
+        json.dump(record, fp)
+        yield record
+    fp.write("]\n")
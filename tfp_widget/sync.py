@@ -0,0 +1,243 @@
+import logging
+import os
+from collections import Counter
+from contextlib import ExitStack, closing
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+
+from sqlalchemy import delete, select
+
+from . import models
+from .streaming import batched, prefetch, write_json_array
+
+LOGGER = logging.getLogger()
+
+# Airtable tables kept in sync and the models they are stored in, bills first so rep
+# relations can reference them
+SYNC_TABLES = [
+    ("NEGATIVE_BILLS_TABLE", models.NegativeBills),
+    ("STATE_REPS_TABLE", models.Rep),
+]
+
+# Names of the snapshot files, matching the dumps of dump_airtable.py
+SNAPSHOT_NAMES = {
+    "NEGATIVE_BILLS_TABLE": "negative_bills",
+    "STATE_REPS_TABLE": "state_reps",
+}
+
+# Incremental syncs also request records modified this long before the high-water mark,
+# covering clock skew and records saved while the previous sync was running. Re-fetched
+# records are unchanged and skipped by their checksum.
+OVERLAP = timedelta(minutes=5)
+
+# Relation column referencing each synced model, cleared before its rows are deleted
+RELATION_COLUMNS = {
+    models.Rep: models.RepsToNegativeBills.rep_id,
+    models.NegativeBills: models.RepsToNegativeBills.negative_bills_id,
+}
+
+
+def format_timestamp(moment):
+    """Format a UTC datetime the way Airtable does, e.g. `2023-09-25T20:56:30.000Z`."""
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def upsert_records(model, records, session, batch_size=500, build_relations=False, seen_ids=None):
+    """Upsert Airtable records into `model`, one batch at a time.
+
+    Args:
+        model: Model class to upsert into.
+        records (iterable): Airtable records, consumed lazily.
+        session: SQLAlchemy session.
+        batch_size (int): Number of records held in memory at a time.
+        build_relations (bool): Also sync each batch's rep/negative bill relations.
+        seen_ids (set, optional): Filled with the id of every record.
+
+    Returns:
+        Counter: Summed counts from `bulk_upsert` and `rep_build_all_relations`. Negative bill
+        imports also count the pending relations they let `insert_pending` add.
+    """
+    totals = Counter()
+    checksums = model.load_checksums(session)
+    for batch in batched(records, batch_size):
+        totals["total"] += len(batch)
+        totals.update(model.bulk_upsert(batch, batch_size=batch_size, checksums=checksums))
+        if build_relations:
+            relation_counts = models.RepsToNegativeBills.rep_build_all_relations(at_reps=batch, session=session)
+            totals.update({f"relations_{name}": count for name, count in relation_counts.items()})
+        if seen_ids is not None:
+            seen_ids.update(at_record["id"] for at_record in batch)
+        LOGGER.info(f"Imported {totals['total']} records into {model.__name__}")
+    if model is models.NegativeBills:
+        # relations of earlier imported reps that were waiting for these bills
+        totals["relations_added"] += models.RepsToNegativeBills.insert_pending(session)
+    return totals
+
+
+def delete_missing(model, seen_ids, session, chunk_size=500):
+    """Delete the stored records of `model` that are not in `seen_ids`, and their relations.
+
+    Returns:
+        int: Number of deleted records.
+    """
+    missing = list(set(session.scalars(select(model.id))) - seen_ids)
+    relation_column = RELATION_COLUMNS[model]
+    for i in range(0, len(missing), chunk_size):
+        chunk = missing[i:i + chunk_size]
+        session.execute(delete(models.RepsToNegativeBills).where(relation_column.in_(chunk)))
+        session.execute(delete(model).where(model.id.in_(chunk)))
+    session.commit()
+    return len(missing)
+
+
+class TableFetch:
+    """Pages of one Airtable table being fetched in the background, see `start_fetch`.
+
+    Attributes:
+        table_key (str): Environment variable key of the table id.
+        model: Model class the table is stored in.
+        started (datetime): When the fetch started, the next high-water mark.
+        full (bool): Whether every record is fetched.
+        pages: `prefetch` iterator over the pages, closed by `write_table`.
+        transfer (dict): `pages` and `bytes` transferred so far.
+    """
+
+    def __init__(self, table_key, model, started, full, pages, transfer):
+        self.table_key = table_key
+        self.model = model
+        self.started = started
+        self.full = full
+        self.pages = pages
+        self.transfer = transfer
+
+
+def start_fetch(table_key, model, session, full=False, full_sweep_interval=timedelta(days=1)):
+    """Start fetching the pages of an Airtable table in the background.
+
+    Only the fields the model reads are requested. An incremental sync only requests
+    records modified since the table's high-water mark. Deleted records do not show up in
+    that, so when the last full sweep is older than `full_sweep_interval` every record is
+    fetched instead.
+
+    Args:
+        table_key (str): Environment variable key of the table id.
+        model: Model class the table is stored in.
+        session: SQLAlchemy session.
+        full (bool): Force a full sweep.
+        full_sweep_interval (timedelta): Maximum time between full sweeps.
+
+    Returns:
+        TableFetch: The running fetch, pass it to `write_table`.
+    """
+    # imported here, the client configures logging and loads .env when imported
+    from .airtable import tfp_air_table as airtable
+
+    started = datetime.now(timezone.utc)
+    sync_state = session.get(models.SyncState, table_key)
+    if sync_state is None or sync_state.high_water_mark is None or sync_state.last_full_sync is None:
+        full = True
+    elif started - datetime.fromisoformat(sync_state.last_full_sync) >= full_sweep_interval:
+        full = True
+
+    modified_since = None
+    if not full:
+        modified_since = format_timestamp(datetime.fromisoformat(sync_state.high_water_mark) - OVERLAP)
+    LOGGER.info(f"Syncing {table_key} " + (f"modified since {modified_since}" if modified_since else "in full"))
+
+    transfer = {}
+    pages = prefetch(airtable.iter_table_pages(table_key, modified_since, fields=model.airtable_fields,
+                                               stats=transfer))
+    return TableFetch(table_key, model, started, full, pages, transfer)
+
+
+def write_table(fetch, session, batch_size=500, snapshot_dir=None):
+    """Upsert the records of a `start_fetch` fetch as its pages arrive.
+
+    No more than a few pages and one batch are held in memory. After a full sweep, stored
+    records missing from Airtable are deleted. The table's high-water mark is only moved
+    once every page was written.
+
+    Args:
+        fetch (TableFetch): Fetch returned by `start_fetch`.
+        session: SQLAlchemy session.
+        batch_size (int): Records upserted at a time.
+        snapshot_dir (str, optional): Also write the fetched records to a
+            `<table>_<timestamp>.json` file in this directory, for auditing.
+
+    Returns:
+        Counter: Upsert counts, plus `deleted`, `full` (1 for a full sweep) and the `pages`
+        and compressed `bytes` transferred.
+    """
+    table_key, model = fetch.table_key, fetch.model
+    seen_ids = set() if fetch.full else None
+    with ExitStack() as stack:
+        records = chain.from_iterable(stack.enter_context(closing(fetch.pages)))
+        if snapshot_dir is not None:
+            path = os.path.join(snapshot_dir, f"{SNAPSHOT_NAMES[table_key]}_{int(fetch.started.timestamp())}.json")
+            records = write_json_array(records, stack.enter_context(open(path, "w")))
+            LOGGER.info(f"Writing snapshot of {table_key} to {path}")
+        counts = upsert_records(model, records, session, batch_size=batch_size,
+                                build_relations=model is models.Rep, seen_ids=seen_ids)
+
+    counts["deleted"] = 0
+    if fetch.full:
+        if seen_ids:
+            counts["deleted"] = delete_missing(model, seen_ids, session)
+        else:
+            # an empty table is far more likely a broken fetch than a deleted dataset
+            LOGGER.warning(f"{table_key} returned no records, not deleting anything")
+    counts["full"] = int(fetch.full)
+    counts["pages"] = fetch.transfer.get("pages", 0)
+    counts["bytes"] = fetch.transfer.get("bytes", 0)
+
+    sync_state = models.SyncState.for_table(table_key, session)
+    sync_state.high_water_mark = format_timestamp(fetch.started)
+    if fetch.full:
+        sync_state.last_full_sync = format_timestamp(fetch.started)
+    session.commit()
+    LOGGER.info(f"Synced {table_key}: {dict(counts)}")
+    return counts
+
+
+def sync_table(table_key, model, session, batch_size=500, full=False, full_sweep_interval=timedelta(days=1),
+               snapshot_dir=None):
+    """Bring `model` up to date with an Airtable table, see `start_fetch` and `write_table`.
+
+    Returns:
+        Counter: Counts returned by `write_table`.
+    """
+    fetch = start_fetch(table_key, model, session, full=full, full_sweep_interval=full_sweep_interval)
+    return write_table(fetch, session, batch_size=batch_size, snapshot_dir=snapshot_dir)
+
+
+def sync_tables(session, tables=SYNC_TABLES, batch_size=500, full=False, full_sweep_interval=timedelta(days=1),
+                snapshot_dir=None):
+    """Bring several models up to date with their Airtable tables.
+
+    Every table starts fetching right away, sharing the client's rate limit, while the
+    tables are written one after another in the order of `tables`. A table's fetch runs
+    at most a few pages ahead of its writes, so memory use stays bounded.
+
+    Args:
+        session: SQLAlchemy session.
+        tables (list): `(table_key, model)` pairs, written in this order.
+        batch_size, full, full_sweep_interval, snapshot_dir: See `start_fetch` and `write_table`.
+
+    Returns:
+        dict: Counts returned by `write_table`, by table key.
+    """
+    fetches = []
+    try:
+        for table_key, model in tables:
+            fetches.append(start_fetch(table_key, model, session, full=full, full_sweep_interval=full_sweep_interval))
+        return {fetch.table_key: write_table(fetch, session, batch_size=batch_size, snapshot_dir=snapshot_dir)
+                for fetch in fetches}
+    finally:
+        # stop the fetches of tables not written because an earlier one failed
+        for fetch in fetches:
+            fetch.pages.close()
+
+
+def has_changes(counts):
+    """Whether sync counts show any written or deleted row."""
+    return any(counts[name] for name in ["inserted", "updated", "deleted", "relations_added", "relations_removed"])
@@ -1,37 +1,252 @@
-from sqlalchemy import or_, and_
-from collections import defaultdict
-from flask_restful import Resource
-from marshmallow import ValidationError
+import base64
+import binascii
+import gzip
+import json
+
+from datetime import datetime
+
+from flask import Response, current_app, request, stream_with_context
+from flask_restful import Resource, abort
+from . import cache
+from . import database
+from . import exports
+from . import loaders
+from . import metrics
 from . import models as m
-from . import schema
+from . import search
+from .database import db
+from .instrumentation import output_json, timed
+
+DEFAULT_SEARCH_LIMIT = 100
+MAX_SEARCH_LIMIT = 500
+MAX_BILL_IDS = 500
+NDJSON_MIMETYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(position):
+    """Encode a keyset position as an opaque, URL safe cursor token.
+
+    Args:
+        position (list): Sort key values of the last row on the current page.
+
+    Returns:
+        str: Cursor token to hand back to clients.
+    """
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(token):
+    """Decode a cursor token produced by `encode_cursor`.
+
+    Args:
+        token (str): Cursor token from the `cursor` query parameter.
+
+    Returns:
+        list: Sort key values of the last row on the previous page.
+
+    Raises:
+        ValueError: If the token is not a valid cursor.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (binascii.Error, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+    if not isinstance(position, list):
+        raise ValueError(f"Invalid cursor: {token}")
+    return position
+
+
+def get_search_limit():
+    """Read the `limit` query parameter, clamped to `MAX_SEARCH_LIMIT`."""
+    limit = request.args.get("limit", DEFAULT_SEARCH_LIMIT, type=int)
+    return max(1, min(limit, MAX_SEARCH_LIMIT))
+
+
+def get_search_cursor():
+    """Read the `cursor` query parameter, aborting with a 400 if it is malformed."""
+    token = request.args.get("cursor")
+    if not token:
+        return None
+    try:
+        return decode_cursor(token)
+    except ValueError as e:
+        abort(400, message=str(e))
+
+
+def wants_ndjson():
+    """Whether the client asked for a streamed NDJSON response, with `format=ndjson` or `Accept`."""
+    if request.args.get("format") == "ndjson":
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def make_ndjson_response(batches):
+    """Stream batches of dicts as newline delimited JSON, one batch encoded at a time.
+
+    Args:
+        batches (iterable): Lists of JSON serializable dicts, produced lazily.
+
+    Returns:
+        Response: Chunked response, kept in the request context until the last batch.
+    """
+    def generate():
+        for batch in batches:
+            with timed("serialize"):
+                chunk = "".join(json.dumps(document) + "\n" for document in batch)
+            yield chunk
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def make_cached_response(entry, dataset_version):
+    """Build a conditional response from a `ResponseCache` entry.
+
+    Sends the entry's ETag and the dataset's import time as Last-Modified, and answers
+    `If-None-Match` / `If-Modified-Since` revalidations with a 304.
+    """
+    response = Response(entry["body"], mimetype="application/json", headers=entry["headers"])
+    response.set_etag(entry["etag"])
+    if dataset_version is not None:
+        response.last_modified = datetime.fromisoformat(dataset_version.updated)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get("RESPONSE_CACHE_MAX_AGE", 60)
+    return response.make_conditional(request)
 
 
 # noinspection PyMethodMayBeStatic
 class RepsResource(Resource):
+    method_decorators = [database.read_from_replica]
+
     def get(self, search_query):
-        search_query = "%{}%".format(search_query)
-        conditions = [column.ilike(f'%{search_query}%') for column in
-                      [m.Rep.name, m.Rep.state, m.Rep.district, m.Rep.role]]
-        query = m.Rep.query.filter(or_(*conditions))
-        reps = query.all()[:100]
-
-        bill_types = ["sponsorship", "yea_vote", "nay_vote"]
-        result = []
-        for rep in reps:
-            negative_mapping = defaultdict(list)
-            for bill_type in bill_types:
-                bill_ids = m.RepsToNegativeBills.query.filter(
-                    and_(m.RepsToNegativeBills.rep_id == rep.id,
-                         m.RepsToNegativeBills.relation_type == bill_type)).all()
-                for bill_id in bill_ids:
-                    negative_bill = m.NegativeBills.query.filter(
-                        m.NegativeBills.id == bill_id.negative_bills_id).first()
-                    negative_mapping[bill_type].append(negative_bill.case_name)
-
-            reps_schema = schema.RepSchema(context={'mapping': negative_mapping})
-            result.append(reps_schema.dump(rep))
+        if wants_ndjson():
+            # every match, without paging or caching, in constant memory
+            batches = search.get_search_backend().iter_documents(
+                db.session, search_query.strip(), STREAM_BATCH_SIZE)
+            return make_ndjson_response(batches)
+
+        limit = get_search_limit()
+        response_cache = cache.get_response_cache()
+        if response_cache is None:
+            result, headers = self.search(search_query, limit)
+            return result, 200, headers
+
+        dataset_version = m.DatasetVersion.current(db.session)
+        version = dataset_version.version if dataset_version else None
+        key = "|".join(["reps/search", cache.normalize_query(search_query), str(limit),
+                        request.args.get("cursor", "")])
+
+        def build():
+            result, headers = self.search(search_query, limit)
+            return output_json(result, 200).get_data(as_text=True), headers
 
+        entry, hit = response_cache.get_or_build(key, version, build)
+        response = make_cached_response(entry, dataset_version)
+        response.headers["X-Cache"] = "HIT" if hit else "MISS"
+        return response
+
+    def search(self, search_query, limit):
+        cursor = get_search_cursor()
         try:
-            return result
-        except ValidationError as err:
-            return err.messages, 422
+            result, next_position = search.get_search_backend().search_documents(
+                db.session, search_query.strip(), limit, cursor)
+        except (TypeError, ValueError):
+            # a cursor handed out by a different backend or query
+            abort(400, message="Cursor does not match this search")
+
+        headers = {}
+        if next_position:
+            headers["X-Next-Cursor"] = encode_cursor(next_position)
+        return result, headers
+
+
+# noinspection PyMethodMayBeStatic
+class CacheStatsResource(Resource):
+    def get(self):
+        response_cache = cache.get_response_cache()
+        if response_cache is None:
+            return {"enabled": False}
+        return dict(enabled=True, **response_cache.stats())
+
+
+# noinspection PyMethodMayBeStatic
+class PoolStatsResource(Resource):
+    def get(self):
+        """Occupancy of each engine's connection pool and the checkout waits of this process."""
+        engines = {bind or "default": database.pool_status(engine) for bind, engine in db.engines.items()}
+        return dict(engines=engines, **database.POOL_STATS.to_dict())
+
+
+# noinspection PyMethodMayBeStatic
+class MetricsResource(Resource):
+    def get(self):
+        """Prometheus metrics of all workers, behind `Authorization: Bearer <METRICS_TOKEN>` if set."""
+        token = current_app.config.get("METRICS_TOKEN")
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            abort(401, message="Metrics need the METRICS_TOKEN")
+        body, content_type = metrics.generate()
+        return Response(body, content_type=content_type)
+
+
+# noinspection PyMethodMayBeStatic
+class NegativeBillResource(Resource):
+    method_decorators = [database.read_from_replica]
+
+    def get(self, bill_id):
+        bill = loaders.get_negative_bills_loader(db.session).load(bill_id)
+        if bill is None:
+            abort(404, message=f"Negative bill {bill_id} not found")
+        return bill
+
+
+# noinspection PyMethodMayBeStatic
+class NegativeBillsResource(Resource):
+    method_decorators = [database.read_from_replica]
+
+    def get(self):
+        """Look up several bills with `?ids=a,b,c`, unknown ids are left out of the result."""
+        bill_ids = [bill_id.strip() for bill_id in request.args.get("ids", "").split(",") if bill_id.strip()]
+        if not bill_ids:
+            abort(400, message="Pass the bill ids as ?ids=a,b,c")
+        if len(bill_ids) > MAX_BILL_IDS:
+            abort(400, message=f"At most {MAX_BILL_IDS} ids per request")
+        bills = loaders.get_negative_bills_loader(db.session).load_many(bill_ids)
+        return [bill for bill in bills if bill is not None]
+
+
+class ExportResource(Resource):
+    """Serves the stored gzip snapshot of a whole dataset, see `exports.EXPORTS`.
+
+    Clients that accept gzip get the stored bytes as they are, others get them decompressed.
+    `If-None-Match` with the current ETag is answered with a 304 without loading the body.
+    """
+
+    export_name = None
+    method_decorators = [database.read_from_replica]
+
+    def get(self):
+        snapshot = exports.get_export(self.export_name, db.session)
+        response = Response(mimetype="application/json")
+        response.set_etag(snapshot.etag)
+        response.last_modified = datetime.fromisoformat(snapshot.created)
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config.get("RESPONSE_CACHE_MAX_AGE", 60)
+        response.vary.add("Accept-Encoding")
+        if snapshot.etag in request.if_none_match:
+            response.status_code = 304
+            return response
+
+        if "gzip" in request.accept_encodings:
+            response.set_data(snapshot.body)
+            response.content_encoding = "gzip"
+        else:
+            response.set_data(gzip.decompress(snapshot.body))
+        return response
+
+
+class RepsExportResource(ExportResource):
+    export_name = "reps"
+
+
+class NegativeBillsExportResource(ExportResource):
+    export_name = "negative_bills"